@@ -3,7 +3,221 @@
 #################################################################
 # Class and macros to interact with AD9546 chipsets
 #################################################################
-from smbus import SMBus
+import os
+import sys
+import json
+import time
+import atexit
+import functools
+import sysconfig
+import importlib.util
+import fcntl
+import ctypes
+import tempfile
+import contextlib
+import queue
+import struct
+import threading
+
+I2C_SLAVE = 0x0703 # linux/i2c-dev.h
+I2C_RDWR = 0x0707 # linux/i2c-dev.h
+I2C_M_RD = 0x0001 # linux/i2c.h
+I2C_MAX_XFER = 8192 # /dev/i2c-X single message size limit
+I2C_RDWR_MAX_MSGS = 42 # I2C_RDWR_IOCTL_MAX_MSGS, linux/i2c-dev.h
+
+SPI_SPEED = 10000000 # default SPI clock [Hz]
+SPI_MAX_XFER = 4096 # spidev default `bufsiz`
+SPI_READ = 0x80 # R/W bit of the 16 bit instruction word
+
+BUFFERED = (0x0010, 0x2FFF) # registers that only become active on I/O update,
+    # serial port registers [0x0000, 0x000F] take effect immediately
+STATUS = (0x3000, 0x3A3B) # read only status registers
+
+REGMAP = [
+    (0x0000, 0x0001),
+    (0x0003, 0x0006),
+    (0x000B, 0x000D),
+    (0x000F, 0x0010),
+    (0x0020, 0x0023),
+    (0x0100, 0x011F),
+    (0x0182, 0x0188),
+    (0x0200, 0x0209),
+    (0x0280, 0x029C),
+    (0x0300, 0x0307),
+    (0x030A, 0x030B),
+    (0x030E, 0x030F),
+    (0x0400, 0x0414),
+    (0x0420, 0x0434), 
+    (0x0440, 0x0454),
+    (0x0460, 0x0474),
+    (0x0480, 0x0494),
+    (0x04A0, 0x04B4),
+    (0x04C0, 0x04D4),
+    (0x04E0, 0x04F4),
+    (0x0800, 0x0811),
+    (0x0820, 0x0831),
+    (0x0840, 0x0851),
+    (0x0860, 0x0871),
+    (0x0880, 0x0891),
+    (0x08A0, 0x08B1),
+    (0x08C0, 0x08D1),
+    (0x08E0, 0x08F1),
+    (0x0900, 0x0911),
+    (0x0920, 0x0931),
+    (0x0940, 0x0951),
+    (0x0960, 0x0971),
+    (0x0980, 0x0991),
+    (0x09A0, 0x09B1),
+    (0x0C00, 0x0C17),
+    (0x0D00, 0x0D05),
+    (0x0D10, 0x0D1D),
+    (0x0D20, 0x0D2D),
+    (0x0D30, 0x0D3C),
+    (0x0D40, 0x0D40),
+    (0x0E00, 0x0E3A),
+    (0x0F00, 0x0F15),
+    (0x1000, 0x102B),
+    (0x1080, 0x1083),
+    (0x10C0, 0x10DC),
+    (0x1100, 0x1135),
+    (0x1200, 0x1217),
+    (0x1220, 0x1237),
+    (0x1240, 0x1257),
+    (0x1260, 0x1277),
+    (0x1280, 0x1297),
+    (0x12A0, 0x12B7),
+    (0x1400, 0x142B),
+    (0x1480, 0x1483),
+    (0x14C0, 0x14C9),
+    (0x14CE, 0x14D0),
+    (0x14D2, 0x14D4),
+    (0x14D6, 0x14D8),
+    (0x14DA, 0x14DC), 
+    (0x1500, 0x1523),
+    (0x1600, 0x1617),
+    (0x1620, 0x1637),
+    (0x1640, 0x1657),
+    (0x1660, 0x1677),
+    (0x1680, 0x1697),
+    (0x16A0, 0x16B7),
+    (0x2000, 0x2019),
+    (0x2100, 0x2107),
+    (0x2200, 0x2203),
+    (0x2205, 0x2207),
+    (0x2800, 0x281E),
+    (0x2840, 0x285E),
+    (0x2900, 0x2906),
+    (0x2A00, 0x2A1A),
+    (0x2C00, 0x2C07),
+    (0x2D00, 0x2D02),
+    (0x2D08, 0x2D0A),
+    (0x2E00, 0x2E03),
+    (0x2E10, 0x2E1E),
+    (0x3000, 0x3023),
+    (0x3100, 0x310E),
+    (0x3200, 0x320E),
+    (0x3A00, 0x3A3B),
+]
+
+VOLATILE = [
+    (0x0000, 0x0023), # serial port: self clearing reset and I/O update bits
+    (0x2000, 0x2019), # operational controls: self clearing bits, IRQ clearing
+    (0x3000, 0x3A3B), # status
+]
+
+def volatile (addr):
+    """ Returns True if register at given address may change on its own
+    (status readings, self clearing bits..). Undocumented registers,
+    not part of the REGMAP table, are considered volatile too """
+    for (start, stop) in VOLATILE:
+        if addr >= start and addr <= stop:
+            return True
+    for (start, stop) in REGMAP:
+        if addr >= start and addr <= stop:
+            return False
+    return True
+
+# configuration registers: only change when we write them
+CACHEABLE = set()
+for (start, stop) in REGMAP:
+    CACHEABLE.update(range (start, stop+1))
+for (start, stop) in VOLATILE:
+    CACHEABLE.difference_update(range (start, stop+1))
+# configuration registers whose I/O update can be deferred & merged:
+# not the DPLL operational controls, where every write is an edge (q-sync, resets..)
+DEFERRABLE = CACHEABLE.difference(range (0x2100, 0x2208))
+
+SIM_SIZE = 0x4000 # 16 KiB register image, covers 0x0000-0x3A3B
+SIM_SELF_CLEARING = {
+    0x2000: 0x0E, # sync all, calibrate sysclk, calibrate all
+    0x2005: 0x8F, # watchdog reset, clear IRQ groups
+}
+SIM_IRQ_CLEAR = (0x2006, 0x2012) # clear IRQ bits, mirrors [0x300B, 0x3017]
+SIM_IRQ = (0x300B, 0x3017) # IRQ status registers
+SIM_IRQ_GROUPS = { # 0x2005 IRQ group clearing bits
+    0x02: (0x300B, 0x300F), # other (non pll) events
+    0x04: (0x3010, 0x3013), # pll0 events
+    0x08: (0x3014, 0x3017), # pll1 events
+}
+
+def i2c_latency (clock, syscall=30E-6):
+    """ Latency model of an I2C bus, clocked at given rate [Hz]:
+    every transaction costs START, slave address, 2 address bytes & STOP,
+    every data byte costs 9 clock cycles (8 bits + ACK),
+    reads also cost a repeated START & the slave address (read direction).
+    Returns (per transaction, per byte, per syscall, per read) [s] """
+    return ((1 + 9 + 18 + 1) / clock, 9 / clock, syscall, (1 + 9) / clock)
+
+def spi_latency (clock, syscall=20E-6, cs=1E-6):
+    """ Latency model of a SPI bus clocked at given rate [Hz]:
+    every transaction costs the 16 bit instruction word & CS framing,
+    every data byte costs 8 clock cycles, reads cost nothing more.
+    Returns (per transaction, per byte, per syscall, per read) [s] """
+    return (16 / clock + cs, 8 / clock, syscall, 0.0)
+
+LATENCY_PRESETS = { # name: ((per transaction, per byte, per syscall, per read) [s], segments per syscall)
+    "i2c-100k": (i2c_latency(100E3), I2C_RDWR_MAX_MSGS // 2),
+    "i2c-400k": (i2c_latency(400E3), I2C_RDWR_MAX_MSGS // 2),
+    "i2c-1M": (i2c_latency(1E6), I2C_RDWR_MAX_MSGS // 2),
+    "spi-1M": (spi_latency(1E6), 1),
+    "spi-10M": (spi_latency(10E6), 1),
+    "spi-20M": (spi_latency(20E6), 1),
+    "spi-50M": (spi_latency(50E6), 1),
+}
+
+LOCK_DIR = os.environ.get("AD9546_LOCK_DIR", "/run/lock") # advisory lock files, same for every user
+LOCK_TIMEOUT = 10.0 # [s]
+DAEMON_SOCKET = os.environ.get("AD9546_SOCKET", # ad9546d.py Unix socket, in a per user private directory
+    os.path.join(os.environ.get("XDG_RUNTIME_DIR") or os.path.join(tempfile.gettempdir(), "ad9546-{}".format(os.getuid())), "ad9546d.sock"))
+DAEMON_REFUSED = ["--record", "--dump"] # options writing files: never run by the daemon
+SHARED = None # daemon: {transport key: (transport, lock)}, kept open across script invocations
+EXIT_HOOKS = None # daemon: handlers to run once current script invocation is done
+DEVICE = None # batch: device every script invocation operates on
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+SCRIPTS_DIRS = [SCRIPTS_DIR, sysconfig.get_path("scripts"), # checkout, installed
+    sysconfig.get_path("scripts", "{}_user".format(os.name))] # pip install --user
+SCRIPTS = {} # script file name: imported module
+
+RECORD_MAGIC = b"AD9546R\x01" # transaction log header (version 1)
+RECORD = struct.Struct("<BHId") # op, address, length, timestamp [s], followed by data
+RECORD_WRITE = 0
+RECORD_READ = 1
+
+class i2c_msg (ctypes.Structure):
+    """ struct i2c_msg, linux/i2c.h """
+    _fields_ = [
+        ("addr", ctypes.c_uint16),
+        ("flags", ctypes.c_uint16),
+        ("len", ctypes.c_uint16),
+        ("buf", ctypes.POINTER(ctypes.c_uint8)),
+    ]
+
+class i2c_rdwr_ioctl_data (ctypes.Structure):
+    """ struct i2c_rdwr_ioctl_data, linux/i2c-dev.h """
+    _fields_ = [
+        ("msgs", ctypes.POINTER(i2c_msg)),
+        ("nmsgs", ctypes.c_uint32),
+    ]
 
 def sign_extend (value, length):
     """ sign extends given integer number to desired length """
@@ -15,33 +229,1182 @@ def sign_extend (value, length):
         return int(binary,2)
     return value
 
-class AD9546 :
-    """ Class to interact with AD9546 chipset,
-    only I2C bus supported @ the moment """
+class Transport :
+    """ Transport interface: moves raw bytes to/from AD9546 registers.
+    Every transport implements write(), read() and close(),
+    read_segments() defaults to one read() per segment.
+    `syscalls` counts system calls issued so far (ioctl, write..),
+    `name` identifies the bus & device (lock files), `bus` the bus alone,
+    None when not applicable """
+    syscalls = 0
+    name = None
+    bus = None
+
+    def write (self, addr, data):
+        """ Writes given data (list of uint8_t) to consecutive registers,
+        starting at given address (uint16_t) """
+        raise NotImplementedError
+
+    def read (self, addr, length):
+        """ Reads `length` consecutive registers, starting at given address (uint16_t).
+        Returns list of uint8_t """
+        raise NotImplementedError
+
+    def read_segments (self, segments):
+        """ Reads several, non contiguous, register segments.
+        segments: list of (address (uint16_t), length).
+        Returns one list of uint8_t per segment """
+        return [self.read(addr, length) for (addr, length) in segments]
+
+    def close (self):
+        pass
+
+class I2CTransport (Transport):
+    """ /dev/i2c-X transport (smbus + I2C_RDWR) """
     def __init__ (self, bus, address):
-        """ Creates an AD9546 device, 
-        bus: [int] I2C bus number, X in /dev/i2c-X filesystem entry point   
+        """ Opens I2C device,
+        bus: [int] I2C bus number, X in /dev/i2c-X filesystem entry point
         address: [int] i2c slave address
         """
         self.slv_addr = address
+        self.name = "i2c-{}-0x{:02X}".format(bus, address)
+        self.bus = "i2c-{}".format(bus)
+        from smbus import SMBus # only when a bus actually gets opened
         self.handle = SMBus()
         self.handle.open(bus)
+        # raw file descriptor, for multi byte transfers
+        self.fd = os.open("/dev/i2c-{}".format(bus), os.O_RDWR)
+        fcntl.ioctl(self.fd, I2C_SLAVE, address)
+
+    def write (self, addr, data):
+        """ Writes given data (list of uint8_t) to consecutive registers,
+        starting at given address (uint16_t), in a single I2C transaction.
+        Device auto increments the address while we stream data in """
+        if len(data) == 1:
+            msb = (addr & 0xFF00)>>8
+            lsb = addr & 0xFF
+            self.handle.write_i2c_block_data(self.slv_addr, msb, [lsb, data[0] & 0xFF])
+            self.syscalls += 1
+            return
+        for offset in range (0, len(data), I2C_MAX_XFER-2):
+            chunk = data[offset:offset + I2C_MAX_XFER-2]
+            msb = ((addr + offset) & 0xFF00)>>8
+            lsb = (addr + offset) & 0xFF
+            os.write(self.fd, bytes([msb, lsb] + [d & 0xFF for d in chunk]))
+            self.syscalls += 1
+
+    def i2c_rdwr (self, *msgs):
+        """ Issues given messages as a single I2C_RDWR ioctl,
+        messages are chained with repeated starts (no STOP in between).
+        msgs: (flags, buffer) where buffer is a ctypes uint8_t array """
+        messages = (i2c_msg * len(msgs))()
+        for i, (flags, buf) in enumerate(msgs):
+            messages[i].addr = self.slv_addr
+            messages[i].flags = flags
+            messages[i].len = len(buf)
+            messages[i].buf = ctypes.cast(buf, ctypes.POINTER(ctypes.c_uint8))
+        ioctl_data = i2c_rdwr_ioctl_data(messages, len(msgs))
+        fcntl.ioctl(self.fd, I2C_RDWR, ioctl_data)
+        self.syscalls += 1
+
+    def read (self, addr, length):
+        """ Reads `length` consecutive registers, starting at given address (uint16_t).
+        Address write and data read are issued as a single combined transaction
+        (repeated start), device auto increments the address while we stream data out.
+        Returns list of uint8_t """
+        return self.read_segments([(addr, length)])[0]
+
+    def read_segments (self, segments):
+        """ Reads several, non contiguous, register segments.
+        Each segment is an (address write, data read) message pair,
+        all pairs are issued within as few I2C_RDWR ioctls as possible
+        (I2C_RDWR_MAX_MSGS messages per ioctl).
+        segments: list of (address (uint16_t), length)
+        Returns one list of uint8_t per segment """
+        pairs = []
+        for (addr, length) in segments:
+            for offset in range (0, length, I2C_MAX_XFER):
+                size = min(length - offset, I2C_MAX_XFER)
+                wr = (ctypes.c_uint8 * 2)(((addr + offset) & 0xFF00)>>8, (addr + offset) & 0xFF)
+                rd = (ctypes.c_uint8 * size)()
+                pairs.append(((0, wr), (I2C_M_RD, rd)))
+        step = I2C_RDWR_MAX_MSGS // 2
+        for i in range (0, len(pairs), step):
+            msgs = []
+            for pair in pairs[i:i+step]:
+                msgs += pair
+            self.i2c_rdwr(*msgs)
+        ret = []
+        rds = [rd for (_, (_, rd)) in pairs]
+        for (addr, length) in segments:
+            data = []
+            while len(data) < length:
+                data += list(rds.pop(0))
+            ret.append(data)
+        return ret
+
+    def close (self):
+        self.handle.close()
+        os.close(self.fd)
+
+class SPITransport (Transport):
+    """ /dev/spidevX.Y transport """
+    def __init__ (self, bus, cs, speed=SPI_SPEED, ascending=False, handle=None):
+        """ Opens SPI device,
+        bus: [int] X in /dev/spidevX.Y filesystem entry point
+        cs: [int] chip select, Y in /dev/spidevX.Y filesystem entry point
+        speed: [int] SPI clock [Hz]
+        ascending: [bool] must match device address ascension setting (0x0000),
+            device descends (default) or ascends through addresses when streaming.
+        handle: spidev.SpiDev like object, opened on our behalf when not provided
+        """
+        self.ascending = ascending
+        self.name = "spidev{}.{}".format(bus, cs)
+        self.bus = "spidev{}".format(bus)
+        if handle is None:
+            try:
+                import spidev # optional, only when a bus actually gets opened
+            except ImportError:
+                raise RuntimeError("SPI interface requires the spidev module")
+            handle = spidev.SpiDev()
+            handle.open(bus, cs)
+        handle.max_speed_hz = speed
+        handle.mode = 0
+        self.handle = handle
+
+    def transfer (self, read, addr, data):
+        """ Single SPI transaction: 16 bit instruction word
+        (R/W bit + 15 bit address) followed by streamed data bytes """
+        instr = [SPI_READ if read else 0x00, 0x00]
+        instr[0] |= (addr & 0x7F00)>>8
+        instr[1] = addr & 0xFF
+        self.syscalls += 1
+        return self.handle.xfer2(instr + data)[2:]
+
+    def write (self, addr, data):
+        """ Writes given data (list of uint8_t) to consecutive registers,
+        starting at given address (uint16_t) """
+        for offset in range (0, len(data), SPI_MAX_XFER-2):
+            chunk = [d & 0xFF for d in data[offset:offset + SPI_MAX_XFER-2]]
+            if self.ascending:
+                self.transfer(False, addr + offset, chunk)
+            else: # descending: start from last address
+                self.transfer(False, addr + offset + len(chunk)-1, chunk[::-1])
+
+    def read (self, addr, length):
+        """ Reads `length` consecutive registers, starting at given address (uint16_t).
+        Returns list of uint8_t """
+        data = []
+        while len(data) < length:
+            size = min(length - len(data), SPI_MAX_XFER-2)
+            if self.ascending:
+                data += self.transfer(True, addr + len(data), [0x00] * size)
+            else: # descending: start from last address
+                data += self.transfer(True, addr + len(data) + size-1, [0x00] * size)[::-1]
+        return data
+
+    def close (self):
+        self.handle.close()
+
+class SimTransport (Transport):
+    """ In memory AD9546 register file, for tests & benchmarking
+    without any hardware attached. Models the buffered (shadow) registers,
+    that only become active on I/O update (0x000F),
+    the self clearing control bits and the IRQ clearing registers """
+    def __init__ (self, regmap=None):
+        """ Creates a simulated device,
+        regmap: optionnal register map to seed the image with (power on values),
+            either a file path to a json register map (like regmap.py --dump)
+            or a {address: value} dictionnary
+        """
+        self.seed = bytearray(SIM_SIZE)
+        if isinstance(regmap, str):
+            with open(regmap, encoding="utf-8-sig") as fd:
+                regmap = json.load(fd)["RegisterMap"]
+        if regmap is not None:
+            for addr in regmap:
+                value = regmap[addr]
+                if isinstance(addr, str):
+                    addr = int(addr, 16)
+                if isinstance(value, str):
+                    value = int(value, 16)
+                self.seed[addr] = value & 0xFF
+        self.active = bytearray(self.seed)
+        self.buffer = bytearray(self.seed)
+
+    def poke (self, addr, data):
+        """ Forces given (list of uint8_t) values, both in buffered
+        and active images. Used to emulate status registers """
+        for i, d in enumerate(data):
+            self.active[addr+i] = d & 0xFF
+            self.buffer[addr+i] = d & 0xFF
+
+    def io_update (self):
+        """ Buffered registers become active """
+        (start, stop) = BUFFERED
+        self.active[start:stop+1] = self.buffer[start:stop+1]
+        (start, stop) = SIM_IRQ_CLEAR
+        for addr in range (start, stop+1):
+            value = self.active[addr]
+            self.active[SIM_IRQ[0] + addr-start] &= (value ^0xFF)
+            self.active[addr] = 0x00 # self clearing
+            self.buffer[addr] = 0x00
+        if self.active[0x2005] & 0x01: # clear all IRQs
+            (start, stop) = SIM_IRQ
+            self.active[start:stop+1] = bytes(stop-start+1)
+        for (bit, (start, stop)) in SIM_IRQ_GROUPS.items():
+            if self.active[0x2005] & bit:
+                self.active[start:stop+1] = bytes(stop-start+1)
+        for (addr, mask) in SIM_SELF_CLEARING.items():
+            self.active[addr] &= (mask ^0xFF)
+            self.buffer[addr] &= (mask ^0xFF)
+
+    def write (self, addr, data):
+        for i, d in enumerate(data):
+            a = addr+i
+            if a >= STATUS[0]: # read only
+                continue
+            if a < BUFFERED[0]:
+                if a == 0x0000 and d & 0x01: # soft reset
+                    self.active = bytearray(self.seed)
+                    self.buffer = bytearray(self.seed)
+                    continue
+                self.active[a] = d & 0xFF
+                self.buffer[a] = d & 0xFF
+                if a == 0x000F and d & 0x01:
+                    self.io_update()
+                    self.active[a] = 0x00 # self clearing
+                    self.buffer[a] = 0x00
+            else:
+                self.buffer[a] = d & 0xFF
+
+    def read (self, addr, length):
+        data = []
+        for a in range (addr, addr+length):
+            if BUFFERED[0] <= a <= BUFFERED[1] and self.active[0x0001] & 0x40:
+                data.append(self.buffer[a]) # buffered read
+            else:
+                data.append(self.active[a])
+        return data
+
+class RecordTransport (Transport):
+    """ Records every transaction issued through given transport
+    into a binary log, that ReplayTransport serves back later on.
+    Log is streamed to file, one record per register segment:
+    op (uint8), address (uint16), length (uint32), timestamp (double) then data """
+    def __init__ (self, transport, path):
+        """ transport: [Transport] transport to record
+        path: [str] log file """
+        self.transport = transport
+        self.fd = open(path, "wb")
+        self.fd.write(RECORD_MAGIC)
+        self.t0 = time.monotonic()
+
+    @property
+    def syscalls (self):
+        return self.transport.syscalls
+
+    @property
+    def name (self):
+        return self.transport.name
+
+    @property
+    def bus (self):
+        return self.transport.bus
+
+    def log (self, op, addr, data):
+        self.fd.write(RECORD.pack(op, addr, len(data), time.monotonic() - self.t0))
+        self.fd.write(bytes([d & 0xFF for d in data]))
+
+    def write (self, addr, data):
+        self.transport.write(addr, data)
+        self.log(RECORD_WRITE, addr, data)
+
+    def read (self, addr, length):
+        return self.read_segments([(addr, length)])[0]
+
+    def read_segments (self, segments):
+        ret = self.transport.read_segments(segments)
+        for ((addr, _), data) in zip(segments, ret):
+            self.log(RECORD_READ, addr, data)
+        return ret
+
+    def close (self):
+        if not self.fd.closed:
+            self.fd.close()
+            self.transport.close()
+
+def read_records (path):
+    """ Iterates over transactions recorded in given log,
+    yields (op, address, timestamp [s], data (bytes)) """
+    with open(path, "rb") as fd:
+        if fd.read(len(RECORD_MAGIC)) != RECORD_MAGIC:
+            raise ValueError("{} is not a transaction log".format(path))
+        while True:
+            header = fd.read(RECORD.size)
+            if len(header) < RECORD.size:
+                return
+            (op, addr, length, timestamp) = RECORD.unpack(header)
+            yield (op, addr, timestamp, fd.read(length))
+
+class ReplayTransport (Transport):
+    """ Serves transactions recorded by RecordTransport, in the same order.
+    Log is streamed, not loaded in memory. Issued transactions must match
+    the recorded session, RuntimeError is raised on first divergence """
+    def __init__ (self, path):
+        self.path = path
+        self.records = read_records(path)
+        self.count = 0 # replayed so far
+
+    def next (self, op, addr, length):
+        try:
+            (r_op, r_addr, _, data) = next(self.records)
+        except StopIteration:
+            raise RuntimeError("{}: end of log reached after {} transactions".format(self.path, self.count))
+        if (r_op, r_addr, len(data)) != (op, addr, length):
+            raise RuntimeError("{}: transaction #{} diverges from log: {} 0x{:04X} ({} bytes) expected, got {} 0x{:04X} ({} bytes)".format(
+                self.path, self.count,
+                "read" if r_op == RECORD_READ else "write", r_addr, len(data),
+                "read" if op == RECORD_READ else "write", addr, length))
+        self.count += 1
+        return list(data)
+
+    def write (self, addr, data):
+        self.next(RECORD_WRITE, addr, len(data))
+
+    def read (self, addr, length):
+        return self.next(RECORD_READ, addr, length)
+
+    def close (self):
+        self.records.close()
+
+class LatencyTransport (Transport):
+    """ Adds bus latency to given transport (typically SimTransport),
+    to estimate real world duration of a session.
+    Syscalls are modeled: one per write, one per `batch` read segments """
+    def __init__ (self, transport, transaction=0.0, byte=0.0, syscall=0.0, read=0.0, batch=1, sleep=True):
+        """ transport: [Transport] wrapped transport
+        transaction, byte, syscall: [s] latency added per transaction, per byte
+            and per syscall
+        read: [s] latency added per read segment, on top of its transaction
+        batch: [int] number of read segments issued per syscall
+        sleep: [bool] actually wait, otherwise latency is only accounted for """
+        self.transport = transport
+        self.latency = (transaction, byte, syscall, read)
+        self.batch = batch
+        self.sleep = sleep
+        self.transactions = 0
+        self.bytes = 0
+        self.syscalls = 0
+        self.injected = 0.0 # [s]
+        self.t0 = time.perf_counter()
+
+    @property
+    def name (self):
+        return self.transport.name
+
+    @property
+    def bus (self):
+        return self.transport.bus
+
+    @staticmethod
+    def preset (transport, name, sleep=True):
+        """ Wraps given transport with a preset (LATENCY_PRESETS) latency """
+        ((transaction, byte, syscall, read), batch) = LATENCY_PRESETS[name]
+        return LatencyTransport(transport, transaction, byte, syscall, read, batch=batch, sleep=sleep)
+
+    def inject (self, transactions, size, syscalls, reads=0):
+        (transaction, byte, syscall, read) = self.latency
+        delay = transactions * transaction + size * byte + syscalls * syscall + reads * read
+        self.transactions += transactions
+        self.bytes += size
+        self.syscalls += syscalls
+        self.injected += delay
+        if self.sleep and delay > 0:
+            time.sleep(delay)
+
+    def write (self, addr, data):
+        self.transport.write(addr, data)
+        self.inject(1, len(data), 1)
+
+    def read (self, addr, length):
+        return self.read_segments([(addr, length)])[0]
+
+    def read_segments (self, segments):
+        ret = self.transport.read_segments(segments)
+        size = sum([length for (_, length) in segments])
+        self.inject(len(segments), size, (len(segments) + self.batch-1) // self.batch, len(segments))
+        return ret
+
+    def wall_time (self):
+        """ Returns estimated wall time [s] of the session so far """
+        elapsed = time.perf_counter() - self.t0
+        if self.sleep:
+            return elapsed
+        return elapsed + self.injected
+
+    def summary (self):
+        return "{} transactions, {} bytes, {} syscalls: {:.3f} ms of bus latency, estimated wall time {:.3f} ms".format(
+            self.transactions, self.bytes, self.syscalls, self.injected * 1E3, self.wall_time() * 1E3)
+
+    def close (self):
+        self.transport.close()
+
+class BusLock :
+    """ Cross process advisory lock (flock) on a bus & device,
+    reentrant within the same instance. Keeps track of the time spent waiting """
+    def __init__ (self, name, directory=None):
+        """ name: [str] bus & device identifier, see Transport.name
+        directory: [str] where lock files live, defaults to LOCK_DIR """
+        self.path = os.path.join(directory or LOCK_DIR, "ad9546-{}.lock".format(name))
+        try:
+            try: # flock works on read only descriptors: any user can share the file
+                self.fd = os.open(self.path, os.O_RDONLY | os.O_CREAT | os.O_EXCL, 0o666)
+                os.fchmod(self.fd, 0o666) # regardless of umask
+            except FileExistsError:
+                self.fd = os.open(self.path, os.O_RDONLY)
+        except OSError as e:
+            raise RuntimeError("{}: can't open bus lock ({}), set AD9546_LOCK_DIR or use --no-lock".format(self.path, e.strerror)) from e
+        self.depth = 0
+        self.acquisitions = 0
+        self.contended = 0 # acquisitions that had to wait
+        self.wait = 0.0 # total time spent waiting [s]
+        self.max_wait = 0.0
+
+    def acquire (self, timeout=LOCK_TIMEOUT):
+        """ Acquires the lock, waiting at most `timeout` [s] (forever if None).
+        Returns time spent waiting [s], raises TimeoutError """
+        if self.depth > 0:
+            self.depth += 1
+            return 0.0
+        t0 = time.monotonic()
+        if timeout is None:
+            fcntl.flock(self.fd, fcntl.LOCK_EX)
+        else:
+            backoff = 1E-4
+            while True:
+                try:
+                    fcntl.flock(self.fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    break
+                except BlockingIOError:
+                    if time.monotonic() - t0 >= timeout:
+                        raise TimeoutError("{}: not acquired within {} s".format(self.path, timeout))
+                    time.sleep(backoff)
+                    backoff = min(backoff * 2, 1E-2)
+        wait = time.monotonic() - t0
+        self.depth = 1
+        self.acquisitions += 1
+        if wait > 1E-3:
+            self.contended += 1
+        self.wait += wait
+        self.max_wait = max(self.max_wait, wait)
+        return wait
+
+    def release (self):
+        self.depth -= 1
+        if self.depth == 0:
+            fcntl.flock(self.fd, fcntl.LOCK_UN)
+
+    def close (self):
+        os.close(self.fd)
+
+class Stats :
+    """ Bus cost instrumentation: counts transactions, bytes, syscalls
+    and I/O updates, along with per call latency histograms,
+    everything being tagged by calling section """
+    OPS = {
+        "read": ("reads", "bytes_read"),
+        "write": ("writes", "bytes_written"),
+        "io_update": ("io_updates", None),
+    }
+    def __init__ (self, section="default"):
+        self.current = section
+        self.sections = {}
+
+    def section (self, name):
+        """ Tags following transactions with given section name """
+        self.current = name
+
+    def entry (self, name):
+        if name not in self.sections:
+            self.sections[name] = {
+                "reads": 0,
+                "writes": 0,
+                "io_updates": 0,
+                "bytes_read": 0,
+                "bytes_written": 0,
+                "syscalls": 0,
+                "time": 0.0,
+                "lock_acquisitions": 0,
+                "lock_wait": 0.0,
+                "latency": {"read": {}, "write": {}, "io_update": {}},
+            }
+        return self.sections[name]
+
+    def record (self, op, count, size, syscalls, elapsed):
+        """ Records a bus access.
+        op: "read", "write" or "io_update"
+        count: number of transactions (register segments)
+        size: number of bytes transfered
+        syscalls: number of system calls issued
+        elapsed: duration [s] """
+        entry = self.entry(self.current)
+        (counter, nbytes) = Stats.OPS[op]
+        entry[counter] += count
+        if nbytes is not None:
+            entry[nbytes] += size
+        entry["syscalls"] += syscalls
+        entry["time"] += elapsed
+        # log2 histogram: upper bucket bound [us] -> number of calls
+        bucket = 1
+        while bucket < elapsed * 1E6:
+            bucket <<= 1
+        histogram = entry["latency"][op]
+        histogram[bucket] = histogram.get(bucket, 0) + 1
+
+    def record_lock (self, wait):
+        """ Records a lock acquisition, that took `wait` [s] """
+        entry = self.entry(self.current)
+        entry["lock_acquisitions"] += 1
+        entry["lock_wait"] += wait
+
+    def reset (self):
+        self.sections = {}
+
+    def report (self):
+        """ Returns collected statistics {section: {counter: value}},
+        latency histograms are {upper bucket bound [us]: number of calls} """
+        report = json.loads(json.dumps(self.sections))
+        for name in report:
+            for (op, histogram) in report[name]["latency"].items():
+                report[name]["latency"][op] = dict(sorted(histogram.items(), key=lambda b: int(b[0])))
+        return report
+
+    def summary (self):
+        """ Returns a human readable summary """
+        lines = []
+        for name in self.sections:
+            e = self.sections[name]
+            lines.append("{}: {} reads ({} bytes), {} writes ({} bytes), {} io_updates, {} syscalls, {:.3f} ms".format(
+                name, e["reads"], e["bytes_read"], e["writes"], e["bytes_written"],
+                e["io_updates"], e["syscalls"], e["time"] * 1E3))
+            if e["lock_acquisitions"] > 0:
+                lines.append("    lock: {} acquisitions, {:.3f} ms waiting".format(e["lock_acquisitions"], e["lock_wait"] * 1E3))
+            for op in e["latency"]:
+                histogram = e["latency"][op]
+                if len(histogram) > 0:
+                    buckets = ["<={}us: {}".format(b, histogram[b]) for b in sorted(histogram)]
+                    lines.append("    {}: {}".format(op, ", ".join(buckets)))
+        return "\n".join(lines)
+
+class AD9546 :
+    """ Class to interact with AD9546 chipset,
+    through I2C or SPI bus """
+    def __init__ (self, bus=None, address=None, interface="i2c", speed=SPI_SPEED, transport=None, write_back=False, cache=False, stats=False, lock=False, lock_timeout=LOCK_TIMEOUT, thread_safe=False, queued=False, defer_io_update=False):
+        """ Creates an AD9546 device, 
+        bus: [int] I2C bus number, X in /dev/i2c-X filesystem entry point   
+            or X in /dev/spidevX.Y when interface is spi
+        address: [int] i2c slave address, or chip select Y in /dev/spidevX.Y 
+        interface: "i2c" or "spi"
+        speed: [int] SPI clock [Hz]
+        transport: [Transport] use given transport, bus/address/interface are then disregarded
+        write_back: [bool] hold writes to buffered registers in a shadow cache,
+            successive writes to a register are merged and only committed
+            (contiguous registers in bursts) right before next I/O update
+        cache: [bool] serve configuration registers reads from memory, 
+            once they've been read. Volatile registers (status..) are always read live.
+            Cached values are invalidated on writes and device resets.
+        stats: [bool] collect bus cost statistics, see `self.stats` (Stats)
+        lock: [bool] or [BusLock] serialize logical transactions with other processes
+            accessing the same device, through an advisory lock
+        lock_timeout: [s] maximal lock wait, None to wait forever
+        thread_safe: [bool] serialize accesses from several threads with an internal lock
+        queued: [bool] serve accesses from a single I/O thread, through a request queue.
+            Reads queued by concurrent callers are batched into a single transaction.
+            Each request is atomic, transaction() is then a no-op in callers' threads
+        defer_io_update: [bool] with write_back: I/O updates that only follow
+            configuration registers writes are deferred, and merged with the next one.
+            A deferred I/O update is performed before any volatile register
+            (status, operational controls, serial port) is accessed, see commit()
+        """
+        if transport is not None:
+            self.transport = transport
+        elif interface == "spi":
+            self.transport = SPITransport(bus, address, speed=speed)
+        else:
+            self.transport = I2CTransport(bus, address)
+        self.write_back = write_back
+        self.pending = {} # write back cache: {address: value}
+        self.cache = {} if cache else None # read cache: {address: value}
+        self.unsettled = set() # written, but not I/O updated yet
+        self.defer = defer_io_update and write_back
+        self.deferred = False # I/O update is owed
+        self.stats = Stats() if stats else None
+        if lock is True:
+            lock = BusLock(self.transport.name) if self.transport.name is not None else None
+        self.lock = lock or None
+        self.lock_timeout = lock_timeout
+        self.mutex = threading.RLock() if thread_safe or queued else contextlib.nullcontext()
+        self.requests = None
+        self.worker = None
+        self.callers = threading.RLock() # queued: held by the caller running a transaction
+        if queued:
+            self.requests = queue.Queue()
+            self.worker = threading.Thread(target=self.serve, name="ad9546-io", daemon=True)
+            self.worker.start()
+
+    def delegated (self):
+        """ True when current thread must delegate bus accesses to our I/O thread """
+        return self.worker is not None and threading.current_thread() is not self.worker
+
+    def submit (self, method, *args):
+        """ Queues a request for the I/O thread and waits for its completion """
+        import concurrent.futures
+        future = concurrent.futures.Future()
+        with self.callers: # not within another caller's transaction
+            self.requests.put((method, args, future))
+        return future.result()
+
+    def serve (self):
+        """ I/O thread: serves queued requests, consecutive reads
+        are merged into a single read_segments() transaction """
+        while True:
+            batch = [self.requests.get()]
+            while True:
+                try:
+                    batch.append(self.requests.get_nowait())
+                except queue.Empty:
+                    break
+            i = 0
+            while i < len(batch):
+                if batch[i] is None: # closing
+                    return
+                (method, args, future) = batch[i]
+                if method == "read_segments":
+                    reads = []
+                    while i < len(batch) and batch[i] is not None and batch[i][0] == "read_segments":
+                        reads.append(batch[i])
+                        i += 1
+                    segments = []
+                    for (_, (segs,), _) in reads:
+                        segments += segs
+                    try:
+                        data = self.read_segments(segments)
+                        for (_, (segs,), future) in reads:
+                            future.set_result(data[:len(segs)])
+                            data = data[len(segs):]
+                    except Exception as e:
+                        for (_, _, future) in reads:
+                            future.set_exception(e)
+                    continue
+                try:
+                    future.set_result(getattr(self, method)(*args))
+                except Exception as e:
+                    future.set_exception(e)
+                i += 1
     
     def write_data (self, addr, data):
         """ Writes given data (uint8_t) to given address (uint16_t) """
-        msb = (addr & 0xFF00)>>8
-        lsb = addr & 0xFF
-        self.handle.write_i2c_block_data(self.slv_addr, msb, [lsb, data & 0xFF])
+        self.write_block(addr, [data])
+
+    def write_block (self, addr, data):
+        """ Writes given data (list of uint8_t) to consecutive registers,
+        starting at given address (uint16_t), in a single transaction """
+        if self.delegated():
+            return self.submit("write_block", addr, data)
+        with self.mutex:
+            if self.deferred and not all([addr+i in DEFERRABLE for i in range (len(data))]):
+                self.commit() # operational controls act on current configuration
+            if self.deferred and any([addr+i in self.pending for i in range (len(data))]):
+                self.commit() # value owes its I/O update, don't overwrite it
+            if self.cache is not None:
+                if addr < BUFFERED[0]: # serial port: resets, buffered read mode..
+                    self.invalidate()
+                for i in range (len(data)):
+                    self.cache.pop(addr+i, None)
+                    self.unsettled.add(addr+i)
+            (start, stop) = BUFFERED
+            if self.write_back and addr >= start and addr + len(data)-1 <= stop:
+                for i, d in enumerate(data):
+                    self.pending[addr+i] = d & 0xFF
+            else:
+                for i in range (len(data)):
+                    self.pending.pop(addr+i, None)
+                self.bus_write(addr, data)
+
+    def section (self, name):
+        """ Tags following bus accesses with given section name (statistics) """
+        if self.stats is not None:
+            self.stats.section(name)
+
+    @contextlib.contextmanager
+    def transaction (self):
+        """ Logical transaction: bus accesses issued within
+        are not interleaved with other processes holding the bus lock.
+        Also excludes other threads in thread safe and queued modes. Reentrant """
+        if self.delegated():
+            with self.callers: # other callers wait, I/O thread holds the bus lock for us
+                self.submit("lock_bus")
+                try:
+                    yield
+                finally:
+                    self.submit("unlock_bus")
+            return
+        with self.mutex:
+            self.lock_bus()
+            try:
+                yield
+            finally:
+                self.unlock_bus()
+
+    def lock_bus (self):
+        """ Acquires the bus lock (if any), see transaction() """
+        if self.lock is not None:
+            wait = self.lock.acquire(self.lock_timeout)
+            if self.stats is not None and self.lock.depth == 1:
+                self.stats.record_lock(wait)
+
+    def unlock_bus (self):
+        """ Releases the bus lock (if any), see transaction() """
+        if self.lock is not None:
+            self.lock.release()
+
+    def bus_write (self, addr, data, op="write"):
+        """ Transport write, accounted for in statistics """
+        with self.transaction():
+            if self.stats is None:
+                return self.transport.write(addr, data)
+            syscalls = self.transport.syscalls
+            t = time.perf_counter()
+            self.transport.write(addr, data)
+            elapsed = time.perf_counter() - t
+            self.stats.record(op, 1, len(data), self.transport.syscalls - syscalls, elapsed)
+
+    def bus_read (self, segments):
+        """ Transport read_segments, accounted for in statistics """
+        with self.transaction():
+            if self.stats is None:
+                return self.transport.read_segments(segments)
+            syscalls = self.transport.syscalls
+            t = time.perf_counter()
+            ret = self.transport.read_segments(segments)
+            elapsed = time.perf_counter() - t
+            size = sum([length for (_, length) in segments])
+            self.stats.record("read", len(segments), size, self.transport.syscalls - syscalls, elapsed)
+            return ret
+
+    def update_fields (self, fields):
+        """ Updates several bitfields at once.
+        fields: list of (address (uint16_t), mask, value), value being
+        already shifted to mask position. Each touched register is read once
+        (contiguous registers in a single transaction), all masks are applied
+        in memory, then each register is written back once """
+        if self.delegated():
+            return self.submit("update_fields", fields)
+        updates = {} # {address: (mask, value)}
+        for (addr, mask, value) in fields:
+            (m, v) = updates.get(addr, (0, 0))
+            updates[addr] = (m | mask, (v & (mask ^0xFF)) | (value & mask))
+        runs = []
+        for addr in sorted(updates):
+            if len(runs) > 0 and runs[-1][0] + runs[-1][1] == addr:
+                runs[-1][1] += 1
+            else:
+                runs.append([addr, 1])
+        with self.transaction(): # read-modify-write
+            for ((addr, length), data) in zip(runs, self.read_segments(runs)):
+                for i in range (length):
+                    (mask, value) = updates[addr+i]
+                    data[i] = (data[i] & (mask ^0xFF)) | value
+                self.write_block(addr, data)
+
+    def invalidate (self):
+        """ Drops all cached register values """
+        with self.mutex:
+            if self.cache is not None:
+                self.cache = {}
+
+    def known (self, addr):
+        """ Returns value of register at given address, if we know it
+        without accessing the bus (pending write or cached value), None otherwise """
+        if addr in self.pending:
+            return self.pending[addr]
+        if self.cache is not None:
+            return self.cache.get(addr)
+        return None
 
     def read_data (self, addr):
         """ Reads data at given address (uint16_t) returns uint8_t """
-        msb = (addr & 0xFF00)>>8
-        lsb = addr & 0xFF
-        self.handle.write_i2c_block_data(self.slv_addr, msb, [lsb])
-        data = self.handle.read_byte(self.slv_addr)
-        return data
+        return self.read_segments([(addr, 1)])[0][0]
+
+    def read_block (self, addr, length):
+        """ Reads `length` consecutive registers, starting at given address (uint16_t),
+        in a single transaction. Returns list of uint8_t """
+        return self.read_segments([(addr, length)])[0]
+
+    def read_segments (self, segments):
+        """ Reads several, non contiguous, register segments
+        in as few transactions as the bus allows.
+        segments: list of (address (uint16_t), length)
+        Returns one list of uint8_t per segment """
+        if self.delegated():
+            return self.submit("read_segments", segments)
+        with self.mutex:
+            if self.deferred:
+                for (addr, length) in segments:
+                    if not all([addr+i in CACHEABLE for i in range (length)]):
+                        self.commit() # status reflects current configuration
+                        break
+            return self.read_known(segments)
+
+    def read_known (self, segments):
+        """ read_segments() implementation: serves what we already know
+        (pending writes, cached values) and reads the rest """
+        if len(self.pending) == 0 and self.cache is None:
+            return self.bus_read(segments)
+        ret = []
+        missing = [] # what we actually need to read
+        for (addr, length) in segments:
+            values = [self.known(addr+i) for i in range (length)]
+            unknown = [i for i in range (length) if values[i] is None]
+            if len(unknown) > 0:
+                missing.append((addr + unknown[0], unknown[-1] - unknown[0] +1))
+            ret.append(values)
+        if len(missing) > 0:
+            data = self.bus_read(missing)
+            for ((addr, _), d) in zip(missing, data):
+                for i, v in enumerate(d):
+                    if self.cache is not None and addr+i in CACHEABLE and addr+i not in self.unsettled:
+                        self.cache[addr+i] = v
+            data = iter(data)
+            for ((addr, length), values) in zip(segments, ret):
+                if None in values:
+                    first = values.index(None)
+                    for i, v in enumerate(next(data)):
+                        if values[first+i] is None:
+                            values[first+i] = v
+        return ret
+
+    def flush (self):
+        """ Commits pending writes, one transaction per contiguous run of registers """
+        if self.delegated():
+            return self.submit("flush")
+        with self.mutex:
+            bursts = []
+            for addr in sorted(self.pending):
+                if len(bursts) > 0 and bursts[-1][0] + len(bursts[-1][1]) == addr:
+                    bursts[-1][1].append(self.pending[addr])
+                else:
+                    bursts.append((addr, [self.pending[addr]]))
+            self.pending = {}
+            for (addr, data) in bursts:
+                self.bus_write(addr, data)
 
     def io_update (self):
         """ Performs `I/O update` operation. 
+        Pending writes are committed beforehand.
         Refer to device datasheet """
-        self.write_data(0x000F, 0x01)
+        if self.delegated():
+            return self.submit("io_update")
+        with self.transaction():
+            if self.defer and all([addr in DEFERRABLE for addr in self.pending]):
+                self.deferred = True
+                return
+            self.commit(force=True)
+
+    def commit (self, force=False):
+        """ Performs deferred I/O update, if any (or forced) """
+        if not (self.deferred or force):
+            return
+        with self.transaction():
+            self.flush()
+            self.bus_write(0x000F, [0x01], op="io_update")
+            self.unsettled = set()
+            self.deferred = False
+
+    def close (self):
+        if self.worker is not None: # serves remaining requests, then stops
+            self.requests.put(None)
+            self.worker.join()
+            self.worker = None
+        self.commit()
+        self.flush()
+        self.transport.close()
+        if self.lock is not None:
+            self.lock.close()
+
+BUS_EXECUTORS = {} # bus: single worker executor, shared by devices on that bus
+BUS_EXECUTORS_LOCK = threading.Lock()
+
+def bus_executor (bus):
+    """ Returns the executor serving given bus """
+    import concurrent.futures
+    with BUS_EXECUTORS_LOCK:
+        if bus not in BUS_EXECUTORS:
+            BUS_EXECUTORS[bus] = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix="ad9546-{}".format(bus))
+        return BUS_EXECUTORS[bus]
+
+class AsyncAD9546 :
+    """ Asyncio interface to AD9546 chipset.
+    Accesses are served by an executor per bus: devices on different buses
+    proceed in parallel, devices sharing a bus are serialized """
+    def __init__ (self, *args, **kwargs):
+        """ Creates an AD9546 device, args and kwargs are passed to AD9546 """
+        self.dev = AD9546(*args, **kwargs)
+        bus = self.dev.transport.bus
+        self.executor = bus_executor(bus if bus is not None else id(self.dev))
+
+    async def run (self, func, *args):
+        """ Runs func(dev, *args) in the bus executor, dev being our AD9546.
+        Use it to group several accesses (status decoders..) in a single job """
+        import asyncio
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, functools.partial(func, self.dev, *args))
+
+    async def write_data (self, addr, data):
+        return await self.run(AD9546.write_data, addr, data)
+
+    async def write_block (self, addr, data):
+        return await self.run(AD9546.write_block, addr, data)
+
+    async def update_fields (self, fields):
+        return await self.run(AD9546.update_fields, fields)
+
+    async def read_data (self, addr):
+        return await self.run(AD9546.read_data, addr)
+
+    async def read_block (self, addr, length):
+        return await self.run(AD9546.read_block, addr, length)
+
+    async def read_segments (self, segments):
+        return await self.run(AD9546.read_segments, segments)
+
+    async def io_update (self):
+        return await self.run(AD9546.io_update)
+
+    async def close (self):
+        return await self.run(AD9546.close)
+
+def add_interface_args (parser):
+    """ Adds device interface options to given argparse parser,
+    every script accepts these """
+    parser.add_argument(
+        "--spi",
+        action="store_true",
+        help="Use /dev/spidevX.Y instead of /dev/i2c-X: bus=X, address=Y (chip select)",
+    )
+    parser.add_argument(
+        "--spi-speed",
+        type=int,
+        default=SPI_SPEED,
+        help="SPI clock [Hz], defaults to {}".format(SPI_SPEED),
+    )
+    parser.add_argument(
+        "--spi-ascending",
+        action="store_true",
+        help="Device streams in ascending address order (0x0000 address ascension bits set), descending by default",
+    )
+    parser.add_argument(
+        "--sim",
+        metavar="regmap",
+        nargs="?",
+        const="",
+        help="Simulated device (no hardware): optionnaly seeded with given json register map",
+    )
+    parser.add_argument(
+        "--record",
+        metavar="log",
+        help="Record every bus transaction into given binary log",
+    )
+    parser.add_argument(
+        "--replay",
+        metavar="log",
+        help="Replay a recorded session (no hardware): bus and address are disregarded",
+    )
+    parser.add_argument(
+        "--latency",
+        metavar="preset",
+        choices=sorted(LATENCY_PRESETS),
+        help="Inject bus latency ({}), typically with --sim, and report estimated wall time on stderr".format(", ".join(sorted(LATENCY_PRESETS))),
+    )
+    parser.add_argument(
+        "--lock-timeout",
+        type=float,
+        default=LOCK_TIMEOUT,
+        help="Maximal time [s] to wait for the bus lock, held by other processes accessing the device. Defaults to {} s".format(LOCK_TIMEOUT),
+    )
+    parser.add_argument(
+        "--no-lock",
+        action="store_true",
+        help="Do not take the cross process bus lock",
+    )
+    parser.add_argument(
+        "--stats",
+        nargs="?",
+        const="text",
+        choices=["text", "json"],
+        help="Report bus cost statistics (transactions, bytes, syscalls, latencies) on stderr when done",
+    )
+
+def open_device (args, **kwargs):
+    """ Opens AD9546 device described by parsed command line,
+    kwargs are passed to AD9546 (write_back, ..) """
+    if DEVICE is not None:
+        return DEVICE
+    if args.stats:
+        kwargs["stats"] = True
+    if not args.no_lock:
+        kwargs["lock"] = True
+        kwargs["lock_timeout"] = args.lock_timeout
+    if args.replay:
+        transport = ReplayTransport(args.replay)
+    elif args.sim is not None:
+        key = ("sim", args.sim)
+        transport = shared_transport(key, lambda: SimTransport(args.sim or None))
+    elif args.spi:
+        key = ("spi", int(args.bus), int(args.address, 16), args.spi_speed, args.spi_ascending)
+        transport = shared_transport(key, lambda: SPITransport(int(args.bus), int(args.address, 16), speed=args.spi_speed, ascending=args.spi_ascending))
+    else:
+        key = ("i2c", int(args.bus), int(args.address, 16))
+        transport = shared_transport(key, lambda: I2CTransport(int(args.bus), int(args.address, 16)))
+    if SHARED is not None and not args.replay and kwargs.get("lock"):
+        kwargs["lock"] = SHARED[key][1] or False
+    if args.latency:
+        transport = LatencyTransport.preset(transport, args.latency)
+        at_exit(lambda: print("{}: {}".format(args.latency, transport.summary()), file=sys.stderr))
+    if args.record:
+        transport = RecordTransport(transport, args.record)
+        at_exit(transport.close if SHARED is None else transport.fd.close)
+    dev = AD9546(transport=transport, **kwargs)
+    if args.stats:
+        dev.section(os.path.basename(sys.argv[0]))
+        at_exit(report_stats, dev, args.stats)
+    return dev
+
+def shared_transport (key, opener):
+    """ Returns transport identified by key, opened with opener().
+    Within the daemon, transports (and their bus lock) are opened once
+    and shared by all script invocations """
+    if SHARED is None:
+        return opener()
+    if key not in SHARED:
+        transport = opener()
+        lock = BusLock(transport.name) if transport.name is not None else None
+        SHARED[key] = (transport, lock)
+    return SHARED[key][0]
+
+def at_exit (func, *args):
+    """ Registers func(*args) to run once the script is done """
+    if EXIT_HOOKS is not None:
+        EXIT_HOOKS.append(functools.partial(func, *args))
+    else:
+        atexit.register(func, *args)
+
+def load_script (name):
+    """ Imports given script (file name, next to this module or installed), once.
+    Only our scripts (see COMMANDS) are accepted """
+    if name not in SCRIPTS:
+        if name not in [script for (script, _) in COMMANDS.values()]:
+            raise ValueError("unknown script \"{}\"".format(name))
+        paths = [os.path.join(d, name) for d in SCRIPTS_DIRS if os.path.isfile(os.path.join(d, name))]
+        if len(paths) == 0:
+            raise ValueError("unknown script \"{}\"".format(name))
+        path = paths[0]
+        spec = importlib.util.spec_from_file_location(name[:-3].replace("-", "_"), path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        SCRIPTS[name] = module
+    return SCRIPTS[name]
+
+def peer_uid (sock):
+    """ User id of the process on the other end of a Unix socket """
+    import socket
+    creds = sock.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED, struct.calcsize("3i"))
+    return struct.unpack("3i", creds)[1]
+
+def daemon_refuses (argv):
+    """ True when argv holds options the daemon won't run (file writing ones),
+    abbreviations included """
+    for arg in argv:
+        name = arg.split("=")[0]
+        if len(name) > 2 and any([opt.startswith(name) for opt in DAEMON_REFUSED]):
+            return True
+    return False
+
+def daemon_request (script, argv, cwd=None, path=DAEMON_SOCKET):
+    """ Runs given script (file name) with given arguments within ad9546d.py daemon.
+    Returns {"stdout": str, "stderr": str, "code": exit code},
+    raises PermissionError when the daemon belongs to another user """
+    request = {"script": script, "argv": list(argv), "cwd": cwd or os.getcwd()}
+    import socket
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(path)
+        if peer_uid(sock) != os.getuid():
+            raise PermissionError("{}: daemon run by another user".format(path))
+        sock.sendall((json.dumps(request) + "\n").encode("utf-8"))
+        with sock.makefile("rb") as fd:
+            return json.loads(fd.readline())
+
+def run_script (main, argv, script=None):
+    """ Script entry point: forwards the invocation to ad9546d.py daemon
+    when it is running (unless AD9546_NO_DAEMON is set), runs main(argv) otherwise.
+    Invocations that main.local(argv) flags as local (streaming ones)
+    or that write files are never forwarded.
+    script: script file name, defaults to the running one """
+    local = getattr(main, "local", None)
+    if (local is not None and local(argv)) or daemon_refuses(argv):
+        return main(argv)
+    if SHARED is None and "AD9546_NO_DAEMON" not in os.environ and os.path.exists(DAEMON_SOCKET):
+        try:
+            reply = daemon_request(script or os.path.basename(sys.argv[0]), argv)
+        except (ConnectionRefusedError, FileNotFoundError): # stale socket
+            return main(argv)
+        except PermissionError as e: # not ours, don't trust it
+            print(e, file=sys.stderr)
+            return main(argv)
+        sys.stdout.write(reply["stdout"])
+        sys.stderr.write(reply["stderr"])
+        sys.exit(reply["code"])
+    return main(argv)
+
+def report_stats (dev, fmt="text"):
+    """ Prints device statistics on stderr """
+    if fmt == "json":
+        print(json.dumps(dev.stats.report()), file=sys.stderr)
+    else:
+        print(dev.stats.summary(), file=sys.stderr)
+
+COMMANDS = { # `ad9546` subcommand: (script, description)
+    "batch": ("batch.py", "Runs a batch of commands against a single device"),
+    "calib": ("calib.py", "Calibrates core portions of the clock"),
+    "daemon": ("ad9546d.py", "Keeps devices open and serves scripts invocations"),
+    "distrib": ("distrib.py", "Clock distribution and output signals"),
+    "irq": ("irq.py", "IRQ clearing & masking operations"),
+    "misc": ("misc.py", "Miscellaneous operations"),
+    "mx-pin": ("mx-pin.py", "Mx programmable I/O management"),
+    "pll": ("pll.py", "APLLx and DPLLx cores management"),
+    "power-down": ("power-down.py", "Power saving and management"),
+    "ref-input": ("ref-input.py", "Reference & input signals management"),
+    "regmap": ("regmap.py", "Load or dump a register map preset"),
+    "regmap-diff": ("regmap-diff.py", "Loaded / dumped regmap differentiator"),
+    "reset": ("reset.py", "Device reset operations"),
+    "status": ("status.py", "Status monitoring"),
+    "sysclk": ("sysclk.py", "Sys clock control & management"),
+    "uts": ("uts.py", "User Time Stamping management"),
+}
+
+def cli (argv=None):
+    """ `ad9546 <command> [options]` console entry point.
+    Only the selected command gets imported """
+    argv = sys.argv[1:] if argv is None else argv
+    if len(argv) == 0 or argv[0] in ["-h", "--help"]:
+        print("usage: ad9546 <command> [-h] [options]\n\ncommands:")
+        for name in COMMANDS:
+            print("  {:<12} {}".format(name, COMMANDS[name][1]))
+        sys.exit(0 if len(argv) > 0 else 2)
+    if argv[0] not in COMMANDS:
+        print("ad9546: unknown command \"{}\", see ad9546 -h".format(argv[0]), file=sys.stderr)
+        sys.exit(2)
+    (script, _) = COMMANDS[argv[0]]
+    sys.argv[0] = "ad9546 {}".format(argv[0])
+    run_script(load_script(script).main, argv[1:], script=script)
@@ -0,0 +1,108 @@
+#! /usr/bin/env python3
+#################################################################
+# Guillaume W. Bres, 2022          <guillaume.bressaix@gmail.com>
+#################################################################
+# ad9546d.py: AD9546 daemon, keeps devices open and runs
+# scripts invocations forwarded over a Unix socket
+#################################################################
+import io
+import os
+import sys
+import json
+import signal
+import argparse
+import traceback
+import contextlib
+import socketserver
+import ad9546
+
+def run (request):
+    """ Runs a script invocation: {"script": name, "argv": [], "cwd": path},
+    returns {"stdout": str, "stderr": str, "code": exit code} """
+    (stdout, stderr) = (io.StringIO(), io.StringIO())
+    code = 0
+    cwd = os.getcwd()
+    argv0 = sys.argv[0]
+    if request["script"] in ["ad9546d.py", "batch.py"]:
+        return {"stdout": "", "stderr": "{} can't be served by the daemon\n".format(request["script"]), "code": 1}
+    if ad9546.daemon_refuses(request["argv"]):
+        return {"stdout": "", "stderr": "{} can't be served by the daemon, run without it\n".format(
+            " / ".join(ad9546.DAEMON_REFUSED)), "code": 1}
+    ad9546.EXIT_HOOKS = []
+    with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(stderr):
+        try:
+            main = ad9546.load_script(request["script"]).main
+            os.chdir(request.get("cwd", cwd))
+            sys.argv[0] = request["script"]
+            main(request["argv"])
+        except SystemExit as e: # argparse, -h..
+            if isinstance(e.code, int) or e.code is None:
+                code = e.code or 0
+            else:
+                print(e.code, file=sys.stderr)
+                code = 1
+        except Exception:
+            traceback.print_exc()
+            code = 1
+        finally:
+            for hook in reversed(ad9546.EXIT_HOOKS): # atexit order
+                try:
+                    hook()
+                except Exception:
+                    traceback.print_exc()
+            ad9546.EXIT_HOOKS = None
+            sys.argv[0] = argv0
+            os.chdir(cwd)
+    return {"stdout": stdout.getvalue(), "stderr": stderr.getvalue(), "code": code}
+
+class Handler (socketserver.StreamRequestHandler):
+    """ One json request per line, one json reply per line,
+    until client closes the connection """
+    def handle (self):
+        if ad9546.peer_uid(self.request) != os.getuid():
+            return # other users are not served
+        for line in self.rfile:
+            reply = run(json.loads(line))
+            self.wfile.write((json.dumps(reply) + "\n").encode("utf-8"))
+            self.wfile.flush()
+
+def main (argv):
+    parser = argparse.ArgumentParser(description="AD9546 daemon: keeps devices open, scripts forward their invocations to it")
+    parser.add_argument(
+        "--socket",
+        type=str,
+        default=ad9546.DAEMON_SOCKET,
+        help="Unix socket to listen on, defaults to {} ($AD9546_SOCKET)".format(ad9546.DAEMON_SOCKET),
+    )
+    args = parser.parse_args(argv)
+    directory = os.path.dirname(os.path.abspath(args.socket))
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    st = os.stat(directory)
+    if st.st_uid != os.getuid() or st.st_mode & 0o022:
+        sys.exit("{}: must be owned by you and not writable by others".format(directory))
+    if os.path.exists(args.socket): # stale socket
+        os.unlink(args.socket)
+    ad9546.SHARED = {}
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    # invocations are served one at a time
+    server = socketserver.UnixStreamServer(args.socket, Handler)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        os.unlink(args.socket)
+        for (transport, lock) in ad9546.SHARED.values():
+            transport.close()
+            if lock is not None:
+                lock.close()
+
+def local (argv):
+    """ The daemon itself is never forwarded to a running one """
+    return True
+
+main.local = local
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
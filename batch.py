@@ -0,0 +1,87 @@
+#! /usr/bin/env python3
+#################################################################
+# Guillaume W. Bres, 2022          <guillaume.bressaix@gmail.com>
+#################################################################
+# batch.py: runs a batch of commands against a single device
+#################################################################
+import sys
+import shlex
+import argparse
+import ad9546
+from ad9546 import *
+
+def parse_batch (fd):
+    """ Parses batch file content: one command per line,
+    `script [options]` with bus & address omitted, # comments.
+    Returns list of (line number, script file name, argv) """
+    commands = []
+    for (n, line) in enumerate(fd):
+        argv = shlex.split(line, comments=True)
+        if len(argv) == 0:
+            continue
+        script = argv[0] if argv[0].endswith(".py") else argv[0] + ".py"
+        if script in ["batch.py", "ad9546d.py"]:
+            raise ValueError("line {}: {} can't be batched".format(n+1, script))
+        if script not in [name for (name, _) in COMMANDS.values()]:
+            raise ValueError("line {}: unknown script {}".format(n+1, script))
+        commands.append((n+1, script, argv[1:]))
+    return commands
+
+def main (argv):
+    parser = argparse.ArgumentParser(description="Runs a batch of commands against a single AD9546, in a single process")
+    parser.add_argument(
+        "bus",
+        type=int,
+        help="I2C bus (int)",
+    )
+    parser.add_argument(
+        "address",
+        type=str,
+        help="I2C slv address (hex)",
+    )
+    parser.add_argument(
+        "batch",
+        type=str,
+        help="Batch file, one command per line (`distrib --ch 0 ..`, bus and address omitted), - for stdin",
+    )
+    parser.add_argument(
+        "--no-defer",
+        action="store_true",
+        help="Perform every I/O update as requested, instead of merging them when safe",
+    )
+    add_interface_args(parser)
+    args = parser.parse_args(argv)
+
+    if args.batch == "-":
+        commands = parse_batch(sys.stdin)
+    else:
+        with open(args.batch) as fd:
+            commands = parse_batch(fd)
+    # open device, once for all commands
+    dev = open_device(args, write_back=True, defer_io_update=not args.no_defer)
+    ad9546.DEVICE = dev
+    code = 0
+    try:
+        for (n, script, options) in commands:
+            dev.section("{}:{} {}".format(args.batch, n, " ".join([script] + options)))
+            try:
+                load_script(script).main([str(args.bus), args.address] + options)
+            except SystemExit as e: # argparse errors..
+                if e.code:
+                    print("{}:{}: {} failed".format(args.batch, n, script), file=sys.stderr)
+                    code = e.code if isinstance(e.code, int) else 1
+                    break
+    finally:
+        ad9546.DEVICE = None
+        dev.close() # deferred I/O update, pending writes
+    sys.exit(code)
+
+def local (argv):
+    """ Batch files (stdin, relative paths) belong to the caller:
+    batches are never forwarded to the daemon """
+    return True
+
+main.local = local
+
+if __name__ == "__main__":
+    run_script(main, sys.argv[1:])
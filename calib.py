@@ -31,9 +31,10 @@ def main (argv):
             action="store_true",
             help=helper,
         )
+    add_interface_args(parser)
     args = parser.parse_args(argv)
 
-    dev = AD9546(int(args.bus), int(args.address, 16)) # open device
+    dev = open_device(args) # open device
 
     dev.write_data(0x2000, 0x00)
     dev.io_update()
@@ -55,4 +56,4 @@ def main (argv):
     dev.io_update()
 
 if __name__ == "__main__":
-    main(sys.argv[1:])
+    run_script(main, sys.argv[1:])
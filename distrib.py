@@ -87,10 +87,15 @@ def main (argv):
                     type=v_type,
                     help=v_helper,
                 )
+    add_interface_args(parser)
     args = parser.parse_args(argv)
     # open device
-    dev = AD9546(args.bus, int(args.address, 16))
+    dev = open_device(args, write_back=True)
+    with dev.transaction(): # read-modify-write sequences are not interleaved with other processes
+        return configure(dev, args)
 
+def configure (dev, args):
+    """ Applies requested distribution settings """
     # Special Flags
     if args.sync_all:
         r = dev.read_data(0x2000)
@@ -609,4 +614,4 @@ def main (argv):
         return 0 # force stop, to avoid corruption on misusage
 
 if __name__ == "__main__":
-    main(sys.argv[1:])
+    run_script(main, sys.argv[1:])
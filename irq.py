@@ -49,8 +49,9 @@ def main (argv):
             action="store_true",
             help=helper,
         )
+    add_interface_args(parser)
     args = parser.parse_args(argv)
-    dev = AD9546(args.bus, int(args.address, 16)) # open device
+    dev = open_device(args) # open device
 
     if args.all:
         dev.write_data(0x2005, 0x01)
@@ -96,4 +97,4 @@ def main (argv):
         dev.write_data(0x2007, 0x10)
 
 if __name__ == "__main__":
-    main(sys.argv[1:])
+    run_script(main, sys.argv[1:])
@@ -29,9 +29,10 @@ def main (argv):
             type=v_type,
             help=helper,
         )
+    add_interface_args(parser)
     args = parser.parse_args(argv)
     # open device
-    dev = AD9546(args.bus, int(args.address, 16))
+    dev = open_device(args)
 
     if args.temp_thres_high:
         value = int(args.temp_thres_high * pow(2,7))
@@ -43,4 +44,4 @@ def main (argv):
         write_data(handle, address, 0x2904, (value & 0xFF00)>>8)
 
 if __name__ == "__main__":
-    main(sys.argv[1:])
+    run_script(main, sys.argv[1:])
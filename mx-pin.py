@@ -63,9 +63,10 @@ def main (argv):
         type=str,
         help="Ouptut current (drive strength); default is 6mA",
     )
+    add_interface_args(parser)
     args = parser.parse_args(argv)
     # open device
-    dev = AD9546(args.bus, int(args.address,16))
+    dev = open_device(args)
 
     pin = args.pin
     pin_n = int(pin.strip("M"))
@@ -98,24 +99,16 @@ def main (argv):
     else:
         reg = 0x0101 
 
-    r = dev.read_data(reg)
-    mask = 0x03 << ((pin_n % 4)*2)
-    r &= (mask ^0xFF) #mask bits out
+    shift = (pin_n % 4)*2
+    fields = []
     if args.rcv:
-        dev.write_data(reg, r | (recv[args.rcv] << ((pin_n%4)*2))) # assign
+        fields.append((reg, 0x03 << shift, recv[args.rcv] << shift))
     elif args.drv:
-        dev.write_data(reg, r | (drv[args.drv] << ((pin_n%4)*2))) # assign
-    
-    base = 0x0102
-    r = dev.read_data(base + pin_n)
-    r &= 0x7F # mask bit out
-    dev.write_data(base + pin_n, r | (modes[args.mode] <<7))
-
-    r = dev.read_data(0x0109)
-    mask = 0x01 << pin_n
-    r &= (mask ^0xFF) # mask out
-    dev.write_data(0x0109, r | (currents[args.current] << pin_n))
+        fields.append((reg, 0x03 << shift, drv[args.drv] << shift))
+    fields.append((0x0102 + pin_n, 0x80, modes[args.mode] << 7))
+    fields.append((0x0109, 0x01 << pin_n, currents[args.current] << pin_n))
+    dev.update_fields(fields) # each register read & written once
     dev.io_update()
 
 if __name__ == "__main__":
-    main(sys.argv[1:])
+    run_script(main, sys.argv[1:])
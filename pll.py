@@ -60,9 +60,14 @@ def main (argv):
                     type=v_type,
                     help=v_helper,
                 )
+    add_interface_args(parser)
     args = parser.parse_args(argv)
-    dev = AD9546(args.bus, int(args.address, 16)) # open device
+    dev = open_device(args, write_back=True) # open device
+    with dev.transaction(): # read-modify-write sequences are not interleaved with other processes
+        return configure(dev, args)
 
+def configure (dev, args):
+    """ Applies requested PLL settings """
     if args.free_run:
         if args.channel == 'all' or args.channel == '0':
             r = dev.read_data(0x2105) 
@@ -92,4 +97,4 @@ def main (argv):
     dev.io_update()
 
 if __name__ == "__main__":
-    main(sys.argv[1:])
+    run_script(main, sys.argv[1:])
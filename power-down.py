@@ -35,10 +35,15 @@ def main (argv):
             action="store_true",
             help=helper,
         )
+    add_interface_args(parser)
     args = parser.parse_args(argv)
     # open device
-    dev = AD9546(args.bus, int(args.address, 16))
+    dev = open_device(args)
+    with dev.transaction(): # read-modify-write sequences are not interleaved with other processes
+        return configure(dev, args)
 
+def configure (dev, args):
+    """ Applies requested power down settings """
     if args.all:
         reg = dev.read_data(0x2000)
         if args.clear:
@@ -85,4 +90,4 @@ def main (argv):
     dev.io_update()
 
 if __name__ == "__main__":
-    main(sys.argv[1:])
+    run_script(main, sys.argv[1:])
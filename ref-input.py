@@ -58,11 +58,16 @@ def main (argv):
                 choices=v_choices,
                 help=v_helper,
             )
+    add_interface_args(parser)
     args = parser.parse_args(argv)
-    ref = args.ref
     # open device
-    dev = AD9546(args.bus, int(args.address, 16))
+    dev = open_device(args, write_back=True)
+    with dev.transaction(): # read-modify-write sequences are not interleaved with other processes
+        return configure(dev, args)
 
+def configure (dev, args):
+    """ Applies requested reference input settings """
+    ref = args.ref
     if args.coupling:
         couplings = {
             'AC 1.2V': 0,
@@ -481,4 +486,4 @@ def main (argv):
     dev.io_update()
 
 if __name__ == "__main__":
-    main(sys.argv[1:])
+    run_script(main, sys.argv[1:])
@@ -32,10 +32,15 @@ def main (argv):
             action="store_true",
             help=helper,
         )
+    add_interface_args(parser)
     args = parser.parse_args(argv)
     # open device
-    dev = AD9546(args.bus, int(args.address, 16))
+    dev = open_device(args)
+    with dev.transaction(): # read-modify-write sequences are not interleaved with other processes
+        return configure(dev, args)
 
+def configure (dev, args):
+    """ Performs requested reset operations """
     if args.soft:
         r = dev.read_data(0x0000)
         r &= 0x7E # clear bits
@@ -51,4 +56,4 @@ def main (argv):
         dev.write_data(0x0001, r | 0x80)
 
 if __name__ == "__main__":
-    main(sys.argv[1:])
+    run_script(main, sys.argv[1:])
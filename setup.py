@@ -6,8 +6,15 @@ except ImportError:
     from distutils.core import setup
 
 setup(name="adi-ad9546",
-    py_modules=["ad9546"],
+    py_modules=["ad9546", "status"],
+    entry_points={
+        "console_scripts": [
+            "ad9546=ad9546:cli",
+        ],
+    },
     scripts=[
+        "ad9546d.py",
+        "batch.py",
         "calib.py",
         "distrib.py",
         "pll.py",
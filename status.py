@@ -3,10 +3,15 @@
 # Guillaume W. Bres, 2022          <guillaume.bressaix@gmail.com>
 #################################################################
 # status.py: AD9546 status monitoring (read only tool)
+# Also a library: decode_<section>(dev) decoders and report(dev, sections)
+# take an open AD9546 and return plain dicts
 #################################################################
+import re
 import sys
 import math
 import json
+import time
+import fnmatch
 import argparse
 from ad9546 import *
 
@@ -27,6 +32,33 @@ def filter_by_key (tree, key):
                 ret[k] = tree[k]
     return ret
 
+def filter_by_keys (status, filters):
+    """ Applies a list of key filters to a {category: tree} report,
+    each filter narrowing the previous result. Categories without
+    a single match are preserved as is. Trees are either status reports
+    or section layouts, filtering only depends on keys """
+    for _filter in filters:
+        if _filter == filters[0]: # first filter
+            # => create work structure
+            filtered = {}
+        for category in status.keys(): # filter all categories
+            if _filter == filters[0]: # first filter
+                # => create work structure
+                filtered[category] = {}
+                # and work from status report
+                data = filter_by_key(status[category], _filter)
+            else:
+                # work from already filtered data
+                data = filter_by_key(filtered[category], _filter)
+
+            if len(data) == 0: # not a single match
+                # assumes incorrect key filter 
+                # ==> preserve complete data set
+                filtered[category] = status[category].copy()
+            else:
+                filtered[category] |= data
+    return filtered
+
 def filter_by_value (tree, value):
     ret = {} 
     for k in tree.keys():
@@ -40,6 +72,15 @@ def filter_by_value (tree, value):
                 ret[k] = tree[k] # construct 
     return ret
 
+def flatten (tree, path=()):
+    """ Returns {path: value} for every leaf of given (decoded) tree """
+    if type(tree) is not dict:
+        return {path: tree}
+    ret = {}
+    for k in tree.keys():
+        ret.update(flatten(tree[k], path + (k,)))
+    return ret
+
 def unpack (tree):
     ret = {}
     for k in tree.keys(): 
@@ -59,6 +100,1285 @@ def unpack (tree):
     else:
         return ret
 
+QUERY_OPS = ["!=", "<=", ">=", "=", "<", ">", "~"]
+NUMBER = re.compile(r"\s*[-+]?(\d+\.?\d*|\.\d+)([eE][-+]?\d+)?")
+
+def number (value):
+    """ Returns numerical value of a status field: numbers,
+    hex strings and readings like "51.2 degC". None if not numerical """
+    if type(value) is bool:
+        return None
+    if type(value) in [int, float]:
+        return value
+    try:
+        return int(value, 0)
+    except ValueError:
+        pass
+    m = NUMBER.match(value)
+    if m is None:
+        return None
+    return float(m.group(0))
+
+class Query:
+    """ Compiled status query: `path[op value]`.
+    path: dot separated key patterns, each one being either a glob
+    (`*`, `?`, `[..]`), a /regex/, or `**` matching any number of levels.
+    A path matching a branch retains the complete branch.
+    op: optionnal value predicate, applied to the retained fields:
+      `=`, `!=`: (case insensitive) match, numerical when both sides are numbers
+      `<`, `<=`, `>`, `>=`: numerical comparisons
+      `~`: regex search in value """
+    def __init__ (self, expr):
+        self.expr = expr
+        self.path = []
+        (self.op, self.value) = (None, None)
+        i = 0
+        while i < len(expr):
+            if expr[i] == '/': # regex
+                end = expr.find('/', i+1)
+                if end < 0:
+                    raise ValueError("query \"{}\": unterminated regex".format(expr))
+                try:
+                    self.path.append(re.compile(expr[i+1:end]))
+                except re.error as e:
+                    raise ValueError("query \"{}\": {}".format(expr, e))
+                i = end +1
+            else:
+                end = i
+                while end < len(expr) and expr[end] not in ".!=<>~":
+                    end += 1
+                pattern = expr[i:end]
+                if len(pattern) == 0:
+                    raise ValueError("query \"{}\": empty key pattern".format(expr))
+                if pattern == "**":
+                    self.path.append(pattern)
+                elif any([c in pattern for c in "*?["]):
+                    self.path.append(re.compile(fnmatch.translate(pattern)))
+                else: # plain key
+                    self.path.append(pattern)
+                i = end
+            if i == len(expr):
+                break
+            if expr[i] == '.':
+                i += 1
+                continue
+            for op in QUERY_OPS:
+                if expr.startswith(op, i):
+                    (self.op, self.value) = (op, expr[i+len(op):])
+                    break
+            if self.op is None:
+                raise ValueError("query \"{}\": unexpected \"{}\"".format(expr, expr[i]))
+            break
+        if len(self.path) == 0:
+            raise ValueError("query \"{}\": empty path".format(expr))
+        if self.op in ["<", "<=", ">", ">="]:
+            self.number = number(self.value)
+            if self.number is None:
+                raise ValueError("query \"{}\": \"{}\" is not a number".format(expr, self.value))
+        elif self.op == "~":
+            self.regex = re.compile(self.value)
+        elif self.op is not None:
+            self.number = number(self.value)
+
+    def step (self, i, key):
+        """ Matches given key at path position i,
+        returns list of next positions """
+        if i == len(self.path): # within a retained branch
+            return [i]
+        pattern = self.path[i]
+        if pattern == "**":
+            return [i] + self.step(i+1, key)
+        if type(pattern) is str:
+            return [i+1] if pattern == key else []
+        return [i+1] if pattern.fullmatch(key) else []
+
+    def matched (self, i):
+        """ Returns True if path is entirely matched at position i """
+        if i == len(self.path):
+            return True
+        return self.path[i] == "**" and self.matched(i+1)
+
+    def test (self, value):
+        """ Applies value predicate """
+        if self.op is None:
+            return True
+        if self.op == "~":
+            return self.regex.search(str(value)) is not None
+        if self.op in ["=", "!="]:
+            n = number(value)
+            if n is not None and self.number is not None:
+                equal = n == self.number
+            else:
+                equal = str(value).lower() == self.value.lower()
+            return equal if self.op == "=" else not equal
+        n = number(value)
+        if n is None:
+            return False
+        if self.op == "<":
+            return n < self.number
+        if self.op == "<=":
+            return n <= self.number
+        if self.op == ">":
+            return n > self.number
+        return n >= self.number
+
+def select (tree, queries, layout=False, states=None):
+    """ Returns the subset of given tree matched by any of the given queries,
+    in a single traversal. Retained branches are not copied.
+    layout: tree is a section layout (Field leaves), value predicates
+    can't be evaluated yet and are considered true """
+    if states is None:
+        states = [(q, 0) for q in queries]
+    ret = {}
+    for k in tree.keys():
+        nxt = []
+        for (q, i) in states:
+            for j in q.step(i, k):
+                if (q, j) not in nxt:
+                    nxt.append((q, j))
+        if len(nxt) == 0:
+            continue
+        done = [q for (q, j) in nxt if q.matched(j)]
+        if type(tree[k]) is dict:
+            if any([layout or q.op is None for q in done]):
+                ret[k] = tree[k] # complete branch
+            else:
+                data = select(tree[k], queries, layout, nxt)
+                if len(data) > 0:
+                    ret[k] = data
+        elif any([layout or q.test(tree[k]) for q in done]):
+            ret[k] = tree[k]
+    return ret
+
+done = {
+    0: 'idle',
+    1: 'done',
+}
+enabled = {
+    0: 'disabled',
+    1: 'enabled',
+}
+active = {
+    0: 'disabled',
+    1: 'active',
+}
+available = {
+    0: "unavailable",
+    1: "available",
+}
+
+class Field:
+    """ Status field, decoded from a register image:
+    (`width` bytes little endian at `addr`) & mask >> shift,
+    then sign extended to `sign` bits, multiplied by `scale`
+    and mapped through `enum`: either a dict, or a callable that also
+    receives the values of the `args` fields """
+    def __init__ (self, path, addr, width=1, mask=None, shift=0, sign=None, scale=None, enum=None, args=[]):
+        self.path = tuple(path.split(".")) if path is not None else None
+        self.addr = addr
+        self.width = width
+        self.mask = mask
+        self.shift = shift
+        self.sign = sign
+        self.scale = scale
+        self.enum = enum
+        self.args = args
+
+    def registers (self):
+        """ Returns the set of register addresses this field is decoded from """
+        regs = set(range(self.addr, self.addr + self.width))
+        for arg in self.args:
+            regs |= arg.registers()
+        return regs
+
+    def value (self, image):
+        """ Decodes this field from given register image """
+        v = int.from_bytes(image[self.addr:self.addr + self.width], 'little')
+        if self.mask is not None:
+            v &= self.mask
+        v >>= self.shift
+        if self.sign is not None:
+            v = sign_extend(v, self.sign)
+        if self.scale is not None:
+            v = v * self.scale
+        if self.enum is None:
+            return v
+        if isinstance(self.enum, dict):
+            return self.enum[v]
+        return self.enum(v, *[arg.value(image) for arg in self.args])
+
+def bit (path, addr, n, enum=bool):
+    """ Single bit field """
+    return Field(path, addr, mask=1<<n, shift=n, enum=enum)
+
+class Section:
+    """ Status section: field table, decoded from a single register image.
+    latch: requires an I/O update prior reading.
+    branches: paths that are always reported, even if empty """
+    def __init__ (self, fields, latch=False, branches=[]):
+        self.fields = fields
+        self.latch = latch
+        self.branches = [tuple(path.split(".")) for path in branches]
+
+IMAGE_SIZE = REGMAP[-1][1] +1
+MERGE_GAP = 4 # reading a few unused registers is cheaper than another segment
+
+def mapped (addr):
+    """ Returns True if given address is part of the register map """
+    for (start, stop) in REGMAP:
+        if addr >= start and addr <= stop:
+            return True
+    return False
+
+def plan (fields):
+    """ Returns the register segments [(addr, length)] backing given fields:
+    contiguous runs, merged when separated by a few mapped registers """
+    regs = set()
+    for field in fields:
+        regs |= field.registers()
+    segments = []
+    for addr in sorted(regs):
+        if len(segments) > 0:
+            (start, length) = segments[-1]
+            gap = range(start + length, addr)
+            if len(gap) <= MERGE_GAP and all([mapped(a) for a in gap]):
+                segments[-1] = (start, addr - start +1)
+                continue
+        segments.append((addr, 1))
+    return segments
+
+def read_image (dev, segments, image=None):
+    """ Reads given register segments into a register image
+    (bytearray indexed by address), in a single scatter-gather transaction """
+    if image is None:
+        image = bytearray(IMAGE_SIZE)
+    for ((addr, length), data) in zip(segments, dev.read_segments(segments)):
+        image[addr:addr + length] = bytes(data)
+    return image
+
+def layout (name):
+    """ Returns the layout of given section: its status tree,
+    with Field leaves instead of values """
+    section = SECTIONS[name]
+    tree = {}
+    for path in section.branches:
+        node = tree
+        for key in path:
+            node = node.setdefault(key, {})
+    for field in section.fields:
+        node = tree
+        for key in field.path[:-1]:
+            node = node.setdefault(key, {})
+        node[field.path[-1]] = field
+    return tree
+
+def leaves (tree):
+    """ Returns the fields of given layout """
+    fields = []
+    for k in tree.keys():
+        if type(tree[k]) is dict:
+            fields += leaves(tree[k])
+        else:
+            fields.append(tree[k])
+    return fields
+
+def evaluate (tree, image):
+    """ Decodes given layout from a register image, returns the status tree """
+    status = {}
+    for k in tree.keys():
+        if type(tree[k]) is dict:
+            status[k] = evaluate(tree[k], image)
+        else:
+            status[k] = tree[k].value(image)
+    return status
+
+def decode (dev, name, tree=None):
+    """ Decodes given status section, or only the fields of given
+    (filtered) section layout: backing registers are read at once """
+    if tree is None:
+        tree = layout(name)
+    if SECTIONS[name].latch:
+        dev.io_update()
+    image = read_image(dev, plan(leaves(tree)))
+    return evaluate(tree, image)
+
+#################
+# info
+#################
+INFO = [
+    Field("chip-type", 0x0003, enum=hex),
+    Field("device-code", 0x0004, 3, enum=hex),
+    Field("spi-version", 0x000B, enum=hex),
+    Field("vendor", 0x000C, 2, enum=hex),
+]
+
+#################
+# serial
+#################
+SERIAL = [
+    bit("soft-reset", 0x0000, 0),
+    bit("spi-lsbf", 0x0000, 1),
+    bit("spi-addr-asc", 0x0000, 2),
+    bit("spi-sdo", 0x0000, 3),
+    bit("reset-registers", 0x0001, 2),
+    bit("buffered-read", 0x0001, 6),
+]
+
+#################
+# sysclk
+#################
+slew_rates = {
+    0: '0',
+    1: "0.715 ppm/s",
+    2: "1.430 ppm/s",
+    3: "2.860 ppm/s",
+    4: "5.720 ppm/s",
+    5: "11.44 ppm/s",
+    6: "22.88 ppm/s",
+    7: "45.76 ppm/s",
+}
+comp_sources = {
+    0: 'REFA',
+    1: 'REFAA',
+    2: 'REFB',
+    3: 'REFBB',
+    6: 'aux-REF0',
+    7: 'aux-REF1',
+    11: 'aux-REF2',
+    12: 'aux-REF3',
+}
+dpll_sel = {
+    0: 'dpll0',
+    1: 'dpll1',
+}
+cutoffs = {
+    0: '156 Hz',
+    1: '78 Hz',
+    2: '39 Hz',
+    3: '20 Hz',
+    4: '10 Hz',
+    5: '5 Hz',
+    6: '2 Hz',
+    7: '1 Hz',
+}
+SYSCLK = [
+    bit("calibrating", 0x3001, 2),
+    bit("stable", 0x3001, 1),
+    bit("locked", 0x3001, 0),
+    Field("pll.fb-div-ratio", 0x0200),
+    Field("pll.input-sel", 0x0201, mask=0x08, shift=3),
+    Field("pll.input-div", 0x0201, mask=0x06, shift=1),
+    bit("pll.freq-doubler", 0x0201, 0),
+    Field("pll.ref-freq", 0x0202, 5, scale=1E3),
+    Field("pll.stab-period", 0x0207, 3, mask=0x0FFFFF, scale=10E-3),
+    bit("comp.method2-aux-dpll", 0x0280, 5),
+    bit("comp.method1-aux-dpll", 0x0280, 4),
+    bit("comp.method3-tcds", 0x0280, 2),
+    bit("comp.method2-tcds", 0x0280, 1),
+    bit("comp.method1-tcds", 0x0280, 0),
+    bit("comp.method3-aux-nco1", 0x0281, 6),
+    bit("comp.method2-aux-nco1", 0x0281, 5),
+    bit("comp.method1-aux-nco1", 0x0281, 4),
+    bit("comp.method3-aux-nco0", 0x0281, 2),
+    bit("comp.method2-aux-nco0", 0x0281, 1),
+    bit("comp.method1-aux-nco0", 0x0281, 0),
+    bit("comp.method3-dpll1", 0x0282, 5),
+    bit("comp.method1-dpll1", 0x0282, 4),
+    bit("comp.method3-dpll0", 0x0282, 2),
+    bit("comp.method2-dpll0", 0x0282, 1),
+    bit("comp.method1-dpll0", 0x0282, 0),
+    Field("comp.slew-rate-lim", 0x0283, mask=0x07, enum=slew_rates),
+    Field("comp.source", 0x0284, mask=0x0F, enum=comp_sources),
+    Field("comp.dpll-bw", 0x0285, 2, enum=lambda r: r /10),
+    Field("comp.dpll-sel", 0x0287, mask=0x01, enum=dpll_sel),
+    Field("comp.method1-cutoff", 0x0288, mask=0x07, enum=cutoffs),
+    Field("comp.method1-c0", 0x0289, 5, scale=pow(2,-45)),
+    #TODO c1..c5 (0x028E..)
+]
+
+#################
+# eeprom
+#################
+EEPROM = [
+    bit("crc-fault", 0x3000, 3),
+    bit("fault", 0x3000, 2),
+    bit("busy.downloading", 0x3000, 1),
+    bit("busy.uploading", 0x3000, 0),
+]
+
+#################
+# pll
+#################
+PLL = [
+    bit("ch1.locked", 0x3001, 5),
+    bit("ch0.locked", 0x3001, 4),
+]
+for (ch, base, pins) in [
+    ("ch0", 0x3100, ['a','aa','b','bb','c','cc']),
+    ("ch1", 0x3200, ['a','aa','b','bb']),
+]:
+    PLL += [
+        bit(ch+".analog.calibration", base, 5, done),
+        bit(ch+".analog.calibrating", base, 4),
+        bit(ch+".analog.phase-locked", base, 3),
+        bit(ch+".digital.freq-locked", base, 2),
+        bit(ch+".digital.phase-locked", base, 1),
+        Field(ch+".digital.profile", base+1, mask=0x70, shift=4),
+        bit(ch+".digital.active", base+1, 3),
+        bit(ch+".digital.switching-profile", base+1, 2),
+        bit(ch+".digital.holdover", base+1, 1),
+        bit(ch+".digital.free-running", base+1, 0),
+        bit(ch+".digital.fast-acquisition", base+2, 5, done),
+        bit(ch+".digital.fast-acquisitionning", base+2, 4),
+        bit(ch+".digital.phase-slew", base+2, 2, active),
+        bit(ch+".digital.freq-clamping", base+2, 1, active),
+        bit(ch+".digital.tunning-word-history", base+2, 0, available),
+        Field(ch+".digital.ftw-history", base+3, 6, mask=0x1FFFFFFFFFFF),
+        Field(ch+".digital.phase-lock-tub", base+9, 2, mask=0x0FFF),
+        Field(ch+".digital.freq-lock-tub", base+11, 2, mask=0x0FFF),
+    ]
+    for n in reversed(range(len(pins))):
+        PLL.append(bit(ch+"."+pins[n]+"-phase-slew", base+13, n, active))
+    for n in reversed(range(len(pins))):
+        PLL.append(bit(ch+"."+pins[n]+"-phase-error", base+14, n))
+PLL += [
+    bit("ch0.power-down", 0x2100, 0, available),
+    bit("ch1.power-down", 0x2200, 0, available),
+]
+
+#################
+# misc
+#################
+MISC = [
+    bit("aux-nco.nco1-phase-error", 0x3002, 7),
+    bit("aux-nco.nco1-phase-slewing", 0x3002, 6),
+    bit("aux-nco.nco0-phase-error", 0x3002, 5),
+    bit("aux-nco.nco0-phase-slewing", 0x3002, 4),
+    bit("aux-dpll.ref-status", 0x3002, 2, int),
+    bit("aux-dpll.lock-status", 0x3002, 1, int),
+    bit("temperature.alarm", 0x3002, 0),
+    Field("temperature.value", 0x3003, 2, scale=pow(2,-7), enum=u"{:.1f} degC".format),
+]
+
+#################
+# ref-input
+#################
+coupling = {
+    0: 'AC 1.2V',
+    1: 'DC 1.2V CMOS',
+    2: 'DC 1.8V CMOS',
+    3:u'DC 1.2V CMOS + 46kΩpull-up',
+}
+ref_mode = {
+    0: 'single ended',
+    1: 'differential',
+}
+bw = {
+    0: 'narrow',
+    1: 'wide',
+}
+demod_polarity = {
+    0: 'manual',
+    1: 'automatic',
+}
+event_pol = {
+    0: 'narrow/wide',
+    1: 'wide/narrow',
+}
+mon_hysteresis = {
+    0: 'No hysteresis',
+    1: '3.125%',
+    2: '6.25%',
+    3: '12.5%',
+    4: '25%',
+    5: '50%',
+    6: '75%',
+    7: '87.5%',
+}
+REF_INPUT = []
+for (ref, refref, base) in [('a', 'aa', 0x0300), ('b', 'bb', 0x0304)]:
+    REF_INPUT += [
+        Field(refref+".input-termination", base, mask=0xC0, shift=6, enum=coupling),
+        Field(ref+".input-termination", base, mask=0x30, shift=4, enum=coupling),
+        Field(ref+".differential", base, mask=0x0C, shift=2, enum=coupling),
+        bit(ref+"-"+refref+"-input-mode", base, 0, ref_mode),
+        bit(ref+"-"+refref+"-demod-bw", base+1, 0, bw),
+    ]
+    for (i, r) in enumerate([ref, refref]):
+        REF_INPUT += [
+            bit(r+".demod-polarity", base+2+i, 7, demod_polarity),
+            bit(r+".demod-persist-enabled", base+2+i, 6),
+            Field(r+".demod-sync-edge", base+2+i, mask=0x30, shift=4),
+            bit(r+".demod-enabled", base+2+i, 7),
+            bit(r+".demod-event-pol", base+2+i, 2, event_pol),
+            Field(r+".demod-sensitivity", base+2+i, mask=0x03),
+        ]
+    #TODO aux refs (0x030A..)
+for (i, ref) in enumerate(['a','aa','b','bb']):
+    base = 0x0400 + i*0x20
+    REF_INPUT += [
+        Field(ref+".r-div", base, 4, mask=0x1FFFFFFF, enum=lambda rdiv: rdiv+1),
+        Field(ref+".freq", base+4, 8, mask=0x0FFFFFFFFFFFFFFF, enum=lambda per: pow(10,18)/per if per else 0), # unprogrammed period
+        Field(ref+".max-freq-deviation", base+12, 3, enum=lambda t: t /10E9 /(1-t/10E9)),
+        Field(ref+".mon-hysteresis", base+15, mask=0x07, enum=mon_hysteresis),
+        Field(ref+".validation-time", base+16, 3, mask=0x0FFFFF, enum=lambda t: '{:.3e} sec'.format(t /1000)),
+        Field(ref+".jitter-tolerance", base+19, 2, enum=lambda j: '{:.3e} sec rms'.format(j /10E9)),
+    ]
+    REF_INPUT += [
+        bit(ref+".loss-of-signal", 0x3005+i, 5),
+        bit(ref+".valid", 0x3005+i, 4),
+        bit(ref+".fault", 0x3005+i, 3),
+        bit(ref+".jitter-excess", 0x3005+i, 2),
+        bit(ref+".fast", 0x3005+i, 1),
+        bit(ref+".slow", 0x3005+i, 0),
+    ]
+
+#################
+# skew
+#################
+tref_src = 1 #TODO
+SKEW = [
+    Field("offset.value", 0x3A2C, 8, mask=0x1FFFFFFFFFFFFFFF, #TODO lire 0x3A3A
+        enum=lambda v: v/1000 * pow(2,-16)), #TODO /1000: typo in datasheet?
+    bit("offset.complete", 0x3A33, 7),
+    Field("drift.value", 0x3A34, 8, mask=0x1FFFFFFFFFFFFFFF,
+        enum=lambda v: v *pow(2,-16)*1E-12 /tref_src),
+    bit("drift.complete", 0x3A3B, 7),
+]
+
+#################
+# irq
+#################
+IRQ_BRANCHES = ['sysclk', 'watchdog', 'ref', 'eeprom', 'aux-dpll', 'dpll', 'skew', 'utsp', 'aux-nco',
+    'ref.a', 'ref.aa', 'ref.b', 'ref.bb']
+for ch in ['0','1']:
+    IRQ_BRANCHES += ['dpll.'+ch, 'utsp.'+ch, 'aux-nco.'+ch] # dpll.1: TODO
+IRQ = [
+    bit("sysclk.unlocked", 0x300B, 7),
+    bit("sysclk.stabled", 0x300B, 6),
+    bit("sysclk.locked", 0x300B, 5),
+    bit("sysclk.calibration.start", 0x300B, 4),
+    bit("sysclk.calibration.end", 0x300B, 3),
+    bit("watchdog.timeout", 0x300B, 2),
+    bit("eeprom.fault", 0x300B, 1),
+    bit("eeprom.complete", 0x300B, 0),
+    bit("skew.limit", 0x300C, 5),
+    bit("temperature-warning", 0x300C, 4),
+    bit("aux-dpll.unfault", 0x300C, 3),
+    bit("aux-dpll.fault", 0x300C, 2),
+    bit("aux-dpll.unlock", 0x300C, 1),
+    bit("aux-dpll.lock", 0x300C, 0),
+]
+for (ref, addr) in [('a', 0x300D), ('b', 0x300E)]:
+    for (r, n) in [(ref+ref, 4), (ref, 0)]:
+        IRQ += [
+            bit("ref."+r+".div-resync", addr, n+3),
+            bit("ref."+r+".valid", addr, n+2),
+            bit("ref."+r+".unfault", addr, n+1),
+            bit("ref."+r+".fault", addr, n),
+        ]
+IRQ += [
+    bit("skew.update", 0x300F, 4),
+    bit("utsp.1.update", 0x300F, 3),
+    bit("utsp.0.update", 0x300F, 2),
+    bit("aux-nco.1.event", 0x300F, 1),
+    bit("aux-nco.0.event", 0x300F, 0),
+    bit("dpll.0.freq-unclamped", 0x3010, 7),
+    bit("dpll.0.freq-clamped", 0x3010, 6),
+    bit("dpll.0.slew-limiter-inactive", 0x3010, 5),
+    bit("dpll.0.slew-limiter-active", 0x3010, 4),
+    bit("dpll.0.freq-unlocked", 0x3010, 3),
+    bit("dpll.0.freq-locked", 0x3010, 2),
+    bit("dpll.0.phase-unlocked", 0x3010, 1),
+    bit("dpll.0.phase-locked", 0x3010, 0),
+    bit("dpll.0.ref-switch", 0x3011, 7),
+    bit("dpll.0.free-run", 0x3011, 6),
+    bit("dpll.0.holdover", 0x3011, 5),
+    bit("dpll.0.hitless-entered", 0x3011, 4),
+    bit("dpll.0.hitless-exit", 0x3011, 3),
+    bit("dpll.0.holdover-ftw-upd", 0x3011, 2),
+    bit("dpll.0.phase-step", 0x3011, 0),
+    #TODO dpll '1'
+]
+
+#################
+# watchdog
+#################
+WATCHDOG = [
+    Field("period", 0x010A, 2),
+]
+
+#################
+# distrib
+#################
+fmts = {
+   0: 'cml',
+   1: 'hcsl',
+}
+currents = {
+    0: '7.6 mA',
+    1: '12.5 mA',
+    2: '15 mA',
+}
+modes = {
+    0: 'diff',
+    1: 'se',
+    2: 'sedd',
+}
+shot_mod = {
+    0: 'immediate',
+    1: 'triggered',
+}
+single_pulse_mod = {
+    0: 'balanced',
+    1: 'unbalanced',
+}
+mod_polarity = {
+    0: 'narrow/wide',
+    1: 'wide/narrow',
+}
+n_shot_mod = {
+    0: 'burst',
+    1: 'periodic',
+}
+retime_to_mod = {
+    0: 'carrier-retiming',
+    1: 'trigger-retiming',
+}
+retiming = {
+    0: 'direct',
+    1: 'retimed',
+}
+slew_mode = {
+    0: 'lag',
+    1: 'minimum-steps',
+}
+max_phase_slew = {
+    0: 'Q180°',
+    1: 'Q90°',
+    2: '1/32Q',
+    3: '1/16Q',
+    4: '1/8Q',
+    5: '1/4Q',
+    6: '1/2Q',
+    7: '1Q',
+}
+
+def phase_offset (v):
+    """ 32 bit offset, 33rd bit being bit 6 of the following register """
+    return (v & 0xFFFFFFFF) + ((v >> 38) << 32)
+
+def mod_step (mod, q_div):
+    try:
+        return mod /2 /q_div
+    except ZeroDivisionError:
+        return 0
+
+DISTRIB_BRANCHES = []
+for (ch, pins) in [
+    ("ch0", ['pll','a','aa','b','bb','outa','outb','c','cc','outc']),
+    ("ch1", ['pll','a','aa','b','bb','outa','outb']),
+]:
+    for pin in pins:
+        DISTRIB_BRANCHES.append(ch+"."+pin)
+        if 'out' in pin:
+            DISTRIB_BRANCHES += [ch+"."+pin+".+", ch+"."+pin+".-"]
+DISTRIB = []
+for (ch, base, pins) in [
+    ("ch0", 0x1100, ['a','aa','b','bb','c','cc']),
+    ("ch1", 0x1500, ['a','aa','b','bb']),
+]:
+    for (i, pin) in enumerate(pins):
+        q = base + i*9
+        DISTRIB += [
+            Field(ch+"."+pin+".q-div", q, 4),
+            Field(ch+"."+pin+".phase-offset", q+4, 5, mask=0x40FFFFFFFF, enum=phase_offset),
+            bit(ch+"."+pin+".half-div", q+8, 5, enabled),
+            bit(ch+"."+pin+".pwm/phase", q+8, 4, enabled),
+            bit(ch+"."+pin+".slew-mode", q+8, 3, slew_mode),
+            Field(ch+"."+pin+".max-phase-slew", q+8, mask=0x07, enum=max_phase_slew),
+        ]
+    mod = base - 0x40 # modulation controls
+    for (i, pin) in enumerate(pins[::2]): # a, b, c
+        DISTRIB += [
+            Field(ch+"."+pin+".mod-step", mod, 2, enum=mod_step, args=[Field(None, base + i*18, 4)]),
+            Field(ch+"."+pin+".mod-counter", mod+2 + i*6, 4, mask=0x0FFFFFFF),
+            bit(ch+"."+pin+".n-shot-mod", mod+0x0F+i, 3, shot_mod),
+            bit(ch+"."+pin+".single-pulse-modulation", mod+0x0F+i, 2, single_pulse_mod),
+            bit(ch+"."+pin+".modulation-polarity", mod+0x0F+i, 1, mod_polarity),
+            bit(ch+"."+pin+".modulation", mod+0x0F+i, 0, enabled),
+        ]
+    for (n, pin) in enumerate(pins):
+        DISTRIB += [
+            bit(ch+"."+pin+".prbs", mod+0x14 + n//4, (n%4)*2+1, enabled),
+            bit(ch+"."+pin+".n-shot", mod+0x14 + n//4, (n%4)*2, enabled),
+        ]
+    for (i, pin) in enumerate(pins[::2]):
+        DISTRIB += [
+            bit(ch+"."+pin+".mute-retiming", mod+0x17+i, 5, enabled),
+            Field(ch+"."+pin+".mode", mod+0x17+i, mask=0x18, shift=3, enum=modes),
+            Field(ch+"."+pin+".current", mod+0x17+i, mask=0x03, shift=1, enum=currents),
+            bit(ch+"."+pin+".format", mod+0x17+i, 0, fmts),
+        ]
+    DISTRIB += [
+        Field(ch+".pll.fb-div-sync-edge", mod+0x0E, mask=0x03),
+        Field(ch+".pll.n-shot-gap", mod+0x12),
+        bit(ch+".pll.n-shot-request-mode", mod+0x13, 6, n_shot_mod),
+        Field(ch+".pll.n-shots", mod+0x13, mask=0x3F),
+        bit(ch+".pll.nshot-2-mod-retime", mod+0x16, 4, retime_to_mod),
+        bit(ch+".pll.nshot-retiming", mod+0x16, 0, retiming),
+    ]
+    for (n, pin) in enumerate(pins):
+        DISTRIB += [
+            bit(ch+"."+pin+".phase-slewing", 0x310D + (base-0x1100)//4, n, enabled),
+            bit(ch+"."+pin+".phase-ctrl-error", 0x310E + (base-0x1100)//4, n),
+        ]
+for (ch, base, outs) in [
+    ("ch0", 0x2100, [("outa", 1), ("outb", 2), ("outc", 2)]),
+    ("ch1", 0x2200, [("outa", 1), ("outb", 2)]),
+]:
+    DISTRIB += [
+        bit(ch+".reset", base, 2),
+        bit(ch+".muted", base, 1),
+    ]
+    for (out, offset) in outs:
+        DISTRIB += [
+            bit(ch+"."+out+".reset", base+offset, 5),
+            bit(ch+"."+out+".power-down", base+offset, 4),
+            bit(ch+"."+out+".-.muted", base+offset, 3),
+            bit(ch+"."+out+".+.muted", base+offset, 2),
+        ]
+
+#################
+# ccdpll
+#################
+cr_sources = {
+    0: 'REFA',
+    1: 'REFAA',
+    2: 'REFB',
+    3: 'REFBB',
+    6: 'aux-ref0',
+    7: 'aux-ref1',
+    11: 'aux-ref2',
+    12: 'aux-ref3',
+    30: 'local timescale immediate sync',
+    31: 'None',
+}
+tagging = {
+    0: 'normal',
+    1: 'tagged',
+}
+guard_states = {
+    0: 'normal',
+    1: 'triggered by event',
+}
+slew_status = {
+    0: 'not active',
+    1: 'actively limiting',
+}
+validity = {
+    0: 'invalid',
+    1: 'valid',
+}
+primary = {
+    0: "primary",
+    1: "secondary",
+}
+CCDPLL = [
+    Field("lock-detector.threshold", 0x0D00, 2, scale=pow(10,-12)),
+    Field("lock-detector.fill", 0x0D02),
+    Field("lock-detector.drain", 0x0D03),
+    Field("lock-detector.delay", 0x0D04, 2),
+]
+for (cr, base) in [("cr0", 0x0D10), ("cr1", 0x0D20)]:
+    CCDPLL += [
+        bit(cr+".enabled", base, 7),
+        Field(cr+".ts-source", base, mask=0x1F, enum=cr_sources),
+        bit(cr+".ccs.tagging", base+1, 7, tagging),
+        Field(cr+".ccs.source-sync", base+1, mask=0x1F, enum=cr_sources),
+        Field(cr+".numerator", base+2, 4),
+        Field(cr+".denominator", base+6, 5),
+        Field(cr+".skew", base+11, 3, scale=pow(2,-48)),
+    ]
+CCDPLL += [
+    Field("ccs.offset", 0x0D30, 4, scale=pow(2,-48)),
+    Field("ccs.skew-limit", 0x0D34, 3, scale=pow(2,-16), enum='{:.3e} ppm'.format),
+    Field("ccs.guard.latency", 0x0D37, 2, scale=pow(2,-16)),
+    Field("ccs.guard.adjustment", 0x0D39, 3, mask=0x0FFFFF, scale=pow(2,-12)),
+    bit("ccs.guard.bypass-lock", 0x0D3C, 0),
+    bit("ccs.guard.status", 0x0D40, 7, guard_states),
+    bit("ccs.slew-limiter-status", 0x0D40, 6, slew_status),
+    bit("cr1.source", 0x0D40, 5, validity),
+    bit("cr0.source", 0x0D40, 4, validity),
+    Field("active-source", 0x0D40, mask=0x80, shift=3, enum=primary),
+    bit("ready", 0x0D40, 2),
+    bit("phase-locked", 0x0D40, 1),
+    bit("active", 0x0D40, 0),
+]
+
+#################
+# uts, utsp, iuts
+#################
+uts_sources = {
+    0: 'REFA',
+    1: 'REFAA',
+    2: 'REFB',
+    3: 'REFBB',
+    4: 'dpll0',
+    5: 'dpll1',
+    6: 'aux-ref0',
+    7: 'aux-ref1',
+    8: 'aux-nco0',
+    9: 'aux-nco1',
+    11: 'aux-ref2',
+    12: 'aux-ref3',
+    13: 'iuts0',
+    14: 'iuts1',
+}
+timescales = {
+    0: "aux-nco0",
+    1: "ccs",
+    2: "aux-nco1",
+}
+formats = {
+    0: 'normal',
+    1: 'ptp',
+}
+# UTS status flags, per (r & 0x0C)>>2 value
+uts_flags = {
+    'invalid': {0: True, 1: False, 2: True, 3: False},
+    'fault': {0: False, 1: True, 2: False, 3: True},
+    'unlocked': {0: False, 1: True, 2: False, 3: True},
+    'format': {0: False, 1: False, 2: True, 3: True},
+    'tag': {0: True, 1: True, 2: False, 3: False},
+}
+source_kinds = {
+    0: "all",
+    1: "only-tagged",
+}
+destinations = {
+    13: 'iuts0',
+    14: 'iuts1',
+    30: 'ccs sync0 timecode',
+    31: 'ccs sync1 timecode',
+}
+
+def timecode_ns (v0, fmt):
+    """ Timecode nanoseconds, depending on timecode format """
+    if fmt == 'ptp':
+        ns = sign_extend(v0 & 0x3FFFFFFFFFFF, 48)
+        return ns * pow(2,-16)
+    ns = sign_extend(v0, 48)
+    return ns * pow(2,-48)
+
+UTS = []
+for c in range (9):
+    base = 0x0E00 + c*0x05
+    UTS += [
+        bit(str(c)+".format", base, 1, formats),
+        bit(str(c)+".enabled", base, 0),
+    ]
+    for flag in uts_flags:
+        UTS.append(Field(str(c)+".flags."+flag, base, mask=0x0C, shift=2, enum=uts_flags[flag]))
+    UTS += [
+        bit(str(c)+".tagged-timestamps", base+1, 4),
+        Field(str(c)+".source", base+1, mask=0x1F, enum=uts_sources),
+        Field(str(c)+".reading", base+2, 3, sign=48, scale=pow(2,-48)), # 1 bit = 1sec/2^48
+    ]
+UTS += [
+    bit("fifo.overfill", 0x0E2D, 7),
+    Field("fifo.count", 0x0E2D, mask=0x7F),
+    Field("fifo.flags", 0x0E2E, mask=0xE0, shift=5),
+    Field("fifo.source", 0x0E2E, mask=0x1F, enum=uts_sources),
+    Field("fifo.timecode.s", 0x0E35, 6),
+    Field("fifo.timecode.ns", 0x0E2F, 6, enum=timecode_ns, args=[bit(None, 0x0E00, 1, formats)]),
+]
+for ch in range (2):
+    base = 0x3A14 + ch*12
+    t0 = 1 # TODO retrieve time scale
+    UTS += [
+        Field(str(ch)+".output.integer", base, 5, scale=t0),
+        Field(str(ch)+".output.fractionnal", base+5, 5, scale=t0 * pow(2,-40)),
+        Field(str(ch)+".missed", base+10),
+        bit(str(ch)+".overdue", base+11, 0),
+    ]
+
+UTSP = []
+for ch in range (2):
+    UTSP += [
+        Field(str(ch)+".time-scale", 0x2A12+ch, mask=0xC0, shift=6, enum=timescales),
+        Field(str(ch)+".source", 0x2A12+ch, mask=0x40, shift=5, enum=source_kinds),
+        Field(str(ch)+".timestamp-source", 0x2A12+ch, mask=0x1F, enum=uts_sources),
+    ]
+
+IUTS = []
+for i in range (2):
+    base = 0x0F00 + i*0x04
+    IUTS += [
+        bit(str(i)+".bypass-ccdpll-lock", base, 1),
+        bit(str(i)+".valid", 0x3023, 1-i),
+        Field(str(i)+".reading", base+1, 3, sign=32, scale=pow(2,-48)),
+    ]
+IUTS += [
+    bit("format", 0x0F09, 7, formats),
+    Field("destination", 0x0F09, mask=0x1F, enum=lambda r: destinations.get(r, 'unknown/default')),
+    Field("timecode.s", 0x0F0A, 6),
+    Field("timecode.ns", 0x0F0A, 6, enum=timecode_ns, args=[bit(None, 0x0F09, 7, formats)]),
+]
+
+SECTIONS = { # section: field table, in reporting order
+    "info": Section(INFO),
+    "serial": Section(SERIAL),
+    "sysclk": Section(SYSCLK, branches=["pll"]),
+    "eeprom": Section(EEPROM),
+    "pll": Section(PLL, branches=["ch0.digital", "ch0.analog", "ch1.digital", "ch1.analog"]),
+    "misc": Section(MISC),
+    "ref-input": Section(REF_INPUT, branches=["a", "aa", "b", "bb"]),
+    "skew": Section(SKEW),
+    "irq": Section(IRQ, branches=IRQ_BRANCHES),
+    "watchdog": Section(WATCHDOG),
+    "distrib": Section(DISTRIB, branches=DISTRIB_BRANCHES),
+    "ccdpll": Section(CCDPLL, branches=["ccs", "lock-detector"]),
+    "uts": Section(UTS, latch=True), # I/O update latches UTSPx readings
+    "utsp": Section(UTSP),
+    "iuts": Section(IUTS),
+}
+
+def decode_info (dev):
+    """ Device general infos (SN#, ..) """
+    return decode(dev, "info")
+
+def decode_serial (dev):
+    """ Serial port status (I2C/SPI) """
+    return decode(dev, "serial")
+
+def decode_sysclk (dev):
+    """ Sys clock (all) infos """
+    return decode(dev, "sysclk")
+
+def decode_eeprom (dev):
+    """ EEPROM controller status """
+    return decode(dev, "eeprom")
+
+def decode_pll (dev):
+    """ Pll cores info """
+    return decode(dev, "pll")
+
+def decode_misc (dev):
+    """ Auxilary NCOs, DPll, temperature sensor reading, ... """
+    return decode(dev, "misc")
+
+def decode_ref_input (dev):
+    """ REFx and input signals infos """
+    return decode(dev, "ref-input")
+
+def decode_skew (dev):
+    """ Integrated Skew measurement system """
+    return decode(dev, "skew")
+
+def decode_irq (dev):
+    """ IRQ registers """
+    return decode(dev, "irq")
+
+def decode_watchdog (dev):
+    """ Watchdog timer period """
+    return decode(dev, "watchdog")
+
+def decode_distrib (dev):
+    """ Clock distribution & output signals infos """
+    return decode(dev, "distrib")
+
+def decode_ccdpll (dev):
+    """ Common Clock DPLL core infos """
+    return decode(dev, "ccdpll")
+
+def decode_uts (dev):
+    """ User Time Stamping cores status + readings """
+    return decode(dev, "uts")
+
+def decode_utsp (dev):
+    """ User Time Stamping processors """
+    return decode(dev, "utsp")
+
+def decode_iuts (dev):
+    """ Inverse UTS cores status + readings """
+    return decode(dev, "iuts")
+
+DECODERS = { # section: decoder, in reporting order
+    "info": decode_info,
+    "serial": decode_serial,
+    "sysclk": decode_sysclk,
+    "eeprom": decode_eeprom,
+    "pll": decode_pll,
+    "misc": decode_misc,
+    "ref-input": decode_ref_input,
+    "skew": decode_skew,
+    "irq": decode_irq,
+    "watchdog": decode_watchdog,
+    "distrib": decode_distrib,
+    "ccdpll": decode_ccdpll,
+    "uts": decode_uts,
+    "utsp": decode_utsp, # reported along with uts
+    "iuts": decode_iuts,
+}
+
+def layouts (sections, keys=None, queries=None):
+    """ Returns {section: layout} for given sections (list of names, see DECODERS),
+    narrowed down by optionnal key filters and queries """
+    for name in sections:
+        if name not in DECODERS:
+            raise ValueError("unknown status section \"{}\"".format(name))
+    if "uts" in sections:
+        sections = list(sections) + ["utsp"]
+    trees = {}
+    for name in DECODERS:
+        if name in sections:
+            trees[name] = layout(name)
+    if keys:
+        trees = filter_by_keys(trees, keys)
+    if queries:
+        trees = select(trees, queries, layout=True)
+    return trees
+
+def predicates (queries):
+    """ Returns given queries if any of them has a value predicate """
+    if queries and any([q.op is not None for q in queries]):
+        return queries
+    return None
+
+def report (dev, sections, io_update=False, keys=None, queries=None):
+    """ Decodes given status sections (list of names, see DECODERS),
+    returns {section: status}.
+    io_update: perform an I/O update first, which some status registers require
+    keys: optionnal key filters (see filter_by_keys), resolved against
+    the section layouts prior any I/O: only the registers backing
+    the retained fields are read
+    queries: optionnal list of Query, only the matched fields are reported.
+    Paths are resolved against the section layouts too, prior any I/O """
+    trees = layouts(sections, keys, queries)
+    if io_update:
+        dev.io_update()
+    status = {}
+    for name in trees:
+        dev.section("status.py --{}".format(name))
+        status[name] = decode(dev, name, trees[name])
+    if predicates(queries):
+        status = select(status, queries) # value predicates
+    return status
+
+def schedule (interval, count=None):
+    """ Yields monotonic timestamps, every `interval` seconds,
+    `count` times (forever if None). Drift free: tick n is due at
+    start + n*interval, late ticks are not bursted but skipped """
+    start = time.monotonic()
+    (tick, n) = (0, 0)
+    while count is None or n < count:
+        delay = start + tick*interval - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        now = time.monotonic()
+        yield now
+        n += 1
+        tick += 1
+        if interval > 0:
+            tick = max(tick, int((now - start) / interval) +1) # next tick still ahead
+
+def clear_irq (dev, flags):
+    """ Clears given IRQ flags (0x300B-0x3017 image): only the observed bits,
+    through the clear registers that mirror them (0x2006-0x2012),
+    flags that raised since then are preserved """
+    asserted = [i for i in range (len(flags)) if flags[i]]
+    if len(asserted) == 0:
+        return
+    (first, last) = (asserted[0], asserted[-1])
+    dev.write_block(0x2006 + first, list(flags[first:last+1]))
+    dev.io_update()
+
+ASSERTED = [Query("**=true")]
+
+class Sampler:
+    """ Repeated status sampling: requested sections (see report())
+    are planned once, each sample then is a single scatter-gather read
+    of all their registers, decoded from memory """
+    def __init__ (self, dev, sections, keys=None, queries=None, io_update=False, irq=False, clear=False):
+        """ irq: also sample the complete IRQ section, whose flags latch
+        events that did not last until the next sample. Only the asserted flags
+        are reported, filters and queries apply to the requested sections.
+        clear: clear the sampled IRQ flags (see clear_irq()), so every event gets reported,
+        otherwise a latched flag is only reported once.
+        dev opened with cache=True only reads configuration registers once """
+        self.dev = dev
+        self.trees = layouts(sections, keys, queries)
+        self.events = irq and "irq" not in self.trees
+        if self.events:
+            self.trees["irq"] = layout("irq")
+        self.clear = clear
+        self.queries = predicates(queries)
+        self.fields = [] # (path, field)
+        for name in self.trees:
+            for field in leaves(self.trees[name]):
+                self.fields.append(((name,) + field.path, field))
+        self.registers = {} # address: fields indices
+        for (i, (_, field)) in enumerate(self.fields):
+            for addr in field.registers():
+                self.registers.setdefault(addr, []).append(i)
+        self.segments = plan([field for (_, field) in self.fields])
+        self.latch = any([SECTIONS[name].latch for name in self.trees])
+        if io_update:
+            dev.io_update()
+
+    def read (self, image=None):
+        """ Reads the sampled registers into a register image """
+        if self.latch:
+            self.dev.io_update()
+        return read_image(self.dev, self.segments, image)
+
+    def decode (self, image):
+        """ Decodes the sampled sections from a register image """
+        status = {}
+        for name in self.trees:
+            status[name] = evaluate(self.trees[name], image)
+        events = status.pop("irq") if self.events else None
+        if self.queries:
+            status = select(status, self.queries)
+        if events is not None:
+            asserted = select(events, ASSERTED)
+            if len(asserted) > 0:
+                status["irq"] = asserted
+        return status
+
+    def sample (self):
+        """ Reads and decodes the sampled sections """
+        return self.decode(self.read())
+
+    def watch (self, interval, count=None):
+        """ Samples every `interval` seconds (see schedule()),
+        yields (monotonic timestamp, status) """
+        for t in schedule(interval, count):
+            yield (t, self.sample())
+
+    def delta (self, last, image):
+        """ Returns [(path, old value, new value)] for the fields that
+        changed between two register images. Images are compared byte per byte,
+        only the fields backed by modified registers get decoded """
+        changed = set()
+        for (addr, length) in self.segments:
+            if image[addr:addr + length] != last[addr:addr + length]:
+                for a in range(addr, addr + length):
+                    if image[a] != last[a]:
+                        changed.update(self.registers.get(a, []))
+        ret = []
+        for i in sorted(changed):
+            (path, field) = self.fields[i]
+            (old, new) = (field.value(last), field.value(image))
+            if old != new: # not only unreported bits
+                ret.append((path, old, new))
+        return ret
+
+    def changes (self, interval, count=None, output=None):
+        """ Samples every `interval` seconds (see schedule()), keeping
+        the last register image, yields (monotonic timestamp, changes),
+        changes being [(path, old value, new value)] of the reported status.
+        output: applied to the decoded status before comparison (value filter, unpack..),
+        paths then are relative to its result.
+        Samples are only decoded when registers changed (see delta()).
+        First sample reports every field, old value being None.
+        A field leaving (entering) the report has a None new (old) value,
+        IRQ flags (irq=True) are only reported when they raise """
+        (last, spare, reported) = (None, None, None)
+        for t in schedule(interval, count):
+            image = self.read(spare)
+            if self.clear:
+                (base, size) = IRQ_BLOCK
+                clear_irq(self.dev, bytes(image[base:base + size]))
+            changes = []
+            if last is None or len(self.delta(last, image)) > 0:
+                status = self.decode(image)
+                values = flatten(output(status) if output else status)
+                if reported is None:
+                    changes = [(path, None, values[path]) for path in values]
+                else:
+                    for path in values:
+                        if path not in reported or reported[path] != values[path]:
+                            changes.append((path, reported.get(path), values[path]))
+                    for path in reported:
+                        if path not in values and not (self.events and path[0] == "irq"):
+                            changes.append((path, reported[path], None))
+                reported = values
+            (last, spare) = (image, last)
+            yield (t, changes)
+
+IRQ_BLOCK = (0x300B, 13) # IRQ status registers, 0x300B-0x3017
+IRQ_GATES = { # section: IRQ flags (address, mask) that trigger its decoding
+    "sysclk": [(0x300B, 0xF8)],
+    "ref-input": [(0x300D, 0xFF), (0x300E, 0xFF)],
+    "skew": [(0x300C, 0x20), (0x300F, 0x10)],
+    "pll": [(addr, 0xFF) for addr in range (0x3010, 0x3018)],
+}
+
+class IrqMonitor:
+    """ IRQ gated status polling: each poll only reads the IRQ registers,
+    in a single burst. Detailed sections (see IRQ_GATES) are only read
+    and decoded when their IRQ flags raise """
+    def __init__ (self, dev, sections=None, keys=None, queries=None, clear=False, io_update=False):
+        """ sections: gated sections, all of IRQ_GATES by default,
+        keys, queries: see report(), applied to the gated sections.
+        clear: clear the reported IRQ flags """
+        if not sections:
+            sections = list(IRQ_GATES.keys())
+        for name in sections:
+            if name not in IRQ_GATES:
+                raise ValueError("section \"{}\" can't be IRQ gated".format(name))
+        self.dev = dev
+        self.samplers = {}
+        for name in sections:
+            self.samplers[name] = Sampler(dev, [name], keys, queries)
+        self.irq = layout("irq")
+        self.clear = clear
+        self.reported = bytes(IRQ_BLOCK[1])
+        if io_update:
+            dev.io_update()
+
+    def poll (self):
+        """ Reads the IRQ registers, returns None if no new flag raised since
+        the previous poll. Otherwise returns the asserted IRQ flags
+        and the sections they gate: {"irq": .., section: ..} """
+        (base, size) = IRQ_BLOCK
+        image = read_image(self.dev, [IRQ_BLOCK])
+        flags = bytes(image[base:base + size])
+        new = bytes([f & (r ^0xFF) for (f, r) in zip(flags, self.reported)])
+        self.reported = bytes(size) if self.clear else flags
+        if not any(new):
+            return None
+        status = {"irq": select(evaluate(self.irq, image), ASSERTED)}
+        for (name, sampler) in self.samplers.items():
+            if any([new[addr - base] & mask for (addr, mask) in IRQ_GATES[name]]):
+                status.update(sampler.sample())
+        if self.clear:
+            self.clear_flags(flags)
+        return status
+
+    def clear_flags (self, flags):
+        """ Clears given IRQ flags, see clear_irq() """
+        clear_irq(self.dev, flags)
+
+    def watch (self, interval, count=None):
+        """ Polls every `interval` seconds (see schedule()),
+        `count` times, yields (monotonic timestamp, status) on new IRQ events """
+        for t in schedule(interval, count):
+            status = self.poll()
+            if status is not None:
+                yield (t, status)
+
+async def decode_async (adev, name):
+    """ Decodes given status section, from an AsyncAD9546 """
+    return await adev.run(DECODERS[name])
+
+async def report_async (adev, sections, io_update=False, keys=None, queries=None):
+    """ report() from an AsyncAD9546, all sections are decoded
+    within a single job of the bus executor """
+    return await adev.run(report, sections, io_update, keys, queries)
+
 def main (argv):
     parser = argparse.ArgumentParser(description="AD9546 status reporting")
     parser.add_argument(
@@ -104,1141 +1424,140 @@ def main (argv):
         type=str,
         help="Filter results by matching (comma separeted) values.",
     )
+    parser.add_argument(
+        "--query",
+        type=str,
+        action="append",
+        help="Report fields matching a path query, like 'pll.*.locked', '**.phase-locked=false' or 'misc.temperature.value>60'. Path is dot separated globs, /regex/ or ** (any depth), optionnal =, !=, <, <=, >, >=, ~regex value predicate. Can be repeated. Sections are deduced from the queries if none is requested.",
+    )
+    parser.add_argument(
+        "--watch",
+        type=float,
+        metavar="interval",
+        help="Keep the device open and sample the requested sections every `interval` seconds, one compact json line per sample (NDJSON) with a monotonic timestamp",
+    )
+    parser.add_argument(
+        "--delta",
+        action="store_true",
+        help="With --watch: only stream fields that changed since the previous sample, one `t path: old -> new` line per change. IRQ flags are sampled too, to catch events that did not last until the next sample",
+    )
+    parser.add_argument(
+        "--irq-gated",
+        action="store_true",
+        help="With --watch: only poll the IRQ registers (single burst), the requested sections (--pll, --ref-input, --sysclk, --skew, all four by default) are only read and reported when their IRQ flags raise",
+    )
+    parser.add_argument(
+        "--clear-irq",
+        action="store_true",
+        help="With --irq-gated or --delta: clear the reported IRQ flags, otherwise a latched flag is only reported once",
+    )
+    parser.add_argument(
+        "--cache",
+        action="store_true",
+        help="With --watch: only read configuration registers (formats, dividers..) once. Changes made by other processes are not seen",
+    )
+    parser.add_argument(
+        "--count",
+        type=int,
+        help="Stop after given number of samples (--watch)",
+    )
     parser.add_argument(
         "--unpack",
         action="store_true",
         help="Reduce output to 1D or extract single field value",
     )
+    add_interface_args(parser)
     args = parser.parse_args(argv)
+    queries = None
+    try:
+        if args.query:
+            queries = [Query(expr) for expr in args.query]
+        if args.filter_by_value:
+            values = [Query("**=" + value) for value in args.filter_by_value.split(",")]
+    except ValueError as e:
+        parser.error(str(e))
     # open device
-    dev = AD9546(args.bus, int(args.address, 16))
-    # I/O update is required priori reading some status registers
-    dev.io_update()
-        
-    status = {}
-    done = {
-        0: 'idle',
-        1: 'done',
-    }
-    enabled = {
-        0: 'disabled',
-        1: 'enabled',
-    }
-    active = {
-        0: 'disabled',
-        1: 'active',
-    }
-    available = {
-        0: "unavailable",
-        1: "available",
-    }
-
-    if args.info:
-        status['info'] = {}
-        status['info']['chip-type'] = hex(dev.read_data(0x0003))
-        data = dev.read_data(0x0004)
-        data |= dev.read_data(0x0005)<<8
-        data |= dev.read_data(0x0006)<<16
-        status['info']['device-code'] = hex(data) 
-        status['info']['spi-version'] = hex(dev.read_data(0x000B))
-        data  = dev.read_data(0x000C)
-        data |= dev.read_data(0x000D)<<8
-        status['info']['vendor'] = hex(data) 
-    if args.serial:
-        status['serial'] = {}
-        r = dev.read_data(0x0000)
-        status['serial']['soft-reset'] = bool((r & 0x01)>>0)
-        status['serial']['spi-lsbf'] = bool((r & 0x02)>>1)
-        status['serial']['spi-addr-asc'] = bool((r & 0x04)>>2)
-        status['serial']['spi-sdo'] = bool((r & 0x08)>>3)
-        r = dev.read_data(0x0001)
-        status['serial']['reset-registers'] = bool((r & 0x04)>>2)
-        status['serial']['buffered-read'] = bool((r & 0x40)>>6)
-    if args.sysclk:
-        status['sysclk'] = {}
-        status['sysclk']['pll'] = {}
-        r = dev.read_data(0x3001)
-        status['sysclk']['calibrating'] = bool((r & 0x04)>>2)
-        status['sysclk']['stable'] = bool((r & 0x02)>>1)
-        status['sysclk']['locked'] = bool((r & 0x01)>>0)
-        status['sysclk']['pll']['fb-div-ratio'] = dev.read_data(0x200) 
-        data = dev.read_data(0x201)
-        status['sysclk']['pll']['input-sel'] = (data & 0x08)>>3
-        status['sysclk']['pll']['input-div'] = (data & 0x06)>>1
-        status['sysclk']['pll']['freq-doubler'] = bool(data & 0x01)
-        ref_freq = dev.read_data(0x202)
-        ref_freq += dev.read_data(0x203) << 8
-        ref_freq += dev.read_data(0x204) << 16
-        ref_freq += dev.read_data(0x205) << 24
-        ref_freq += dev.read_data(0x206) << 32
-        status['sysclk']['pll']['ref-freq'] = ref_freq * 1E3
-        per = dev.read_data(0x207)
-        per += dev.read_data(0x208) << 8
-        per += (dev.read_data(0x209) & 0x0F) << 16
-        status['sysclk']['pll']['stab-period'] = per * 10E-3 
-        
-        status['sysclk']['comp'] = {}
-        r = dev.read_data(0x280)
-        status['sysclk']['comp']['method2-aux-dpll'] = bool((r & 0x20)>>5)
-        status['sysclk']['comp']['method1-aux-dpll'] = bool((r & 0x10)>>4)
-        status['sysclk']['comp']['method3-tcds'] = bool((r & 0x04)>>2)
-        status['sysclk']['comp']['method2-tcds'] = bool((r & 0x02)>>1)
-        status['sysclk']['comp']['method1-tcds'] = bool((r & 0x01)>>0)
-        r = dev.read_data(0x281)
-        status['sysclk']['comp']['method3-aux-nco1'] = bool((r & 0x40)>>6)
-        status['sysclk']['comp']['method2-aux-nco1'] = bool((r & 0x20)>>5)
-        status['sysclk']['comp']['method1-aux-nco1'] = bool((r & 0x10)>>4)
-        status['sysclk']['comp']['method3-aux-nco0'] = bool((r & 0x04)>>2)
-        status['sysclk']['comp']['method2-aux-nco0'] = bool((r & 0x02)>>1)
-        status['sysclk']['comp']['method1-aux-nco0'] = bool((r & 0x01)>>0)
-        r = dev.read_data(0x282)
-        status['sysclk']['comp']['method3-dpll1'] = bool((r & 0x40)>>6)
-        status['sysclk']['comp']['method3-dpll1'] = bool((r & 0x20)>>5)
-        status['sysclk']['comp']['method1-dpll1'] = bool((r & 0x10)>>4)
-        status['sysclk']['comp']['method3-dpll0'] = bool((r & 0x04)>>2)
-        status['sysclk']['comp']['method2-dpll0'] = bool((r & 0x02)>>1)
-        status['sysclk']['comp']['method1-dpll0'] = bool((r & 0x01)>>0)
-        r = dev.read_data(0x0283) & 0x07
-        values = {
-            0: '0',
-            1: "0.715 ppm/s",
-            2: "1.430 ppm/s",
-            3: "2.860 ppm/s",
-            4: "5.720 ppm/s",
-            5: "11.44 ppm/s",
-            6: "22.88 ppm/s",
-            7: "45.76 ppm/s",
-        }
-        status['sysclk']['comp']['slew-rate-lim'] = values[r]
-        sources = {
-            0: 'REFA',
-            1: 'REFAA',
-            2: 'REFB',
-            3: 'REFBB',
-            6: 'aux-REF0',
-            7: 'aux-REF1',
-            11: 'aux-REF2',
-            12: 'aux-REF3',
-        }
-        r = dev.read_data(0x0284) & 0x0F
-        status['sysclk']['comp']['source']  = sources[r]
-        r = dev.read_data(0x0285)
-        r += dev.read_data(0x0286) << 8
-        status['sysclk']['comp']['dpll-bw'] = r /10
-        sel = {
-            0: 'dpll0',
-            1: 'dpll1',
-        }
-        status['sysclk']['comp']['dpll-sel'] = sel[dev.read_data(0x0287)&0x01]
-        cutoff = {
-            0: '156 Hz',
-            1: '78 Hz',
-            2: '39 Hz',
-            3: '20 Hz',
-            4: '10 Hz',
-            5: '5 Hz',
-            6: '2 Hz',
-            7: '1 Hz',
-        }
-        status['sysclk']['comp']['method1-cutoff'] = cutoff[dev.read_data(0x0288)&0x07]
-        c0 = dev.read_data(0x0289)
-        c0 += dev.read_data(0x028A) << 8
-        c0 += dev.read_data(0x028B) << 16
-        c0 += dev.read_data(0x028C) << 24
-        c0 += dev.read_data(0x028D) << 32
-        status['sysclk']['comp']['method1-c0'] = c0 / pow(2,45)  
-        base = 0x028E
-        for cx in range (1, 6):
-            cx_s  = dev.read_data(base+0)
-            cx_s += dev.read_data(base+1) << 8
-            cx_e  = dev.read_data(base+2)
-            base += 3
-            #TODO conclure
-
-    if args.eeprom:
-        status['eeprom'] = {}
-        r = dev.read_data(0x3000)
-        status['eeprom']['crc-fault'] = bool((r&0x08)>>3)
-        status['eeprom']['fault'] = bool((r&0x04)>>2)
-        status['eeprom']['busy'] = {}
-        status['eeprom']['busy']['downloading'] = bool((r&0x02)>>1)
-        status['eeprom']['busy']['uploading'] = bool((r&0x01)>>0)
-    if args.pll:
-        status['pll'] = {}
-        for c in ['ch0','ch1']:
-            status['pll'][c] = {}
-            for a in ['digital','analog']:
-                status['pll'][c][a] = {}
-
-        r = dev.read_data(0x3001)
-        status['pll']['ch1']['locked'] = bool((r&0x20)>>5)
-        status['pll']['ch0']['locked'] = bool((r&0x10)>>4) 
-        
-        base = 0x3100
-        for ch in ['ch0','ch1']:
-            r = dev.read_data(base+0)
-            status['pll'][ch]['analog']['calibration'] = done[(r&0x20)>>5]
-            status['pll'][ch]['analog']['calibrating'] = bool((r&0x10)>>4)
-            status['pll'][ch]['analog']['phase-locked'] = bool((r&0x08)>>3)
-            status['pll'][ch]['digital']['freq-locked'] = bool((r&0x04)>>2)
-            status['pll'][ch]['digital']['phase-locked'] = bool((r&0x02)>>1)
-            
-            r = dev.read_data(base+1)
-            status['pll'][ch]['digital']['profile'] = (r & 0x70)>>4
-            status['pll'][ch]['digital']['active'] = bool((r&0x08)>>3)
-            status['pll'][ch]['digital']['switching-profile'] = bool((r & 0x04)>>2)
-            status['pll'][ch]['digital']['holdover'] = bool((r&0x02) >>1)
-            status['pll'][ch]['digital']['free-running'] = bool((r&0x01) >>0)
-
-            r = dev.read_data(base+2)
-            status['pll'][ch]['digital']['fast-acquisition'] = done[(r&0x20)>>5]
-            status['pll'][ch]['digital']['fast-acquisitionning'] = bool((r&0x10)>>4)
-            status['pll'][ch]['digital']['phase-slew'] = active[(r&0x04)>>2]
-            status['pll'][ch]['digital']['freq-clamping'] = active[(r&0x02)>>1]
-            status['pll'][ch]['digital']['tunning-word-history'] = available[(r&0x01)>>0]
-
-            ftw = dev.read_data(base+3)
-            ftw += dev.read_data(base+4) <<8
-            ftw += dev.read_data(base+5) <<16
-            ftw += dev.read_data(base+6) <<24
-            ftw += dev.read_data(base+7) <<32
-            ftw += (dev.read_data(base+8) & 0x1F) <<40
-            status['pll'][ch]['digital']['ftw-history'] = ftw
-
-            value = dev.read_data(base+9)
-            value+= (dev.read_data(base+10) & 0x0F)<<8
-            status['pll'][ch]['digital']['phase-lock-tub'] = value
-            value = dev.read_data(base+11)
-            value+= (dev.read_data(base+12) & 0x0F)<<8
-            status['pll'][ch]['digital']['freq-lock-tub'] = value
-
-            if ch == 'ch0':
-                r = dev.read_data(base+13)
-                status['pll'][ch]['cc-phase-slew'] = active[(r & 0x20)>>5]
-                status['pll'][ch]['c-phase-slew'] = active[(r & 0x10)>>4]
-                status['pll'][ch]['bb-phase-slew'] = active[(r & 0x08)>>3]
-                status['pll'][ch]['b-phase-slew'] = active[(r & 0x04)>>2]
-                status['pll'][ch]['aa-phase-slew'] = active[(r & 0x02)>>1]
-                status['pll'][ch]['a-phase-slew'] = active[(r & 0x01)>>0]
-                r = dev.read_data(base+14)
-                status['pll'][ch]['cc-phase-error'] = bool((r & 0x20)>>5)
-                status['pll'][ch]['c-phase-error'] =  bool((r & 0x10)>>4)
-                status['pll'][ch]['bb-phase-error'] = bool((r & 0x08)>>3)
-                status['pll'][ch]['b-phase-error'] =  bool((r & 0x04)>>2)
-                status['pll'][ch]['aa-phase-error'] = bool((r & 0x02)>>1)
-                status['pll'][ch]['a-phase-error'] =  bool((r & 0x01)>>0)
-            else:
-                r = dev.read_data(base+13)
-                status['pll'][ch]['bb-phase-slew'] = active[(r & 0x08)>>3]
-                status['pll'][ch]['b-phase-slew'] = active[(r & 0x04)>>2]
-                status['pll'][ch]['aa-phase-slew'] = active[(r & 0x02)>>1]
-                status['pll'][ch]['a-phase-slew'] = active[(r & 0x01)>>0]
-                r = dev.read_data(base+14)
-                status['pll'][ch]['bb-phase-error'] = bool((r & 0x08)>>3)
-                status['pll'][ch]['b-phase-error'] =  bool((r & 0x04)>>2)
-                status['pll'][ch]['aa-phase-error'] = bool((r & 0x02)>>1)
-                status['pll'][ch]['a-phase-error'] =  bool((r & 0x01)>>0)
-            base += 0x100
-        
-        base = 0x2100
-        for ch in ['ch0','ch1']:
-            r = dev.read_data(base +0)
-            status['pll'][ch]['power-down'] = available[r & 0x01] 
-            base += 0x100
-
-    if args.misc:
-        status['misc'] = {}
-        status['misc']['aux-nco'] = {}
-        status['misc']['aux-dpll'] = {}
-        status['misc']['temperature'] = {}
-        r = dev.read_data(0x3002)
-        status['misc']['aux-nco']['nco1-phase-error'] = bool((r & 0x80)>>7)
-        status['misc']['aux-nco']['nco1-phase-slewing'] = bool((r & 0x40)>>6)
-        status['misc']['aux-nco']['nco0-phase-error'] = bool((r & 0x20)>>5)
-        status['misc']['aux-nco']['nco0-phase-slewing'] = bool((r & 0x10)>>4)
-        status['misc']['aux-dpll']['ref-status'] = (r & 0x04)>>2
-        status['misc']['aux-dpll']['lock-status'] = (r & 0x02)>>1
-        status['misc']['temperature']['alarm'] = bool((r & 0x01)>>0)
-        temp = (dev.read_data(0x3004) & 0xFF)<< 8 
-        temp |= dev.read_data(0x3003) & 0xFF
-        status['misc']['temperature']['value'] = u"{:.1f} degC".format(temp * pow(2,-7))
-
-    if args.ref_input:
-        status['ref-input'] = {}
-        for ref in ['a','aa','b','bb']: #TODO '0','1','2'..aux
-            status['ref-input'][ref] = {}
-        coupling = {
-            0: 'AC 1.2V',
-            1: 'DC 1.2V CMOS',
-            2: 'DC 1.8V CMOS',
-            3:u'DC 1.2V CMOS + 46k\u03A9pull-up',
-        }
-        ref_mode = {
-            0: 'single ended',
-            1: 'differential',
-        }
-        bw = {
-            0: 'narrow',
-            1: 'wide',
-        }
-        demod_polarity = {
-            0: 'manual',
-            1: 'automatic',
-        }
-        event_pol = {
-            0: 'narrow/wide',
-            1: 'wide/narrow',
-        }
-        mon_hysteresis = {
-            0: 'No hysteresis',
-            1: '3.125%',
-            2: '6.25%',
-            3: '12.5%',
-            4: '25%',
-            5: '50%',
-            6: '75%',
-            7: '87.5%',
-        }
-        r = dev.read_data(0x0300)
-        status['ref-input']['aa']['input-termination'] = coupling[(r & 0xC0)>>6]
-        status['ref-input']['a']['input-termination'] = coupling[(r & 0x30)>>4]
-        status['ref-input']['a']['differential'] = coupling[(r & 0x0C)>>2]
-        status['ref-input']['a-aa-input-mode'] = ref_mode[r & 0x01]
-        status['ref-input']['a-aa-demod-bw'] = bw[dev.read_data(0x0301) & 0x01]
-        base = 0x0302
-        for ref in ['a','aa']:
-            r = dev.read_data(base)
-            status['ref-input'][ref]['demod-polarity'] = demod_polarity[(r & 0x80)>>7]
-            status['ref-input'][ref]['demod-persist-enabled'] = bool((r & 0x40)>>6)
-            status['ref-input'][ref]['demod-sync-edge'] = (r & 0x30)>>4
-            status['ref-input'][ref]['demod-enabled'] = bool((r & 0x80)>>3)
-            status['ref-input'][ref]['demod-event-pol'] = event_pol[(r & 0x04)>>2]
-            status['ref-input'][ref]['demod-sensitivity'] = r & 0x03
-            base += 1
-        r = dev.read_data(0x0304)
-        status['ref-input']['bb']['input-termination'] = coupling[(r & 0xC0)>>6]
-        status['ref-input']['b']['input-termination'] = coupling[(r & 0x30)>>4]
-        status['ref-input']['b']['differential'] = coupling[(r & 0x0C)>>2]
-        status['ref-input']['b-bb-input-mode'] = ref_mode[r & 0x01]
-        status['ref-input']['b-bb-demod-bw'] = bw[dev.read_data(0x0305) & 0x01]
-        base = 0x0306
-        for ref in ['b','bb']:
-            r = dev.read_data(base)
-            status['ref-input'][ref]['demod-polarity'] = demod_polarity[(r & 0x80)>>7]
-            status['ref-input'][ref]['demod-persist-enabled'] = bool((r & 0x40)>>6)
-            status['ref-input'][ref]['demod-sync-edge'] = (r & 0x30)>>4
-            status['ref-input'][ref]['demod-enabled'] = bool((r & 0x80)>>3)
-            status['ref-input'][ref]['demod-event-pol'] = event_pol[(r & 0x04)>>2]
-            status['ref-input'][ref]['demod-sensitivity'] = r & 0x03
-            base += 1
-
-        #base = 0x030A
-        #for ref in ['0','1']:
-        #    r = dev.read_data(base)
-        #    status['ref-input'][ref]['aux-demod-polarity'] = demod_polarity[(r & 0x80)>>7]
-        #    status['ref-input'][ref]['aux-demod-persist-enabled'] = bool((r & 0x40)>>6)
-        #    status['ref-input'][ref]['aux-demod-sync-edge'] = (r & 0x30)>>4
-        #    status['ref-input'][ref]['aux-demod-enabled'] = bool((r & 0x80)>>3)
-        #    status['ref-input'][ref]['aux-demod-event-pol'] = event_pol[(r & 0x04)>>2]
-        #    status['ref-input'][ref]['aux-demod-sensitivity'] = r & 0x03
-        #    base += 1
-        #
-        #base = 0x030E
-        #for ref in ['ref2-aux','ref3-aux']:
-        #    r = dev.read_data(base)
-        #    status['ref-input'][ref]['demod-polarity'] = demod_polarity[(r & 0x80)>>7]
-        #    status['ref-input'][ref]['demod-persist-enabled'] = bool((r & 0x40)>>6)
-        #    status['ref-input'][ref]['demod-sync-edge'] = (r & 0x30)>>4
-        #    status['ref-input'][ref]['demod-enabled'] = bool((r & 0x80)>>3)
-        #    status['ref-input'][ref]['demod-event-pol'] = event_pol[(r & 0x04)>>2]
-        #    status['ref-input'][ref]['demod-sensitivity'] = r & 0x03
-        #    base += 1
-
-        base = 0x0400
-        for ref in ['a','aa','b','bb']: # '0','1'
-            rdiv =  dev.read_data(base+0)
-            rdiv += dev.read_data(base+1) << 8
-            rdiv += dev.read_data(base+2) << 16
-            rdiv += (dev.read_data(base+3) & 0x1F) << 24
-            status['ref-input'][ref]['r-div'] = rdiv+1 
-            per =  dev.read_data(base+4)
-            per += dev.read_data(base+5) << 8
-            per += dev.read_data(base+6) << 16
-            per += dev.read_data(base+7) << 24
-            per += dev.read_data(base+8) << 32
-            per += dev.read_data(base+9) << 40
-            per += dev.read_data(base+10) << 48
-            per += (dev.read_data(base+11) & 0x0F) << 56
-            status['ref-input'][ref]['freq'] = pow(10,18)/per 
-            t = dev.read_data(base+12)
-            t += dev.read_data(base+13) << 8
-            t += dev.read_data(base+14) << 16
-            status['ref-input'][ref]['max-freq-deviation'] = t /10E9 /(1-t/10E9)
-            status['ref-input'][ref]['mon-hysteresis'] = mon_hysteresis[dev.read_data(base+15) & 0x07]
-            t = dev.read_data(base+16)
-            t += dev.read_data(base+17)<<8
-            t += (dev.read_data(base+18)&0x0F)<<16
-            status['ref-input'][ref]['validation-time'] = '{:.3e} sec'.format(t /1000)
-            j = dev.read_data(base+19)
-            j += dev.read_data(base+20)
-            status['ref-input'][ref]['jitter-tolerance'] = '{:.3e} sec rms'.format(j /10E9)
-            base += 0x0020
-
-        base = 0x3005
-        for ref in ['a','aa','b','bb']:
-            r = dev.read_data(base)
-            status['ref-input'][ref]['loss-of-signal'] = bool((r&0x20)>>5)
-            status['ref-input'][ref]['valid'] = bool((r&0x10)>>4)
-            status['ref-input'][ref]['fault'] = bool((r&0x08)>>3)
-            status['ref-input'][ref]['jitter-excess'] = bool((r&0x04)>>2)
-            status['ref-input'][ref]['fast'] = bool((r&0x02)>>1)
-            status['ref-input'][ref]['slow'] = bool((r&0x01)>>0)
-            base += 1
-
-    if args.skew:
-        status['skew'] = {}
-        base = 0x3A2C
-        v = dev.read_data(base +0)
-        v+= dev.read_data(base +1)<<8
-        v+= dev.read_data(base +2)<<16
-        v+= dev.read_data(base +3)<<24
-        v+= dev.read_data(base +4)<<32
-        v+= dev.read_data(base +5)<<40
-        v+= dev.read_data(base +6)<<48
-        r = dev.read_data(base+7)
-        v += (r & 0x1F) << 56 #TODO lire 0x3A3A
-        status['skew']['offset'] = {}
-        status['skew']['offset']['value'] = v/1000 * pow(2,-16) #TODO /1000: typo in datasheet?
-        status['skew']['offset']['complete'] = bool((r & 0x80)>>7)
-
-        v = dev.read_data(0x3A34)
-        v+= dev.read_data(0x3A35)<<8
-        v+= dev.read_data(0x3A36)<<16
-        v+= dev.read_data(0x3A37)<<24
-        v+= dev.read_data(0x3A38)<<32
-        v+= dev.read_data(0x3A39)<<40
-        v+= dev.read_data(0x3A3A)<<48
-        r = dev.read_data(0x3A3B)
-        v+= (r & 0x1F) <<56 # TODO lire 0x3A34
-        status['skew']['drift'] = {}
-        tref_src = 1 #TODO
-        status['skew']['drift']['value'] = v *pow(2,-16)*1E-12 /tref_src 
-        status['skew']['drift']['complete'] = bool((r & 0x80)>>7)
-    
-    if args.irq:
-        status['irq'] = {}
-        for attr in ['sysclk', 'watchdog', 'ref', 'eeprom', 'aux-dpll', 'dpll', 'skew', 'utsp', 'aux-nco']:
-            status['irq'][attr] = {}
-        for ref in ['a','aa','b','bb']:
-            status['irq']['ref'][ref] = {}
-        for ch in ['0','1']:
-            status['irq']['dpll'][ch] = {}
-            status['irq']['utsp'][ch] = {}
-            status['irq']['aux-nco'][ch] = {}
-
-        r = dev.read_data(0x300B)
-        status['irq']['sysclk']['unlocked'] = bool((r & 0x80)>>7)
-        status['irq']['sysclk']['stabled'] = bool((r & 0x40)>>6)
-        status['irq']['sysclk']['locked'] = bool((r & 0x20)>>5)
-        status['irq']['sysclk']['calibration'] = {}
-        status['irq']['sysclk']['calibration']['start'] = bool((r & 0x10)>>4)
-        status['irq']['sysclk']['calibration']['end'] = bool((r & 0x08)>>3)
-        status['irq']['watchdog']['timeout'] = bool((r & 0x04)>>2)
-        status['irq']['eeprom']['fault'] = bool((r & 0x02)>>1)
-        status['irq']['eeprom']['complete'] = bool((r & 0x01)>>0)
-
-        r = dev.read_data(0x300C)
-        status['irq']['skew']['limit'] = bool((r & 0x20)>>5) 
-        status['irq']['temperature-warning'] = bool((r & 0x10)>>4) 
-        status['irq']['aux-dpll']['unfault'] = bool((r & 0x08)>>3)
-        status['irq']['aux-dpll']['fault'] = bool((r & 0x04)>>2)
-        status['irq']['aux-dpll']['unlock'] = bool((r & 0x02)>>1)
-        status['irq']['aux-dpll']['lock'] = bool((r & 0x01)>>0)
-        
-        for (ref, addr) in [('a', 0x300D), ('b', 0x300E)]:
-            r = dev.read_data(addr)
-            status['irq']['ref'][ref+ref]['div-resync'] = bool((r & 0x80)>>7)
-            status['irq']['ref'][ref+ref]['valid'] = bool((r & 0x40)>>6)
-            status['irq']['ref'][ref+ref]['unfault'] = bool((r & 0x20)>>5)
-            status['irq']['ref'][ref+ref]['fault'] = bool((r & 0x10)>>4)
-            status['irq']['ref'][ref]['div-resync'] = bool((r & 0x08)>>3)
-            status['irq']['ref'][ref]['valid'] = bool((r & 0x04)>>2)
-            status['irq']['ref'][ref]['unfault'] = bool((r & 0x02)>>1)
-            status['irq']['ref'][ref]['fault'] = bool((r & 0x01)>>0)
-
-        r = dev.read_data(0x300F)
-        status['irq']['skew']['update'] = bool((r & 0x10)>>4) 
-        status['irq']['utsp']['1']['update'] = bool((r & 0x08)>>3) 
-        status['irq']['utsp']['0']['update'] = bool((r & 0x04)>>2) 
-        status['irq']['aux-nco']['1']['event'] = bool((r & 0x02)>>1) 
-        status['irq']['aux-nco']['0']['event'] = bool((r & 0x01)>>0) 
-        
-        r = dev.read_data(0x3010)
-        status['irq']['dpll']['0']['freq-unclamped'] = bool((r&0x80)>>7)
-        status['irq']['dpll']['0']['freq-clamped'] = bool((r&0x40)>>6)
-        status['irq']['dpll']['0']['slew-limiter-inactive'] = bool((r&0x20)>>5)
-        status['irq']['dpll']['0']['slew-limiter-active'] = bool((r&0x10)>>4)
-        status['irq']['dpll']['0']['freq-unlocked'] = bool((r&0x08)>>3)
-        status['irq']['dpll']['0']['freq-locked'] = bool((r&0x04)>>2)
-        status['irq']['dpll']['0']['phase-unlocked'] = bool((r&0x02)>>1)
-        status['irq']['dpll']['0']['phase-locked'] = bool((r&0x01)>>0)
-        r = dev.read_data(0x3011)
-        status['irq']['dpll']['0']['ref-switch'] = bool((r&0x80)>>7)
-        status['irq']['dpll']['0']['free-run'] = bool((r&0x40)>>6)
-        status['irq']['dpll']['0']['holdover'] = bool((r&0x20)>>5)
-        status['irq']['dpll']['0']['hitless-entered'] = bool((r&0x10)>>4)
-        status['irq']['dpll']['0']['hitless-exit'] = bool((r&0x08)>>3)
-        status['irq']['dpll']['0']['holdover-ftw-upd'] = bool((r&0x04)>>1)
-        status['irq']['dpll']['0']['phase-step'] = bool((r&0x01)>>0)
-
-        #TODO dpll '1'
-        
-    if args.watchdog:
-        status['watchdog'] = {}
-        status['watchdog']['period'] = dev.read_data(0x10A) & 0xFF
-        status['watchdog']['period'] |= (dev.read_data(0x10B) & 0xFF)<<8
-
-    if args.distrib:
-        status['distrib'] = {}
-        for ch in ['ch0','ch1']:
-            status['distrib'][ch] = {}
-            pins = ['pll','a','aa','b','bb','outa','outb']
-            if ch == 'ch0':
-                pins.append('c')
-                pins.append('cc')
-                pins.append('outc')
-            for pin in pins:
-                status['distrib'][ch][pin] = {}
-                if 'out' in pin:
-                    status['distrib'][ch][pin]['+'] = {}
-                    status['distrib'][ch][pin]['-'] = {}
-        
-        fmts = {
-           0: 'cml',
-           1: 'hcsl',
-        }
-        currents = {
-            0: '7.6 mA',
-            1: '12.5 mA',
-            2: '15 mA',
-        }
-        modes = {
-            0: 'diff',
-            1: 'se',
-            2: 'sedd',
-        }
-        shot_mod = {
-            0: 'immediate',
-            1: 'triggered',
-        }
-        single_pulse_mod = {
-            0: 'balanced',
-            1: 'unbalanced',
-        }
-        mod_polarity = {
-            0: 'narrow/wide',
-            1: 'wide/narrow',
-        }
-        n_shot_mod = {
-            0: 'burst',
-            1: 'periodic',
-        }
-        retime_to_mod = {
-            0: 'carrier-retiming',
-            1: 'trigger-retiming',
-        }
-        retiming = {
-            0: 'direct',
-            1: 'retimed',
-        }
-        slew_mode = {
-            0: 'lag',
-            1: 'minimum-steps',
-        }
-        max_phase_slew = {
-            0: 'Q180°',
-            1: 'Q90°',
-            2: '1/32Q',
-            3: '1/16Q',
-            4: '1/8Q',
-            5: '1/4Q',
-            6: '1/2Q',
-            7: '1Q',
-        }
-        #################
-        #CH0        
-        #################
-        base = 0x1100
-        for pin in ['a','aa','b','bb','c','cc']:
-            div = dev.read_data( base+0 )
-            div += dev.read_data(base+1 ) << 8
-            div += dev.read_data(base+2 ) << 16
-            div += dev.read_data(base+3 ) << 24
-            status['distrib']['ch0'][pin]['q-div'] = div
-            offset = dev.read_data(base +4 )
-            offset += dev.read_data(base+5 ) <<8
-            offset += dev.read_data(base+6 ) <<16
-            offset += dev.read_data(base+7 ) <<24
-            r = dev.read_data(base+8)
-            offset += ((r & 0x40)>>6) << 32
-            status['distrib']['ch0'][pin]['phase-offset'] = offset
-            status['distrib']['ch0'][pin]['half-div'] = enabled[(r & 0x20)>>5]
-            status['distrib']['ch0'][pin]['pwm/phase'] = enabled[(r & 0x10)>>4]
-            status['distrib']['ch0'][pin]['slew-mode'] = slew_mode[(r & 0x08)>>3]
-            status['distrib']['ch0'][pin]['max-phase-slew'] = max_phase_slew[(r & 0x07)]
-            base += 9
-
-        mod = dev.read_data(0x10C0+0)
-        mod += dev.read_data(0x10C1+1) << 8
-        for pin in ['a','b','c']:
-            q_div = status['distrib']['ch0'][pin]['q-div']
-            try:
-                status['distrib']['ch0'][pin]['mod-step'] = mod /2 /q_div
-            except ZeroDivisionError:
-                status['distrib']['ch0'][pin]['mod-step'] = 0
-        
-        base = 0x10C2
-        for pin in ['a','b','c']:
-            mod = dev.read_data(base+0)
-            mod += dev.read_data(base+1) << 8
-            mod += dev.read_data(base+2) << 16
-            mod += (dev.read_data(base+3) &0x0F) << 24
-            status['distrib']['ch0'][pin]['mod-counter'] = mod
-            base += 6
-
-        r = dev.read_data(0x10CE) & 0x03
-        status['distrib']['ch0']['pll']['fb-div-sync-edge'] = r 
-
-        base = 0x10CF
-        for pin in ['a','b','c']:
-            r = dev.read_data(base) & 0x0F
-            status['distrib']['ch0'][pin]['n-shot-mod'] = shot_mod[(r & 0x08)>>3]
-            status['distrib']['ch0'][pin]['single-pulse-modulation'] = single_pulse_mod[(r & 0x04)>>2]
-            status['distrib']['ch0'][pin]['modulation-polarity'] = mod_polarity[(r & 0x02)>>1]
-            status['distrib']['ch0'][pin]['modulation'] = enabled[r & 0x01]
-            base += 1
-
-        r = dev.read_data(0x10D2)
-        status['distrib']['ch0']['pll']['n-shot-gap'] = r
-        r = dev.read_data(0x10D3)
-        status['distrib']['ch0']['pll']['n-shot-request-mode'] = n_shot_mod[(r & 0x40)>>6]
-        status['distrib']['ch0']['pll']['n-shots'] = r & 0x3F
-
-        r = dev.read_data(0x10D4)
-        status['distrib']['ch0']['bb']['prbs'] = enabled[(r&0x80)>>7] 
-        status['distrib']['ch0']['bb']['n-shot'] = enabled[(r&0x40)>>6]
-        status['distrib']['ch0']['b']['prbs'] = enabled[(r&0x20)>>5]
-        status['distrib']['ch0']['b']['n-shot'] = enabled[(r&0x10)>>4]
-        status['distrib']['ch0']['aa']['prbs'] = enabled[(r&0x08)>>3] 
-        status['distrib']['ch0']['aa']['n-shot'] = enabled[(r&0x04)>>2]
-        status['distrib']['ch0']['a']['prbs'] = enabled[(r&0x02)>>1]
-        status['distrib']['ch0']['a']['n-shot'] = enabled[r&0x01]
-        r = dev.read_data(0x10D5)
-        status['distrib']['ch0']['cc']['prbs'] = enabled[(r&0x08)>>3]
-        status['distrib']['ch0']['cc']['n-shot'] = enabled[(r&0x04)>>2]
-        status['distrib']['ch0']['c']['prbs'] = enabled[(r&0x02)>>1]
-        status['distrib']['ch0']['c']['n-shot'] = enabled[r&0x01]
-        r = dev.read_data(0x10D6)
-        status['distrib']['ch0']['pll']['nshot-2-mod-retime'] = retime_to_mod[(r & 0x10)>>4]
-        status['distrib']['ch0']['pll']['nshot-retiming'] = retiming[r & 0x01]
-
-        base = 0x10D7
-        for pin in ['a','b','c']:
-            r = dev.read_data(base)
-            status['distrib']['ch0'][pin]['mute-retiming'] = enabled[(r & 0x20)>>5]
-            status['distrib']['ch0'][pin]['mode'] = modes[(r & 0x18)>>3]
-            status['distrib']['ch0'][pin]['current'] = currents[(r & 0x03)>>1]
-            status['distrib']['ch0'][pin]['format'] = fmts[r & 0x01]
-            base += 1
-        
-        r = dev.read_data(0x310D)
-        status['distrib']['ch0']['cc']['phase-slewing'] = enabled[(r & 0x20)>>5]
-        status['distrib']['ch0']['c']['phase-slewing'] = enabled[(r & 0x10)>>4]
-        status['distrib']['ch0']['bb']['phase-slewing'] = enabled[(r & 0x08)>>3]
-        status['distrib']['ch0']['b']['phase-slewing'] = enabled[(r & 0x04)>>2]
-        status['distrib']['ch0']['aa']['phase-slewing'] = enabled[(r & 0x02)>>1]
-        status['distrib']['ch0']['a']['phase-slewing'] = enabled[r & 0x01]
-        
-        r = dev.read_data(0x310E)
-        status['distrib']['ch0']['cc']['phase-ctrl-error'] = bool((r & 0x20)>>5)
-        status['distrib']['ch0']['c']['phase-ctrl-error'] = bool((r & 0x10)>>4)
-        status['distrib']['ch0']['bb']['phase-ctrl-error'] = bool((r & 0x08)>>3)
-        status['distrib']['ch0']['b']['phase-ctrl-error'] = bool((r & 0x04)>>2)
-        status['distrib']['ch0']['aa']['phase-ctrl-error'] = bool((r & 0x02)>>1)
-        status['distrib']['ch0']['a']['phase-ctrl-error'] = bool((r & 0x01)>>0)
-        
-        #################
-        #CH1        
-        #################
-        base = 0x1500
-        for pin in ['a','aa','b','bb']:
-            div = dev.read_data( base+0 )
-            div += dev.read_data(base+1 ) << 8
-            div += dev.read_data(base+2 ) << 16
-            div += dev.read_data(base+3 ) << 24
-            status['distrib']['ch1'][pin]['q-div'] = div
-            offset = dev.read_data(base +4 )
-            offset += dev.read_data(base+5 ) <<8
-            offset += dev.read_data(base+6 ) <<16
-            offset += dev.read_data(base+7 ) <<24
-            r = dev.read_data(base+8)
-            offset += ((r & 0x40)>>6) << 32
-            status['distrib']['ch1'][pin]['phase-offset'] = offset
-            status['distrib']['ch1'][pin]['half-div'] = enabled[(r & 0x20)>>5]
-            status['distrib']['ch1'][pin]['pwm/phase'] = enabled[(r & 0x10)>>4]
-            status['distrib']['ch1'][pin]['slew-mode'] = slew_mode[(r & 0x08)>>3]
-            status['distrib']['ch1'][pin]['max-phase-slew'] = max_phase_slew[(r & 0x07)]
-            base += 9
-
-        mod = dev.read_data(0x14C0+0)
-        mod += dev.read_data(0x14C1+1) << 8
-        for pin in ['a','b']:
-            q_div = status['distrib']['ch1'][pin]['q-div']
-            try:
-                status['distrib']['ch1'][pin]['mod-step'] = mod /2 /q_div
-            except ZeroDivisionError:
-                status['distrib']['ch1'][pin]['mod-step'] = 0
-        
-        base = 0x14C2
-        for pin in ['a','b']:
-            mod = dev.read_data(base+0)
-            mod += dev.read_data(base+1) << 8
-            mod += dev.read_data(base+2) << 16
-            mod += (dev.read_data(base+3) &0x0F) << 24
-            status['distrib']['ch1'][pin]['mod-counter'] = mod
-            base += 6
-
-        r = dev.read_data(0x14CE) & 0x03
-        status['distrib']['ch1']['pll']['fb-div-sync-edge'] = r 
-
-        base = 0x14CF
-        for pin in ['a','b']:
-            r = dev.read_data(base) & 0x0F
-            status['distrib']['ch1'][pin]['n-shot-mod'] = shot_mod[(r & 0x08)>>3]
-            status['distrib']['ch1'][pin]['single-pulse-modulation'] = single_pulse_mod[(r & 0x04)>>2]
-            status['distrib']['ch1'][pin]['modulation-polarity'] = mod_polarity[(r & 0x02)>>1]
-            status['distrib']['ch1'][pin]['modulation'] = enabled[r & 0x01]
-            base += 1
-
-        r = dev.read_data(0x14D2)
-        status['distrib']['ch1']['pll']['n-shot-gap'] = r
-        r = dev.read_data(0x14D3)
-        status['distrib']['ch1']['pll']['n-shot-request-mode'] = n_shot_mod[(r & 0x40)>>6]
-        status['distrib']['ch1']['pll']['n-shots'] = r & 0x3F
-
-        r = dev.read_data(0x14D4)
-        status['distrib']['ch1']['bb']['prbs'] = enabled[(r&0x80)>>7] 
-        status['distrib']['ch1']['bb']['n-shot'] = enabled[(r&0x40)>>6]
-        status['distrib']['ch1']['b']['prbs'] = enabled[(r&0x20)>>5]
-        status['distrib']['ch1']['b']['n-shot'] = enabled[(r&0x10)>>4]
-        status['distrib']['ch1']['aa']['prbs'] = enabled[(r&0x08)>>3] 
-        status['distrib']['ch1']['aa']['n-shot'] = enabled[(r&0x04)>>2]
-        status['distrib']['ch1']['a']['prbs'] = enabled[(r&0x02)>>1]
-        status['distrib']['ch1']['a']['n-shot'] = enabled[r&0x01]
-        r = dev.read_data(0x14D6)
-        status['distrib']['ch1']['pll']['nshot-2-mod-retime'] = retime_to_mod[(r & 0x10)>>4]
-        status['distrib']['ch1']['pll']['nshot-retiming'] = retiming[r & 0x01]
-
-        base = 0x14D7
-        for pin in ['a','b']:
-            r = dev.read_data(base)
-            status['distrib']['ch1'][pin]['mute-retiming'] = enabled[(r & 0x20)>>5]
-            status['distrib']['ch1'][pin]['mode'] = modes[(r & 0x18)>>3]
-            status['distrib']['ch1'][pin]['current'] = currents[(r & 0x03)>>1]
-            status['distrib']['ch1'][pin]['format'] = fmts[r & 0x01]
-            base += 1
+    dev = open_device(args, cache=args.cache)
         
-        r = dev.read_data(0x320D)
-        status['distrib']['ch1']['bb']['phase-slewing'] = enabled[(r & 0x08)>>3]
-        status['distrib']['ch1']['b']['phase-slewing'] = enabled[(r & 0x04)>>2]
-        status['distrib']['ch1']['aa']['phase-slewing'] = enabled[(r & 0x02)>>1]
-        status['distrib']['ch1']['a']['phase-slewing'] = enabled[r & 0x01]
-        
-        r = dev.read_data(0x320E)
-        status['distrib']['ch1']['bb']['phase-ctrl-error'] = bool((r & 0x08)>>3)
-        status['distrib']['ch1']['b']['phase-ctrl-error'] = bool((r & 0x04)>>2)
-        status['distrib']['ch1']['aa']['phase-ctrl-error'] = bool((r & 0x02)>>1)
-        status['distrib']['ch1']['a']['phase-ctrl-error'] = bool((r & 0x01)>>0)
-
-        base = 0x2100
-        for ch in ['ch0','ch1']:
-            r = dev.read_data(base+0)
-            status['distrib'][ch]['reset'] = bool((r & 0x04)>>2)
-            status['distrib'][ch]['muted'] = bool((r & 0x02)>>1)
-            r = dev.read_data(base+1)
-            status['distrib'][ch]['outa']['reset'] = bool((r & 0x20)>>5)
-            status['distrib'][ch]['outa']['power-down'] = bool((r & 0x10)>>4)
-            status['distrib'][ch]['outa']['-']['muted'] = bool((r & 0x08)>>3)
-            status['distrib'][ch]['outa']['+']['muted'] = bool((r & 0x04)>>2)
-            r = dev.read_data(base+2)
-            status['distrib'][ch]['outb']['reset'] = bool((r & 0x20)>>5)
-            status['distrib'][ch]['outb']['power-down'] = bool((r & 0x10)>>4)
-            status['distrib'][ch]['outb']['-']['muted'] = bool((r & 0x08)>>3)
-            status['distrib'][ch]['outb']['+']['muted'] = bool((r & 0x04)>>2)
-            if ch == 'ch0':
-                r = dev.read_data(base+2)
-                status['distrib'][ch]['outc']['reset'] = bool((r & 0x20)>>5)
-                status['distrib'][ch]['outc']['power-down'] = bool((r & 0x10)>>4)
-                status['distrib'][ch]['outc']['-']['muted'] = bool((r & 0x08)>>3)
-                status['distrib'][ch]['outc']['+']['muted'] = bool((r & 0x04)>>2)
-            base += 0x100
- 
-    if args.ccdpll:
-        status['ccdpll'] = {}
-        status['ccdpll']['ccs'] = {}
-        status['ccdpll']['lock-detector'] = {}
-        r = dev.read_data(0x0D00)
-        r += dev.read_data(0x0D01) << 8
-        status['ccdpll']['lock-detector']['threshold'] = r * pow(10,-12)
-        status['ccdpll']['lock-detector']['fill'] = dev.read_data(0x0D02) 
-        status['ccdpll']['lock-detector']['drain'] = dev.read_data(0x0D03) 
-        r = dev.read_data(0x0D04)
-        r += dev.read_data(0x0D05) << 8
-        status['ccdpll']['lock-detector']['delay'] = r 
-
-        sources = {
-            0: 'REFA',
-            1: 'REFAA',
-            2: 'REFB',
-            3: 'REFBB',
-            6: 'aux-ref0',
-            7: 'aux-ref1',
-            11: 'aux-ref2',
-            12: 'aux-ref3',
-            30: 'local timescale immediate sync',
-            31: 'None',
-        }
-        tagging = {
-            0: 'normal',
-            1: 'tagged',
-        }
-
-        base = 0x0D10
-        for cr in ['cr0','cr1']:
-            status['ccdpll'][cr] = {}
-            r = dev.read_data(base+0)
-            status['ccdpll'][cr]['enabled'] = bool((r&0x80)>>7)
-            status['ccdpll'][cr]['ts-source'] = sources[r & 0x1F]
-
-            r = dev.read_data(base +1)
-            status['ccdpll'][cr]['ccs'] = {}
-            status['ccdpll'][cr]['ccs']['tagging'] = tagging[(r & 0x80)>>7]
-            status['ccdpll'][cr]['ccs']['source-sync'] = sources[(r & 0x1F)>>0]
-
-            num = dev.read_data(base +2)
-            num+= dev.read_data(base +3) <<8
-            num+= dev.read_data(base +4) <<16
-            num+= dev.read_data(base +5) <<24
-            denom = dev.read_data(base +6)
-            denom+= dev.read_data(base +7) <<8
-            denom+= dev.read_data(base +8) <<16
-            denom+= dev.read_data(base +9) <<24
-            denom+= dev.read_data(base +10) <<32
-            status['ccdpll'][cr]['numerator'] = num
-            status['ccdpll'][cr]['denominator'] = denom
-            skew = dev.read_data(base +11)
-            skew+= dev.read_data(base +12)<<8
-            skew+= dev.read_data(base +13)<<16
-            status['ccdpll'][cr]['skew'] = skew * pow(2,-48)
-            base += 0x010
-
-        t = dev.read_data(0x0D30)
-        t+= dev.read_data(0x0D31) <<8
-        t+= dev.read_data(0x0D32) <<16
-        t+= dev.read_data(0x0D33) <<24
-        status['ccdpll']['ccs']['offset'] = t*pow(2,-48)
-
-        skew = dev.read_data(0x0D34)
-        skew+= dev.read_data(0x0D35)<<8
-        skew+= dev.read_data(0x0D36)<<16
-        status['ccdpll']['ccs']['skew-limit'] = '{:.3e} ppm'.format(skew * pow(2,-16))
-
-        status['ccdpll']['ccs']['guard'] = {}
-        guard = dev.read_data(0x0D37)
-        guard+= dev.read_data(0x0D38)<<8
-        status['ccdpll']['ccs']['guard']['latency'] = guard * pow(2,-16)
-        guard = dev.read_data(0x0D39)
-        guard+= dev.read_data(0x0D3A)<<8
-        guard+= (dev.read_data(0x0D3B) & 0x0F)<<16
-        status['ccdpll']['ccs']['guard']['adjustment'] = guard * pow(2,-12)
-        status['ccdpll']['ccs']['guard']['bypass-lock'] = bool(dev.read_data(0x0D3C)&0x01)
-
-        r = dev.read_data(0x0D40)
-        states = {
-            0: 'normal',
-            1: 'triggered by event',
-        }
-        slew_status = {
-            0: 'not active',
-            1: 'actively limiting',
-        }
-        valid = {
-            0: 'invalid',
-            1: 'valid',
-        }
-        primary = {
-            0: "primary",
-            1: "secondary",
-        }
-        status['ccdpll']['ccs']['guard']['status'] = states[(r & 0x80)>>7] 
-        status['ccdpll']['ccs']['slew-limiter-status'] = slew_status[(r & 0x40)>>6] 
-        status['ccdpll']['cr1']['source'] = valid[(r & 0x20)>>5] 
-        status['ccdpll']['cr0']['source'] = valid[(r & 0x10)>>4]
-        status['ccdpll']['active-source'] = primary[(r & 0x80)>>3]
-        status['ccdpll']['ready'] = bool((r & 0x04)>>2)
-        status['ccdpll']['phase-locked'] = bool((r & 0x02)>>1)
-        status['ccdpll']['active'] = bool((r & 0x01)>>0)
-
-    if args.uts:
-        status['uts'] = {}
-        dev.io_update() # triggers UTPSx latching, that
-            # we deal with at the very end
-
-        formats = {
-            0: 'normal',
-            1: 'ptp',
-        }
-        sources = {
-            0: 'REFA',
-            1: 'REFAA',
-            2: 'REFB',
-            3: 'REFBB',
-            4: 'dpll0',
-            5: 'dpll1',
-            6: 'aux-ref0',
-            7: 'aux-ref1',
-            8: 'aux-nco0',
-            9: 'aux-nco1',
-            11: 'aux-ref2',
-            12: 'aux-ref3',
-            13: 'iuts0',
-            14: 'iuts1',
-        }
-
-        timescales = {
-            0: "aux-nco0",
-            1: "ccs",
-            2: "aux-nco1",
-        }
-        
-        for c in range (9):
-            status['uts'][str(c)] = {}
-        
-            r = dev.read_data(0x0E00 + c*0x05) & 0x0F
-            status['uts'][str(c)]['format'] = formats[(r & 0x02)>>1] 
-            status['uts'][str(c)]['enabled'] = bool((r&0x01)>>0)
-            flags = (r & 0x1C)>>2
-            (invalid, fault, unlocked, fmt, tag) = (False,False,False,False,False)
-            if flags == 0:
-                tag = True
-                invalid = True
-                unlocked = True
-            elif flags == 1:
-                tag = True
-                fault = True
-                unlocked = True
-            elif flags == 2:
-                fmt = True
-                invalid = True
-                unlocked = True
-            elif flags == 3:
-                fmt = True
-                fault = True
-                unlocked = True
-            elif flags == 4:
-                fault = True
-                invalid = True
-                unlocked = True
-            elif flags == 5:
-                fmt = True
-                tag = True
-                unlocked = True
-                invalid = True
-            elif flags == 6:
-                fmt = True
-                tag = True
-                unlocked = True
-                fault = True
-            status['uts'][str(c)]['flags'] = {}
-            status['uts'][str(c)]['flags']['invalid'] = invalid
-            status['uts'][str(c)]['flags']['fault'] = fault
-            status['uts'][str(c)]['flags']['unlocked'] = fault
-            status['uts'][str(c)]['flags']['format'] = fmt
-            status['uts'][str(c)]['flags']['tag'] = tag
-
-            r = dev.read_data(0xE00+1 + c*0x05)
-            status['uts'][str(c)]['tagged-timestamps'] = bool((r&0x10)>>4)
-            status['uts'][str(c)]['source'] = sources[(r & 0x1F)]
-
-            v = dev.read_data(0xE00+2 +c*0x05)
-            v += dev.read_data(0xE00+3 +c*0x05) << 8
-            v += dev.read_data(0xE00+4 +c*0x05) << 16
-            status['uts'][str(c)]['reading'] = sign_extend(v,48) * pow(2,-48) # 1 bit = 1sec/2^48
-
-        r = dev.read_data(0x0E2D)
-        status['uts']['fifo'] = {}
-        status['uts']['fifo']['overfill'] = bool((r & 0x80)>>7)
-        status['uts']['fifo']['count'] = r & 0x7F
-        r = dev.read_data(0x0E2E)
-        status['uts']['fifo']['flags'] = (r & 0xE0)>>5
-        status['uts']['fifo']['source'] = sources[(r & 0x1F)]
-        v0 = dev.read_data(0x0E2F)
-        v0 += dev.read_data(0x0E30) << 8 
-        v0 += dev.read_data(0x0E31) << 16 
-        v0 += dev.read_data(0x0E32) << 24 
-        v0 += dev.read_data(0x0E33) << 32 
-        v0 += dev.read_data(0x0E34) << 40 
-        v1 = dev.read_data(0x0E35) 
-        v1 += dev.read_data(0x0E36) << 8
-        v1 += dev.read_data(0x0E37) << 16 
-        v1 += dev.read_data(0x0E38) << 24 
-        v1 += dev.read_data(0x0E39) << 32 
-        v1 += dev.read_data(0x0E3A) << 40 
-        status['uts']['fifo']['timecode'] = {}
-        status['uts']['fifo']['timecode']['s'] = v1
-        if status['uts']['0']['format'] == 'ptp':
-            ns = sign_extend(v0 & 0x3FFFFFFFFFFF, 48)
-            status['uts']['fifo']['timecode']['ns'] = ns * pow(2,-16)
-        else:
-            ns = sign_extend(v0, 48)
-            status['uts']['fifo']['timecode']['ns'] = ns * pow(2,-48)
-
-        source_kinds = {
-            0: "all",
-            1: "only-tagged",
-        }
-
-        base = 0x2A12
-        for ch in range (2):
-            status['utsp'] = {}
-            status['utsp'][str(ch)] = {}
-            r = dev.read_data(base +ch)
-            status['utsp'][str(ch)]['time-scale'] = timescales[(r&0xC0)>>6] 
-            status['utsp'][str(ch)]['source'] = source_kinds[(r&0x40)>>5]
-            status['utsp'][str(ch)]['timestamp-source'] = sources[(r & 0x1F)]
-
-        base = 0x3A14
-        for ch in range(2):
-            status['uts'][str(ch)]['output'] = {}
-            itg = dev.read_data(base)
-            itg+= dev.read_data(base+1)<<8
-            itg+= dev.read_data(base+2)<<16
-            itg+= dev.read_data(base+3)<<24
-            itg+= dev.read_data(base+4)<<32
-            fract = dev.read_data(base+5)
-            fract+= dev.read_data(base+6)<<8
-            fract+= dev.read_data(base+7)<<16
-            fract+= dev.read_data(base+8)<<24
-            fract+= dev.read_data(base+9)<<32
-            t0 = 1 # TODO retrieve time scale 
-            status['uts'][str(ch)]['output']['integer'] = itg * t0 
-            status['uts'][str(ch)]['output']['fractionnal'] = fract * t0 * pow(2,-40)
-            status['uts'][str(ch)]['missed'] = dev.read_data(base+10)
-            status['uts'][str(ch)]['overdue'] = bool(dev.read_data(base+11) & 0x01)
-            base += 12
-
-    if args.iuts:
-        status['iuts'] = {}
-        base = 0x0F00
-        offset = 0x04
-        for i in range (2):
-            status['iuts'][str(i)] = {}
-            r = dev.read_data(base + offset * i)
-            status['iuts'][str(i)]['bypass-ccdpll-lock'] = bool((r & 0x02)>>1)
-            status['iuts'][str(i)]['valid'] = bool((r & 0x01)>>0)
-            v = dev.read_data(base+1 + offset * i)
-            v += dev.read_data(base+2 + offset * i) << 8
-            v += dev.read_data(base+2 + offset * i) << 24
-            status['iuts'][str(i)]['reading'] = sign_extend(v,32) * pow(2,-48)
-        
-        r = dev.read_data(0x0F09)
-        formats = {
-            0: 'normal',
-            1: 'ptp',
-        }
-        destinations = {
-            13: 'iuts0',
-            14: 'iuts1',
-            30: 'ccs sync0 timecode',
-            31: 'ccs sync1 timecode',
-        }
-        status['iuts']['format'] = formats[(r & 0x80)>>7] 
+    sections = [flag for (flag, _) in flags if getattr(args, flag.replace("-", "_"))]
+    keys = args.filter_by_key.split(",") if args.filter_by_key else None
+    if len(sections) == 0 and queries:
+        trees = {name: layout(name) for name in DECODERS}
+        sections = list(select(trees, queries, layout=True).keys())
+
+    def output (filtered):
+        if args.filter_by_value: # works on previously filtered dataset
+            for category in filtered.keys():
+                filtered[category] = select(filtered[category], values)
+        if args.unpack:
+            filtered = unpack(filtered)
+        return filtered
+
+    if args.cache and args.watch is None:
+        parser.error("--cache requires --watch")
+    if args.delta and args.watch is None:
+        parser.error("--delta requires --watch")
+    if args.irq_gated and args.watch is None:
+        parser.error("--irq-gated requires --watch")
+    if args.clear_irq and not (args.irq_gated or args.delta):
+        parser.error("--clear-irq requires --irq-gated or --delta")
+    if args.irq_gated:
         try:
-            status['iuts']['destination'] = destinations[(r & 0x1F)]
-        except KeyError:
-            status['iuts']['destination'] = 'unknown/default' 
-        v0 = dev.read_data(0x0F0A)
-        v0 += dev.read_data(0x0F0B) << 8
-        v0 += dev.read_data(0x0F0C) << 16
-        v0 += dev.read_data(0x0F0D) << 24
-        v0 += dev.read_data(0x0F0E) << 32
-        v0 += dev.read_data(0x0F0F) << 40
-        v1 = dev.read_data(0x0F10)
-        v1 += dev.read_data(0x0F11) << 8
-        v1 += dev.read_data(0x0F12) << 16
-        v1 += dev.read_data(0x0F13) << 24
-        v1 += dev.read_data(0x0F14) << 32
-        v1 += dev.read_data(0x0F15) << 40
-        status['iuts']['timecode'] = {}
-        status['iuts']['timecode']['s'] = v0
-        if status['iuts']['format'] == 'ptp':
-            ns = sign_extend(v0 & 0x3FFFFFFFFFFF, 48)
-            status['iuts']['timecode']['ns'] = ns *pow(2,-16)
-        else:
-            ns = sign_extend(v0, 48)
-            status['iuts']['timecode']['ns'] = ns *pow(2,-48)
-    
-        r = dev.read_data(0x3023)
-        status['iuts']['0']['valid'] = bool((r&0x02)>>1)
-        status['iuts']['1']['valid'] = bool((r&0x01)>>0)
-
-    #print("======== TOTAL ===============")
-    #print(json.dumps(status, sort_keys=True, indent=2))
-    #print("==============================")
- 
-    if args.filter_by_key:
-        filters = args.filter_by_key.split(",")
-        for _filter in filters:
-            if _filter == filters[0]: # first filter
-                # => create work structure
-                filtered = {}
-            for category in status.keys(): # filter all categories
-                if _filter == filters[0]: # first filter
-                    # => create work structure
-                    filtered[category] = {}
-                    # and work from status report
-                    data = filter_by_key(status[category], _filter)
-                else:
-                    # work from already filtered data
-                    data = filter_by_key(filtered[category], _filter)
+            gated = [name for name in sections if name != "irq"] # always reported
+            monitor = IrqMonitor(dev, gated, keys, queries, clear=args.clear_irq, io_update=True)
+        except ValueError as e:
+            parser.error(str(e))
+        dev.section("status.py --watch")
+        try:
+            for (t, status) in monitor.watch(args.watch, args.count):
+                line = {"t": t, "status": output(status)}
+                print(json.dumps(line, sort_keys=True, separators=(",", ":")), flush=True)
+        except (KeyboardInterrupt, BrokenPipeError):
+            pass
+        return
+    if args.delta:
+        sampler = Sampler(dev, sections, keys, queries, io_update=True, irq=True, clear=args.clear_irq)
+        dev.section("status.py --watch")
+        try:
+            for (t, changes) in sampler.changes(args.watch, args.count, output=output):
+                for (path, old, new) in changes:
+                    label = "{:.6f} {}:".format(t, ".".join(path)) if len(path) > 0 else "{:.6f}".format(t) # unpacked to single value
+                    if old is None: # first sample
+                        print("{} {}".format(label, json.dumps(new)))
+                    else:
+                        print("{} {} -> {}".format(label, json.dumps(old), json.dumps(new)))
+                sys.stdout.flush()
+        except (KeyboardInterrupt, BrokenPipeError):
+            pass
+        return
+
+    if args.watch is not None:
+        # I/O update is required priori reading some status registers:
+        # only once, the device remains open
+        sampler = Sampler(dev, sections, keys, queries, io_update=True)
+        dev.section("status.py --watch")
+        try:
+            for (t, status) in sampler.watch(args.watch, args.count):
+                line = {"t": t, "status": output(status)}
+                print(json.dumps(line, sort_keys=True, separators=(",", ":")), flush=True)
+        except (KeyboardInterrupt, BrokenPipeError):
+            pass
+        return
+
+    # I/O update is required priori reading some status registers
+    filtered = report(dev, sections, io_update=True, keys=keys, queries=queries)
+    print(json.dumps(output(filtered), sort_keys=True, indent=2))
+
+def watching (argv):
+    """ Watch mode streams samples until interrupted:
+    it is never forwarded to the daemon """
+    parser = argparse.ArgumentParser(add_help=False)
+    parser.add_argument("--watch")
+    parser.add_argument("--watchdog", action="store_true")
+    (args, _) = parser.parse_known_args(argv)
+    return args.watch is not None
+
+main.local = watching
 
-                if len(data) == 0: # not a single match
-                    # assumes incorrect key filter 
-                    # ==> preserve complete data set
-                    filtered[category] = status[category].copy()
-                else:
-                    filtered[category] |= data
-    else: # plain copy
-        filtered = status.copy()
-                
-    if args.filter_by_value:
-        filters = args.filter_by_value.split(",")
-        print("Filter by value is work in progress")
-        #_filtered = {} # next dataset
-        #for _filter in filters:
-        #    # works on previously filtered dataset
-        #    for category in filtered.keys(): 
-        #        if not category in _filtered:
-        #            _filtered[category] = {} # create work struct
-        #        data = filter_by_value(filtered[category], _filter) 
-        #        if len(data) > 0:
-        #            _filtered[category] |= data 
-        #filtered = _filtered.copy() # replace by possibily stripped dataset
-
-    if args.unpack:
-        filtered = unpack(filtered)
-
-    print(json.dumps(filtered, sort_keys=True, indent=2))
-    
 if __name__ == "__main__":
-    main(sys.argv[1:])
+    run_script(main, sys.argv[1:])
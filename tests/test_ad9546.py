@@ -0,0 +1,371 @@
+#! /usr/bin/env python3
+# AD9546 class & transports,
+# exercised without any hardware attached
+import os
+import sys
+import json
+import time
+import threading
+ROOT = os.path.join(os.path.dirname(__file__), "..")
+sys.path.insert(0, ROOT)
+EXAMPLE = os.path.join(ROOT, "example.json")
+from ad9546 import *
+
+class FakeSpiDev :
+    """ spidev.SpiDev stand-in, emulates AD9546 SPI port
+    with default (descending) address streaming """
+    def __init__ (self):
+        self.image = bytearray(0x4000)
+        self.xfers = []
+    def xfer2 (self, data):
+        self.xfers.append(list(data))
+        read = bool(data[0] & 0x80)
+        addr = ((data[0] & 0x7F)<<8) | data[1]
+        ret = [0, 0]
+        for i, d in enumerate(data[2:]):
+            if read:
+                ret.append(self.image[addr-i])
+            else:
+                self.image[addr-i] = d
+                ret.append(0)
+        return ret
+    def close (self):
+        pass
+
+def spi_device ():
+    fake = FakeSpiDev()
+    dev = AD9546(transport=SPITransport(0, 0, handle=fake))
+    return (dev, fake)
+
+def test_spi_single_byte():
+    (dev, fake) = spi_device()
+    dev.write_data(0x0102, 0xA5)
+    assert fake.xfers[-1] == [0x01, 0x02, 0xA5]
+    assert fake.image[0x0102] == 0xA5
+    assert dev.read_data(0x0102) == 0xA5
+    assert fake.xfers[-1] == [0x81, 0x02, 0x00]
+
+def test_spi_block_streaming():
+    (dev, fake) = spi_device()
+    dev.write_block(0x1100, [1, 2, 3, 4])
+    assert len(fake.xfers) == 1 # single transaction
+    assert list(fake.image[0x1100:0x1104]) == [1, 2, 3, 4]
+    assert dev.read_block(0x1100, 4) == [1, 2, 3, 4]
+    assert len(fake.xfers) == 2
+    assert dev.read_segments([(0x1101, 2), (0x1100, 1)]) == [[2, 3], [1]]
+
+def test_spi_io_update():
+    (dev, fake) = spi_device()
+    dev.io_update()
+    assert fake.xfers[-1] == [0x00, 0x0F, 0x01]
+
+def test_spi_ascending_cli(monkeypatch):
+    import argparse
+    import ad9546
+    parser = argparse.ArgumentParser()
+    parser.add_argument("bus")
+    parser.add_argument("address")
+    add_interface_args(parser)
+    args = parser.parse_args(["0", "1", "--spi", "--spi-ascending", "--no-lock"])
+    monkeypatch.setattr(ad9546, "SPITransport",
+        lambda bus, cs, speed, ascending: SPITransport(bus, cs, speed, ascending, handle=FakeSpiDev()))
+    assert open_device(args).transport.ascending
+
+def test_sim_io_update():
+    sim = SimTransport()
+    dev = AD9546(transport=sim)
+    dev.write_data(0x1100, 0x12)
+    assert dev.read_data(0x1100) == 0x00 # not active yet
+    dev.write_data(0x0001, 0x40) # buffered read
+    assert dev.read_data(0x1100) == 0x12
+    dev.write_data(0x0001, 0x00)
+    dev.io_update()
+    assert dev.read_data(0x1100) == 0x12
+    assert dev.read_data(0x000F) == 0x00 # self clearing
+
+def test_sim_self_clearing():
+    sim = SimTransport()
+    dev = AD9546(transport=sim)
+    sim.poke(0x300B, [0xFF, 0xFF])
+    dev.write_data(0x2000, 0x03) # calibrate all + power down
+    dev.write_data(0x2006, 0x0F) # clear some 0x300B bits
+    dev.io_update()
+    assert dev.read_data(0x2000) == 0x01
+    assert dev.read_block(0x300B, 2) == [0xF0, 0xFF]
+    assert dev.read_data(0x2006) == 0x00
+    dev.write_data(0x2005, 0x01) # clear all
+    dev.io_update()
+    assert dev.read_block(0x300B, 2) == [0x00, 0x00]
+    assert dev.read_data(0x2005) == 0x00
+
+def test_regmap_dump_sim(tmp_path):
+    import regmap
+    dump = str(tmp_path / "dump.json")
+    regmap.main(["0", "0x48", "--sim", EXAMPLE, "--dump", dump, "--quiet"])
+    with open(EXAMPLE, encoding="utf-8-sig") as fd:
+        expected = json.load(fd)["RegisterMap"]
+    with open(dump) as fd:
+        dumped = json.load(fd)["RegisterMap"]
+    for addr in expected:
+        assert int(dumped[addr], 16) == int(expected[addr], 16)
+
+class CountingSim (SimTransport):
+    """ SimTransport that records transactions """
+    def __init__ (self, regmap=None):
+        super().__init__(regmap)
+        self.writes = []
+        self.reads = []
+    def write (self, addr, data):
+        self.writes.append((addr, list(data)))
+        super().write(addr, data)
+    def read (self, addr, length):
+        self.reads.append((addr, length))
+        return super().read(addr, length)
+
+def test_write_back_merges():
+    sim = CountingSim()
+    dev = AD9546(transport=sim, write_back=True)
+    for (mask, value) in [(0x03, 0x01), (0x0C, 0x08), (0x30, 0x20)]:
+        r = dev.read_data(0x0302)
+        dev.write_data(0x0302, (r & (mask ^0xFF)) | value)
+    dev.write_data(0x0303, 0x55)
+    dev.write_data(0x0306, 0x66)
+    assert sim.writes == [] # nothing committed yet
+    assert dev.read_data(0x0302) == 0x29 # read back own writes
+    dev.io_update()
+    assert sim.writes == [(0x0302, [0x29, 0x55]), (0x0306, [0x66]), (0x000F, [0x01])]
+    assert dev.read_block(0x0302, 2) == [0x29, 0x55]
+
+def test_write_back_unbuffered():
+    sim = CountingSim()
+    dev = AD9546(transport=sim, write_back=True)
+    dev.write_data(0x0000, 0x00) # serial port: immediate
+    assert sim.writes == [(0x0000, [0x00])]
+
+def test_read_cache():
+    sim = CountingSim(EXAMPLE)
+    dev = AD9546(transport=sim, cache=True)
+    q_div = dev.read_block(0x1100, 4)
+    assert dev.read_block(0x1100, 4) == q_div
+    dev.read_data(0x3001)
+    dev.read_data(0x3001)
+    assert sim.reads == [(0x1100, 4), (0x3001, 1), (0x3001, 1)] # status: always live
+    dev.write_data(0x1101, 0xAA)
+    dev.read_block(0x1100, 4)
+    assert sim.reads[-1] == (0x1101, 1) # only invalidated register
+    dev.io_update()
+    assert dev.read_data(0x1101) == 0xAA
+    dev.read_data(0x1100)
+    assert sim.reads[-1] == (0x1101, 1)
+    dev.write_data(0x0000, 0x81) # soft reset
+    dev.read_data(0x1100)
+    assert sim.reads[-1] == (0x1100, 1)
+
+def test_update_fields():
+    sim = CountingSim()
+    dev = AD9546(transport=sim)
+    sim.poke(0x0100, [0xFF, 0xFF, 0x00, 0x00])
+    dev.update_fields([
+        (0x0100, 0x03, 0x01),
+        (0x0100, 0x0C, 0x00),
+        (0x0101, 0x30, 0x20),
+        (0x0103, 0x80, 0x80),
+        (0x0100, 0x03, 0x02), # last one wins
+    ])
+    assert sim.reads == [(0x0100, 2), (0x0103, 1)]
+    assert sim.writes == [(0x0100, [0xF2, 0xEF]), (0x0103, [0x80])]
+
+def test_stats():
+    dev = AD9546(transport=SimTransport(EXAMPLE), stats=True)
+    dev.section("config")
+    dev.write_block(0x1100, [1, 2, 3])
+    dev.io_update()
+    dev.section("status")
+    dev.read_segments([(0x3001, 1), (0x3100, 15)])
+    report = dev.stats.report()
+    assert report["config"]["writes"] == 1
+    assert report["config"]["bytes_written"] == 3
+    assert report["config"]["io_updates"] == 1
+    assert report["status"]["reads"] == 2
+    assert report["status"]["bytes_read"] == 16
+    assert sum(report["status"]["latency"]["read"].values()) == 1
+
+def test_record_replay(tmp_path):
+    log = str(tmp_path / "session.bin")
+    rec = RecordTransport(SimTransport(EXAMPLE), log)
+    dev = AD9546(transport=rec)
+    dev.write_block(0x1100, [1, 2])
+    dev.io_update()
+    expected = dev.read_segments([(0x1100, 2), (0x3001, 1)])
+    rec.close()
+    dev = AD9546(transport=ReplayTransport(log))
+    dev.write_block(0x1100, [1, 2])
+    dev.io_update()
+    assert dev.read_segments([(0x1100, 2), (0x3001, 1)]) == expected
+    try:
+        dev.read_data(0x3001)
+        assert False
+    except RuntimeError: # end of log
+        pass
+
+def test_latency_model():
+    lat = LatencyTransport(SimTransport(), transaction=1E-3, byte=1E-4, syscall=1E-2, batch=2, sleep=False)
+    dev = AD9546(transport=lat)
+    dev.write_block(0x1100, [1, 2, 3])
+    dev.read_segments([(0x1100, 3), (0x3001, 1), (0x3100, 4)])
+    assert (lat.transactions, lat.bytes, lat.syscalls) == (4, 11, 3)
+    assert abs(lat.injected - (4E-3 + 11E-4 + 3E-2)) < 1E-9
+    assert lat.wall_time() >= lat.injected
+    # I2C reads: repeated START & slave address on top of the write-then-read transaction
+    lat = LatencyTransport.preset(SimTransport(), "i2c-100k", sleep=False)
+    lat.write(0x1100, [0x00])
+    write = lat.injected
+    lat.read(0x1100, 1)
+    assert abs(lat.injected - write - (write + 10E-5)) < 1E-9
+
+def test_bus_lock(tmp_path):
+    monitor = AD9546(transport=SimTransport(), lock=BusLock("i2c-0-0x48", str(tmp_path)), lock_timeout=0.05)
+    operator = AD9546(transport=SimTransport(), lock=BusLock("i2c-0-0x48", str(tmp_path)), lock_timeout=0.05)
+    with operator.transaction():
+        operator.write_data(0x1100, 0x01) # reentrant
+        try:
+            monitor.read_data(0x3001)
+            assert False
+        except TimeoutError:
+            pass
+    monitor.read_data(0x3001)
+    assert monitor.lock.acquisitions == 1
+    assert operator.lock.depth == 0
+    assert os.stat(monitor.lock.path).st_mode & 0o777 == 0o666 # shared by all users
+    os.chmod(monitor.lock.path, 0o444) # another user's file
+    BusLock("i2c-0-0x48", str(tmp_path)).acquire()
+    try:
+        BusLock("i2c-0-0x48", str(tmp_path / "missing"))
+        assert False
+    except RuntimeError as e:
+        assert "AD9546_LOCK_DIR" in str(e)
+
+def test_thread_safe():
+    sim = CountingSim(EXAMPLE)
+    dev = AD9546(transport=sim, thread_safe=True)
+    errors = []
+    def worker (addr):
+        expected = sim.read(addr, 1)[0]
+        for i in range (200):
+            if dev.read_data(addr) != expected:
+                errors.append(addr)
+    threads = [threading.Thread(target=worker, args=(0x3100 + i,)) for i in range (4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert errors == []
+
+class GatedSim (SimTransport):
+    """ SimTransport that records read_segments() calls,
+    first one blocks until released """
+    def __init__ (self, regmap=None):
+        super().__init__(regmap)
+        self.batches = []
+        self.entered = threading.Event()
+        self.gate = threading.Event()
+    def read_segments (self, segments):
+        if len(self.batches) == 0:
+            self.entered.set()
+            self.gate.wait()
+        self.batches.append(list(segments))
+        return super().read_segments(segments)
+
+def test_queued_batches_reads():
+    sim = GatedSim(EXAMPLE)
+    dev = AD9546(transport=sim, queued=True)
+    results = {}
+    def read (addr):
+        results[addr] = dev.read_block(addr, 2)
+    threads = [threading.Thread(target=read, args=(addr,)) for addr in (0x3001, 0x3100, 0x3200)]
+    threads[0].start()
+    sim.entered.wait() # I/O thread is busy with first request
+    for t in threads[1:]:
+        t.start()
+    while dev.requests.qsize() < 2:
+        time.sleep(1E-3)
+    sim.gate.set()
+    for t in threads:
+        t.join()
+    dev.close()
+    assert sim.batches == [[(0x3001, 2)], [(0x3100, 2), (0x3200, 2)]]
+    for addr in results:
+        assert results[addr] == sim.read(addr, 2)
+
+def test_queued_transaction(tmp_path):
+    sim = CountingSim(EXAMPLE)
+    dev = AD9546(transport=sim, queued=True, lock=BusLock("i2c-0-0x48", str(tmp_path)))
+    inside = threading.Event()
+    def other ():
+        inside.wait()
+        dev.write_data(0x1100, 0x02)
+    thread = threading.Thread(target=other, daemon=True)
+    thread.start()
+    with dev.transaction(): # read-modify-write, atomic for other callers
+        r = dev.read_data(0x1100)
+        assert dev.lock.depth == 1 # held by the I/O thread
+        inside.set()
+        time.sleep(0.05)
+        dev.write_data(0x1100, r | 0x01)
+    thread.join()
+    assert dev.lock.depth == 0
+    dev.close()
+    assert sim.writes == [(0x1100, [r | 0x01]), (0x1100, [0x02])]
+
+def test_deferred_io_update():
+    sim = CountingSim(EXAMPLE)
+    dev = AD9546(transport=sim, write_back=True, defer_io_update=True)
+    dev.write_data(0x10D7, 0x01)
+    dev.io_update()
+    dev.write_data(0x10D8, 0x01)
+    dev.io_update()
+    assert sim.writes == [] # merged, deferred
+    assert dev.read_data(0x10D7) == 0x01
+    dev.read_data(0x3001) # status: commits
+    assert sim.writes == [(0x10D7, [0x01, 0x01]), (0x000F, [0x01])]
+    dev.write_data(0x10D7, 0x00)
+    dev.io_update()
+    dev.write_data(0x2000, 0x04) # operational control: commits first
+    assert sim.writes[-2:] == [(0x10D7, [0x00]), (0x000F, [0x01])]
+    dev.io_update() # not deferred
+    assert sim.writes[-2:] == [(0x2000, [0x04]), (0x000F, [0x01])]
+
+def test_batch(tmp_path, capsys):
+    import batch
+    commands = tmp_path / "bring-up.txt"
+    commands.write_text("\n".join([
+        "# outputs",
+        "distrib --channel 0 --format hcsl",
+        "distrib.py --channel 0 --current 12.5mA",
+        "status --misc",
+    ]))
+    log = str(tmp_path / "session.bin")
+    try:
+        batch.main(["0", "0x48", str(commands), "--sim", EXAMPLE, "--record", log])
+    except SystemExit as e:
+        assert e.code == 0
+    assert "temperature" in json.loads(capsys.readouterr().out)["misc"]
+    writes = [(addr, list(data)) for (op, addr, _, data) in read_records(log) if op == RECORD_WRITE]
+    assert writes[-2:] == [(0x10D7, [0x13, 0x13, 0x13]), (0x000F, [0x01])]
+    assert len(writes) == 4 # rewriting an uncommitted register commits it first
+
+def test_batch_q_sync(tmp_path, capsys):
+    import batch
+    commands = tmp_path / "q-sync.txt"
+    commands.write_text("distrib --channel 0 --q-sync\n")
+    log = str(tmp_path / "session.bin")
+    try:
+        batch.main(["0", "0x48", str(commands), "--sim", EXAMPLE, "--record", log])
+    except SystemExit as e:
+        assert e.code == 0
+    r = AD9546(transport=SimTransport(EXAMPLE)).read_data(0x2101)
+    writes = [(addr, list(data)) for (op, addr, _, data) in read_records(log) if op == RECORD_WRITE]
+    assert writes == [ # both edges reach the chip, same as standalone
+        (0x2101, [r|0x08]), (0x000F, [0x01]),
+        (0x2101, [r|0xF7]), (0x000F, [0x01]),
+    ]
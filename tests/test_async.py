@@ -0,0 +1,30 @@
+#! /usr/bin/env python3
+# AsyncAD9546 & async status decoders,
+# exercised against simulated devices
+import os
+import sys
+import asyncio
+ROOT = os.path.join(os.path.dirname(__file__), "..")
+sys.path.insert(0, ROOT)
+EXAMPLE = os.path.join(ROOT, "example.json")
+from ad9546 import *
+import status
+
+def test_async_access():
+    async def session ():
+        adev = AsyncAD9546(transport=SimTransport(EXAMPLE))
+        await adev.write_block(0x1100, [1, 2])
+        await adev.io_update()
+        data = await adev.read_block(0x1100, 2)
+        await adev.close()
+        return data
+    assert asyncio.run(session()) == [1, 2]
+
+def test_async_status():
+    async def monitor ():
+        devices = [AsyncAD9546(transport=SimTransport(EXAMPLE)) for i in range (4)]
+        return await asyncio.gather(*[status.report_async(adev, ["pll", "misc"]) for adev in devices])
+    reports = asyncio.run(monitor())
+    expected = status.report(AD9546(transport=SimTransport(EXAMPLE)), ["pll", "misc"])
+    for report in reports:
+        assert report == expected
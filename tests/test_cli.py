@@ -11,3 +11,22 @@ def test_all_cli_helper():
             if f == "setup.py":
                 continue 
             call_cli(f)
+
+def test_entry_point_lazy():
+    # `ad9546 <command> -h` must not import smbus, spidev, nor other scripts
+    import sys
+    import subprocess
+    code = "\n".join([
+        "import sys, ad9546",
+        "try:",
+        "    ad9546.cli(['status', '-h'])",
+        "except SystemExit:",
+        "    pass",
+        "assert 'smbus' not in sys.modules",
+        "assert 'spidev' not in sys.modules",
+        "assert list(ad9546.SCRIPTS) == ['status.py'], ad9546.SCRIPTS",
+    ])
+    ret = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True,
+        cwd=os.path.join(os.path.dirname(__file__), ".."))
+    assert ret.returncode == 0, ret.stderr
+    assert "ad9546 status" in ret.stdout
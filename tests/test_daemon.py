@@ -0,0 +1,62 @@
+#! /usr/bin/env python3
+# ad9546d.py daemon & scripts forwarding,
+# against a simulated device
+import os
+import sys
+import time
+import json
+import subprocess
+ROOT = os.path.join(os.path.dirname(__file__), "..")
+sys.path.insert(0, ROOT)
+EXAMPLE = os.path.join(ROOT, "example.json")
+from ad9546 import *
+
+def test_daemon_forwarding(tmp_path):
+    sock = str(tmp_path / "ad9546d.sock")
+    env = dict(os.environ, AD9546_SOCKET=sock)
+    daemon = subprocess.Popen([sys.executable, os.path.join(ROOT, "ad9546d.py")], env=env)
+    try:
+        while not os.path.exists(sock):
+            time.sleep(0.01)
+        argv = ["0", "0x48", "--sim", EXAMPLE, "--pll"]
+        reply = daemon_request("status.py", argv, path=sock)
+        assert reply["code"] == 0
+        local = subprocess.run([sys.executable, os.path.join(ROOT, "status.py")] + argv,
+            env=dict(env, AD9546_NO_DAEMON="1"), capture_output=True, text=True)
+        assert json.loads(reply["stdout"]) == json.loads(local.stdout)
+        forwarded = subprocess.run([sys.executable, os.path.join(ROOT, "status.py")] + argv,
+            env=env, capture_output=True, text=True)
+        assert forwarded.stdout == reply["stdout"]
+        batch = subprocess.run([sys.executable, os.path.join(ROOT, "batch.py"), "0", "0x48", "-", "--sim", EXAMPLE],
+            env=env, input="status --pll\n", capture_output=True, text=True)
+        assert json.loads(batch.stdout) == json.loads(local.stdout) # stdin batch runs in-process
+        reply = daemon_request("status.py", ["--bogus"], path=sock)
+        assert reply["code"] == 2
+        reply = daemon_request("../setup.py", [], path=sock)
+        assert reply["code"] == 1
+        for script in ["ad9546d.py", "batch.py"]: # never nested
+            reply = daemon_request(script, ["--help"], path=sock)
+            assert reply["code"] == 1 and "can't be served" in reply["stderr"]
+        reply = daemon_request("status.py", argv + ["--rec=" + str(tmp_path / "log")], path=sock)
+        assert reply["code"] == 1 # writes files: refused
+        assert not os.path.exists(str(tmp_path / "log"))
+    finally:
+        daemon.terminate()
+        daemon.wait()
+    assert not os.path.exists(sock)
+    # `ad9546 daemon` runs in-process, even with a daemon running
+    assert load_script("ad9546d.py").main.local([])
+
+def test_scripts_only():
+    import batch
+    for name in ["setup.py", "conftest.py", "../status.py", "status"]:
+        try:
+            load_script(name)
+            assert False
+        except ValueError:
+            pass
+    try:
+        batch.parse_batch(["status --pll", "setup --help"])
+        assert False
+    except ValueError as e:
+        assert "line 2" in str(e)
@@ -0,0 +1,268 @@
+#! /usr/bin/env python3
+# status.py library API & CLI,
+# against a simulated device
+import os
+import sys
+import json
+import subprocess
+ROOT = os.path.join(os.path.dirname(__file__), "..")
+sys.path.insert(0, ROOT)
+EXAMPLE = os.path.join(ROOT, "example.json")
+from ad9546 import *
+import status
+
+SECTIONS = ["info", "serial", "sysclk", "pll", "ref-input", "distrib", "ccdpll",
+    "uts", "iuts", "skew", "irq", "watchdog", "eeprom", "misc"]
+
+def cli (*argv):
+    ret = subprocess.run([sys.executable, os.path.join(ROOT, "status.py"), "0", "0x48", "--sim", EXAMPLE] + list(argv),
+        capture_output=True, text=True, env=dict(os.environ, AD9546_NO_DAEMON="1"))
+    assert ret.returncode == 0, ret.stderr
+    return json.loads(ret.stdout)
+
+def test_decoders():
+    dev = AD9546(transport=SimTransport(EXAMPLE))
+    dev.io_update()
+    for name in status.DECODERS:
+        assert type(status.DECODERS[name](dev)) is dict
+    assert status.decode_info(dev)["vendor"] == "0x456"
+    # unseeded simulator: blank register image
+    dev = AD9546(transport=SimTransport())
+    for name in status.DECODERS:
+        assert type(status.DECODERS[name](dev)) is dict
+    assert status.decode_ref_input(dev)["a"]["freq"] == 0
+
+def test_report_matches_cli():
+    dev = AD9546(transport=SimTransport(EXAMPLE))
+    report = status.report(dev, SECTIONS, io_update=True)
+    assert json.loads(json.dumps(report)) == cli(*["--" + s for s in SECTIONS])
+
+def test_report_unknown_section():
+    dev = AD9546(transport=SimTransport(EXAMPLE))
+    try:
+        status.report(dev, ["bogus"])
+        assert False
+    except ValueError:
+        pass
+
+def test_section_single_transaction():
+    dev = AD9546(transport=SimTransport(EXAMPLE), stats=True)
+    status.report(dev, SECTIONS)
+    report = dev.stats.report()
+    for name in SECTIONS:
+        reads = report["status.py --" + name]["latency"]["read"]
+        assert sum(reads.values()) == 1, name # one bus transaction per section
+
+def test_plan():
+    fields = [status.Field("a", 0x3001), status.Field("b", 0x3003, 2), status.Field("c", 0x3100)]
+    # small gaps are read through, large ones are not
+    assert status.plan(fields) == [(0x3001, 4), (0x3100, 1)]
+    image = bytearray(status.IMAGE_SIZE)
+    image[0x3003:0x3005] = bytes([0x34, 0x12])
+    assert status.Field("x", 0x3003, 2, mask=0x0FF0, shift=4).value(image) == 0x23
+    assert status.bit("x", 0x3004, 4).value(image) is True
+
+def test_filter_pushdown():
+    for keys in [["ch0", "aa"], ["aa"], ["temperature", "value"], ["something"], ["locked"]]:
+        dev = AD9546(transport=SimTransport(EXAMPLE))
+        full = status.report(dev, ["distrib", "misc", "pll"])
+        dev = AD9546(transport=SimTransport(EXAMPLE), stats=True)
+        assert status.report(dev, ["distrib", "misc", "pll"], keys=keys) == status.filter_by_keys(full, keys)
+    # only the registers backing ch0/aa fields are read
+    dev = AD9546(transport=SimTransport(EXAMPLE), stats=True)
+    status.report(dev, ["distrib"], keys=["ch0", "aa"])
+    assert dev.stats.report()["status.py --distrib"]["bytes_read"] < 16
+    dev = AD9546(transport=SimTransport(EXAMPLE), stats=True)
+    assert status.report(dev, ["misc"], keys=["temperature", "value"]) == {"misc": {"temperature": {"value": "51.2 degC"}}}
+    assert dev.stats.report()["status.py --misc"]["bytes_read"] == 2
+
+def test_query():
+    tree = {"pll": {"ch0": {"locked": True, "digital": {"phase-locked": False}}, "ch1": {"locked": False}},
+        "misc": {"temperature": {"value": "51.2 degC", "alarm": False}}, "info": {"vendor": "0x456"}}
+    q = lambda *exprs: status.select(tree, [status.Query(e) for e in exprs])
+    assert q("pll.*.locked") == {"pll": {"ch0": {"locked": True}, "ch1": {"locked": False}}}
+    assert q("**.phase-locked") == {"pll": {"ch0": {"digital": {"phase-locked": False}}}}
+    assert q("pll./ch[1-9]/")["pll"]["ch1"] is tree["pll"]["ch1"] # not copied
+    assert q("**=false", "info.vendor=0x456") == {"pll": {"ch0": {"digital": {"phase-locked": False}}, "ch1": {"locked": False}},
+        "misc": {"temperature": {"alarm": False}}, "info": {"vendor": "0x456"}}
+    assert q("misc.**>51") == {"misc": {"temperature": {"value": "51.2 degC"}}}
+    assert q("misc.**>52") == {}
+    assert q("info.vendor<=0x456", "**.value~degC$") == {"info": {"vendor": "0x456"}, "misc": {"temperature": {"value": "51.2 degC"}}}
+    assert q("pll.ch0.locked!=true") == {}
+    for bogus in ["", "pll..locked", "pll.locked>warm", "/ch[/"]:
+        try:
+            status.Query(bogus)
+            assert False, bogus
+        except ValueError:
+            pass
+
+def test_query_pushdown():
+    dev = AD9546(transport=SimTransport(EXAMPLE), stats=True)
+    report = status.report(dev, ["pll", "misc"], queries=[status.Query("pll.*.locked"), status.Query("misc.temperature.value>50")])
+    assert report == {"pll": {"ch0": {"locked": True}, "ch1": {"locked": False}}, "misc": {"temperature": {"value": "51.2 degC"}}}
+    stats = dev.stats.report()
+    assert stats["status.py --pll"]["bytes_read"] == 1
+    assert stats["status.py --misc"]["bytes_read"] == 2
+    # sections deduced from the queries, values filtered
+    assert cli("--query", "pll.ch1.locked") == {"pll": {"ch1": {"locked": False}}}
+    assert cli("--info", "--filter-by-value", "0x456,bogus") == {"info": {"vendor": "0x456"}}
+
+def test_watch():
+    ret = subprocess.run([sys.executable, os.path.join(ROOT, "status.py"), "0", "0x48", "--sim", EXAMPLE,
+        "--pll", "--filter-by-key", "locked", "--watch", "0.01", "--count", "5", "--stats", "json"],
+        capture_output=True, text=True, env=dict(os.environ, AD9546_NO_DAEMON="1"))
+    assert ret.returncode == 0, ret.stderr
+    lines = [json.loads(line) for line in ret.stdout.splitlines()]
+    assert len(lines) == 5
+    for line in lines:
+        assert line["status"] == {"pll": {"ch0": {"locked": True}, "ch1": {"locked": False}}}
+    t = [line["t"] for line in lines]
+    assert t == sorted(t)
+    # device opened once, single I/O update, one single byte read per sample
+    stats = json.loads(ret.stderr)
+    assert stats["status.py"]["io_updates"] == 1
+    assert stats["status.py --watch"]["reads"] == 5
+    assert stats["status.py --watch"]["bytes_read"] == 5
+
+def test_watch_schedule():
+    t = list(status.schedule(0.02, 10))
+    for (n, tn) in enumerate(t): # drift free
+        assert abs(tn - t[0] - n*0.02) < 0.015
+    assert status.watching(["0", "0x48", "--pll", "--watch", "1"])
+    assert not status.watching(["0", "0x48", "--watchdog"])
+
+class FakeClock:
+    """ time module replacement: sleeping advances the clock """
+    def __init__ (self):
+        self.t = 0.0
+    def monotonic (self):
+        return self.t
+    def sleep (self, delay):
+        self.t += delay
+
+def test_schedule_overrun(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(status, "time", clock)
+    t = []
+    for tn in status.schedule(1.0, 4):
+        t.append(tn)
+        if len(t) == 1:
+            clock.t += 2.5 # overruns the next interval
+    # late sample, then back on schedule without catch-up
+    assert t == [0.0, 2.5, 3.0, 4.0]
+
+def test_watch_cache():
+    for cache in [False, True]:
+        dev = AD9546(transport=SimTransport(EXAMPLE), stats=True, cache=cache)
+        sampler = status.Sampler(dev, ["distrib"])
+        for tick in ["first", "second"]:
+            dev.section(tick)
+            sampler.sample()
+        stats = dev.stats.report()
+        assert stats["first"]["bytes_read"] > 100
+        if cache: # configuration registers are only read on first tick
+            assert stats["second"]["bytes_read"] < 10
+        else: # opt-in
+            assert dev.cache is None
+            assert stats["second"]["bytes_read"] == stats["first"]["bytes_read"]
+
+def test_delta():
+    sim = SimTransport(EXAMPLE)
+    dev = AD9546(transport=sim, stats=True)
+    sampler = status.Sampler(dev, ["pll"], keys=["digital", "phase-locked"], irq=True)
+    last = sampler.read()
+    sim.poke(0x3100, [sim.active[0x3100] ^ 0x02]) # ch0 digital phase lock
+    image = sampler.read()
+    [(path, old, new)] = sampler.delta(last, image)
+    assert path == ("pll", "ch0", "digital", "phase-locked") and new == (not old)
+    # unreported bits do not produce any change
+    sim.poke(0x3100, [image[0x3100] ^ 0x80])
+    assert sampler.delta(image, sampler.read()) == []
+    # a transition that reverted between two samples, is latched in the IRQ registers
+    last = sampler.read()
+    sim.poke(0x3010, [0x02]) # dpll0 phase unlocked event
+    assert sampler.delta(last, sampler.read()) == [(("irq", "dpll", "0", "phase-unlocked"), False, True)]
+
+def test_delta_cli():
+    ret = subprocess.run([sys.executable, os.path.join(ROOT, "status.py"), "0", "0x48", "--sim", EXAMPLE,
+        "--pll", "--filter-by-key", "locked", "--watch", "0.001", "--count", "20", "--delta"],
+        capture_output=True, text=True, env=dict(os.environ, AD9546_NO_DAEMON="1"))
+    assert ret.returncode == 0, ret.stderr
+    lines = ret.stdout.splitlines()
+    # static device: only the first sample is reported
+    assert len(set([line.split()[0] for line in lines])) == 1
+    assert lines[0].split(" ", 1)[1] == "pll.ch0.locked: true"
+
+def test_delta_filtered():
+    sim = SimTransport(EXAMPLE)
+    sampler = status.Sampler(AD9546(transport=sim), ["pll"], keys=["locked"])
+    asserted = [status.Query("**=true")]
+    output = lambda report: {name: status.select(report[name], asserted) for name in report}
+    changes = sampler.changes(0, output=output)
+    assert next(changes)[1] == [(("pll", "ch0", "locked"), None, True)] # ch1 filtered out
+    assert next(changes)[1] == []
+    sim.poke(0x3001, [sim.active[0x3001] ^ 0x30]) # ch0 unlocked, ch1 locked
+    assert next(changes)[1] == [(("pll", "ch1", "locked"), None, True), (("pll", "ch0", "locked"), True, None)]
+    # CLI applies filters, queries & --unpack
+    ret = subprocess.run([sys.executable, os.path.join(ROOT, "status.py"), "0", "0x48", "--sim", EXAMPLE,
+        "--pll", "--filter-by-key", "locked", "--filter-by-value", "true", "--watch", "0.001", "--count", "5", "--delta"],
+        capture_output=True, text=True, env=dict(os.environ, AD9546_NO_DAEMON="1"))
+    assert ret.returncode == 0, ret.stderr
+    assert [line.split(" ", 1)[1] for line in ret.stdout.splitlines()] == ["pll.ch0.locked: true"]
+
+def test_delta_irq_events():
+    for clear in [False, True]:
+        sim = SimTransport(EXAMPLE)
+        sampler = status.Sampler(AD9546(transport=sim), ["pll"], keys=["locked"], irq=True, clear=clear)
+        changes = sampler.changes(0)
+        # key filters apply, IRQ flags only reported when asserted
+        assert [path for (path, _, _) in next(changes)[1]] == [("pll", "ch0", "locked"), ("pll", "ch1", "locked")]
+        event = [(("irq", "dpll", "0", "phase-unlocked"), None, True)]
+        sim.poke(0x3010, [0x02]) # dpll0 phase unlocked
+        assert next(changes)[1] == event
+        assert next(changes)[1] == []
+        sim.poke(0x3010, [0x02]) # once again
+        assert next(changes)[1] == (event if clear else []) # latched, unless cleared
+        assert sim.active[0x3010] == (0x00 if clear else 0x02)
+
+def test_irq_gated():
+    sim = SimTransport(EXAMPLE)
+    dev = AD9546(transport=sim, stats=True)
+    monitor = status.IrqMonitor(dev, ["pll", "sysclk"], keys=["locked"], clear=True)
+    dev.section("idle")
+    for i in range (10):
+        assert monitor.poll() is None
+    idle = dev.stats.report()["idle"]
+    assert idle["reads"] == 10 and idle["bytes_read"] == 10*13 # single burst per poll
+    sim.poke(0x3010, [0x02]) # dpll0 phase unlocked
+    report = monitor.poll()
+    assert report["irq"] == {"dpll": {"0": {"phase-unlocked": True}}}
+    assert report["pll"] == {"ch0": {"locked": True}, "ch1": {"locked": False}}
+    assert "sysclk" not in report
+    assert sim.active[0x3010] == 0x00 # cleared (0x2010)
+    assert monitor.poll() is None
+    sim.poke(0x300B, [0x20]) # sysclk locked
+    report = monitor.poll()
+    assert sorted(report.keys()) == ["irq", "sysclk"]
+    assert sim.active[0x300B] == 0x00 # cleared (0x2006)
+    # flags raised between read and clear survive
+    sim.poke(0x3014, [0x02]) # dpll1 phase unlocked
+    flags = bytes(sim.active[0x300B:0x3018]) # as read
+    sim.poke(0x3014, [0x06]) # another dpll1 event
+    sim.poke(0x3010, [0x01]) # dpll0 event
+    monitor.clear_flags(flags)
+    assert sim.active[0x3014] == 0x04 and sim.active[0x3010] == 0x01
+    try:
+        status.IrqMonitor(dev, ["misc"])
+        assert False
+    except ValueError:
+        pass
+
+def test_irq_gated_no_clear():
+    sim = SimTransport(EXAMPLE)
+    dev = AD9546(transport=sim)
+    monitor = status.IrqMonitor(dev, ["ref-input"])
+    sim.poke(0x300D, [0x04]) # REFA valid
+    assert monitor.poll()["irq"] == {"ref": {"a": {"valid": True}}}
+    assert monitor.poll() is None # latched flag reported once
+    assert sim.active[0x300D] == 0x04
@@ -51,9 +51,10 @@ def main (argv):
     #                help=v_helper,
     #            )
     
+    add_interface_args(parser)
     args = parser.parse_args(argv)
-    dev = AD9546(args.bus, int(args.address, 16)) # open device
+    dev = open_device(args) # open device
     dev.io_update()
 
 if __name__ == "__main__":
-    main(sys.argv[1:])
+    run_script(main, sys.argv[1:])